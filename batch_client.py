@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Batch Manim Animation Generator
+
+Turns a JSONL file of prompts into rendered videos without the interactive
+loop of simple_client.py. Code is generated with a bounded number of
+concurrent LLM calls and rendered on a pool of warm Manim workers sized to
+the number of cores. One result line per prompt is appended to the output
+JSONL as soon as it finishes, so an interrupted run can be restarted and
+skips every prompt that already succeeded.
+
+Input lines are either a JSON string or an object with a "prompt" and an
+optional "id":
+
+    {"id": "pythagoras", "prompt": "Show the Pythagorean theorem"}
+
+Usage:
+    python batch_client.py prompts.jsonl [-o results.jsonl] [--llm-concurrency 4]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from code_stream import CodeStream
+from example_index import few_shot_section, get_example_index
+from generation_cache import generation_key, get_generation_cache
+from job_manifest import manim_overrides, output_path, write_manifest, write_manim_config
+from llm_backend import LLMBackend, LLMUnavailable, create_llm_backend
+from media_store import get_media_store, publish
+from preflight import preflight
+from render_cache import cache_key, get_render_cache, normalize_source
+from render_limits import check_output, get_admission_controller
+from render_monitor import run_monitored
+from render_profiles import get_profile
+from tex_cache import manim_command
+from worker_pool import DEFAULT_MAX_JOBS, DEFAULT_MAX_RSS_MB, ManimWorkerPool, RenderFailed, WorkerUnavailable
+
+# Bump when the prompt below changes so cached generations are not reused
+PROMPT_VERSION = "batch-1"
+BATCH_DIR = get_media_store().root / "batch"
+
+
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+PROMPT_TEMPLATE = """
+You are a professional Manim developer. Generate correct Manim Community code
+(from manim import *) with exactly one Scene subclass and a construct method
+that creates the animation below. Return ONLY the Python code.
+
+User Request: {prompt}
+"""
+
+
+@dataclass
+class BatchItem:
+    id: str
+    prompt: str
+
+
+@dataclass
+class BatchResult:
+    id: str
+    prompt: str
+    status: str
+    code_hash: Optional[str] = None
+    scene: Optional[str] = None
+    video: Optional[str] = None
+    cached: bool = False
+    generate_seconds: Optional[float] = None
+    render_seconds: Optional[float] = None
+    total_seconds: Optional[float] = None
+    error_class: Optional[str] = None
+    error: Optional[str] = None
+    finished_at: Optional[float] = None
+
+
+def read_prompts(path: Path) -> List[BatchItem]:
+    items = []
+    seen = set()
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if isinstance(data, str):
+                data = {"prompt": data}
+            prompt = data["prompt"]
+            item_id = str(data.get("id") or hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12])
+            # The id names the prompt's workspace directory
+            if not item_id.replace("-", "").replace("_", "").isalnum():
+                raise ValueError(f"Line {number}: invalid id {item_id!r} (use letters, digits, - and _)")
+            if item_id in seen:
+                print(f"⚠️  Line {number}: duplicate id {item_id!r} skipped")
+                continue
+            seen.add(item_id)
+            items.append(BatchItem(item_id, prompt))
+    return items
+
+
+def succeeded_ids(path: Path) -> set:
+    """Ids whose latest result in `path` is a success"""
+    latest: Dict[str, str] = {}
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut off by an interrupted run
+                latest[record["id"]] = record["status"]
+    return {item_id for item_id, status in latest.items() if status == SUCCEEDED}
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(normalize_source(code).encode("utf-8")).hexdigest()[:16]
+
+
+class BatchRunner:
+    def __init__(self, llm: LLMBackend, out_dir: Path, profile: str, llm_concurrency: int, workers: int):
+        self.llm_backend = llm
+        self.out_dir = out_dir
+        self.profile = get_profile(profile)
+        self.llm = ThreadPoolExecutor(max_workers=llm_concurrency, thread_name_prefix="llm")
+        # One thread per warm worker keeps every worker busy; without workers
+        # each thread drives its own manim process
+        self.renders = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix="render")
+        self.pool = ManimWorkerPool(workers, DEFAULT_MAX_JOBS, DEFAULT_MAX_RSS_MB) if workers else None
+
+    def generate(self, item: BatchItem) -> str:
+        examples = get_example_index()
+        # Code that already rendered for the same request needs no LLM call
+        reused = examples.match(item.prompt)
+        if reused:
+            return reused.code
+        key = generation_key(item.prompt, PROMPT_VERSION, self.llm_backend.model_name)
+
+        def stream_code():
+            prompt = PROMPT_TEMPLATE.format(prompt=item.prompt) + few_shot_section(examples.search(item.prompt))
+            return CodeStream(self.llm_backend.stream(prompt)).result()
+
+        return get_generation_cache().get_or_generate(key, stream_code)
+
+    def render(self, item: BatchItem, code: str, result: BatchResult) -> BatchResult:
+        workspace = self.out_dir / item.id
+        if workspace.resolve().parent != self.out_dir.resolve():
+            raise ValueError(f"Workspace {workspace} is outside {self.out_dir}")
+        if workspace.exists():
+            shutil.rmtree(workspace)
+        workspace.mkdir(parents=True)
+        store = get_media_store()
+        with store.lease(workspace):
+            result = self._render(item, code, result, workspace)
+        if result.status == SUCCEEDED:
+            get_example_index().add(item.prompt, code, result.render_seconds)
+            # The results file points at this video, so keep it out of media eviction
+            store.pin(workspace, "batch")
+        return result
+
+    def _render(self, item: BatchItem, code: str, result: BatchResult, workspace: Path) -> BatchResult:
+        started = time.perf_counter()
+        checked = preflight(code)
+        if not checked.ok:
+            result.error_class = f"Preflight:{checked.errors[0].code}"
+            result.error = checked.format_errors()
+            return result
+        result.scene = checked.default_scene
+
+        code_file = workspace / "scene.py"
+        code_file.write_text(code)
+        render_cache = get_render_cache()
+        key = cache_key(code, result.scene, self.profile.cache_flags())
+        cached = render_cache.get(key, self.profile.extension)
+        video = output_path(workspace, self.profile.extension)
+        duration = None
+        if cached:
+            publish(cached, video)
+            result.cached = True
+        else:
+            get_admission_controller().wait()
+            overrides = {**manim_overrides(workspace), **self.profile.overrides(workspace)}
+            try:
+                if self.pool is None:
+                    raise WorkerUnavailable("no workers")
+                rendered = self.pool.render(code, result.scene, overrides, filename=str(code_file),
+                                            timeout=self.profile.limits.wall_seconds,
+                                            encoder=self.profile.encoder_options(), limits=self.profile.limits)
+                duration = rendered.duration
+            except RenderFailed as e:
+                result.error_class = e.error.type if e.error else type(e).__name__
+                result.error = str(e)
+                return result
+            except WorkerUnavailable:
+                monitored = run_monitored([
+                    *manim_command(encoder=self.profile.encoder_options()), str(code_file), result.scene,
+                    "--progress_bar", "none", "--config_file", str(write_manim_config(workspace, overrides)),
+                ], cwd=workspace, scene_file=str(code_file), limits=self.profile.limits)
+                if not monitored.ok:
+                    result.error_class = monitored.error.type if monitored.error else "RenderFailed"
+                    result.error = str(monitored.error)
+                    return result
+            try:
+                video = self.profile.output(workspace)
+            except RenderFailed:
+                pass
+            if not video.exists():
+                result.error_class = "VideoNotFound"
+                result.error = f"Render finished but {video} is missing"
+                return result
+            too_big = check_output(video, self.profile.limits)
+            if too_big:
+                result.error_class = "OutputLimit"
+                result.error = too_big
+                return result
+            render_cache.put(key, video)
+
+        result.render_seconds = time.perf_counter() - started
+        write_manifest(workspace, item.id, video, result.scene, self.profile.label,
+                       duration=duration, render_seconds=result.render_seconds, cached=result.cached)
+        result.video = str(Path(video).resolve())
+        result.status = SUCCEEDED
+        return result
+
+    def _timed_generate(self, item: BatchItem, seconds: Dict[str, float]) -> str:
+        # Timed in the worker so time spent queued behind other prompts is not counted
+        started = time.perf_counter()
+        try:
+            return self.generate(item)
+        finally:
+            seconds[item.id] = time.perf_counter() - started
+
+    def run(self, items: List[BatchItem], output: Path):
+        try:
+            return self._run(items, output)
+        finally:
+            # On Ctrl-C, drop queued prompts instead of generating and rendering them
+            self.llm.shutdown(wait=False, cancel_futures=True)
+            self.renders.shutdown(wait=False, cancel_futures=True)
+            if self.pool:
+                self.pool.shutdown()
+
+    def _run(self, items: List[BatchItem], output: Path):
+        started: Dict[str, float] = {}
+        generate_seconds: Dict[str, float] = {}
+        generating: Dict[Future, BatchItem] = {}
+        rendering: Dict[Future, BatchItem] = {}
+        counts = {SUCCEEDED: 0, FAILED: 0}
+
+        for item in items:
+            started[item.id] = time.perf_counter()
+            generating[self.llm.submit(self._timed_generate, item, generate_seconds)] = item
+
+        with open(output, "a") as out:
+            def emit(result: BatchResult):
+                result.total_seconds = time.perf_counter() - started[result.id]
+                result.finished_at = time.time()
+                out.write(json.dumps(asdict(result)) + "\n")
+                out.flush()
+                counts[result.status] += 1
+                icon = "✅" if result.status == SUCCEEDED else "❌"
+                detail = result.video if result.status == SUCCEEDED else f"{result.error_class}: {result.error}"
+                print(f"{icon} [{sum(counts.values())}/{len(items)}] {result.id}: {detail}")
+
+            while generating or rendering:
+                done, _ = wait([*generating, *rendering], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in generating:
+                        item = generating.pop(future)
+                        result = BatchResult(item.id, item.prompt, FAILED)
+                        result.generate_seconds = generate_seconds.get(item.id)
+                        try:
+                            code = future.result()
+                        except Exception as e:
+                            result.error_class = type(e).__name__
+                            result.error = str(e)
+                            emit(result)
+                            continue
+                        if not code:
+                            result.error_class = "EmptyGeneration"
+                            emit(result)
+                            continue
+                        result.code_hash = code_hash(code)
+                        rendering[self.renders.submit(self.render, item, code, result)] = item
+                    else:
+                        item = rendering.pop(future)
+                        try:
+                            emit(future.result())
+                        except Exception as e:
+                            result = BatchResult(item.id, item.prompt, FAILED,
+                                                 error_class=type(e).__name__, error=str(e))
+                            emit(result)
+        return counts
+
+
+def load_llm(fake: bool, concurrency: int) -> LLMBackend:
+    """The LLM backend from the environment, with its concurrency bound set to `concurrency`"""
+    try:
+        return create_llm_backend("mock" if fake else None, concurrency=concurrency)
+    except LLMUnavailable as e:
+        print(f"❌ {e} (or pass --fake)")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a JSONL file of prompts into Manim videos")
+    parser.add_argument("prompts", type=Path, help="JSONL file with one prompt per line")
+    parser.add_argument("-o", "--output", type=Path, help="Results JSONL (default: <prompts>.results.jsonl)")
+    parser.add_argument("--out-dir", type=Path, default=BATCH_DIR, help="Where each prompt's workspace is kept")
+    parser.add_argument("--profile", default="chat",
+                        help="Render profile: preview, chat or publish, optionally with a format (publish:webm)")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Concurrent code generation requests")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Manim workers (0 runs a fresh manim process per render)")
+    parser.add_argument("--fake", action="store_true", help="Use the offline mock LLM provider instead of Gemini")
+    args = parser.parse_args()
+    try:
+        get_profile(args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+
+    output = args.output or args.prompts.with_suffix(".results.jsonl")
+    try:
+        items = read_prompts(args.prompts)
+    except ValueError as e:
+        parser.error(str(e))
+    done = succeeded_ids(output)
+    todo = [item for item in items if item.id not in done]
+
+    print("🎬 Manim Batch Generator")
+    print("=" * 50)
+    print(f"📄 {len(items)} prompts, {len(items) - len(todo)} already done, {len(todo)} to run")
+    print(f"📝 Results: {output}")
+    print("=" * 50)
+    if not todo:
+        return
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    llm_concurrency = max(1, args.llm_concurrency)
+    runner = BatchRunner(load_llm(args.fake, llm_concurrency), args.out_dir, args.profile,
+                         llm_concurrency, max(0, args.workers))
+    try:
+        counts = runner.run(todo, output)
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted; run again to resume")
+        sys.exit(130)
+    print(f"\n🏁 {counts[SUCCEEDED]} succeeded, {counts[FAILED]} failed")
+    llm = runner.llm_backend.stats()
+    print(f"🤖 {llm['requests']} LLM requests, {llm['retried']} retried, {llm['throttled_seconds']:.0f}s rate limited, "
+          f"{get_example_index().stats()['reused']} prompts answered from earlier renders")
+
+
+if __name__ == "__main__":
+    main()
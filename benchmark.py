@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+End-to-end render latency benchmark
+
+Runs a fixed corpus of scenes (simple shapes, heavy MathTex, a ThreeDScene
+and a long run_time) through both execution paths: the MCP server's
+`manin_executable_code` tool and simple_client's `execute_manim_code`. Code
+comes from the LLM backend's mock provider streaming the corpus scene, so
+only local work is measured.
+
+Every run is broken down into the stages of stage_timing.STAGES: code
+generation, preflight, process startup, TeX compile, frame rendering, video
+encoding and file publish. The report gives p50/p95 per path, scene and stage.
+It is written as JSON and can be compared against a stored baseline; any
+stage that got slower than the tolerance makes the command exit with 1.
+
+The render cache is disabled and every cache lives in a temporary directory,
+so runs never hit results from earlier runs. The TeX cache warms up after the
+first iteration unless --cold-tex is given.
+
+Usage:
+    python benchmark.py --iterations 5 --output bench.json
+    python benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmark.py --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from code_stream import CodeStream
+from llm_backend import LLMBackend, MockProvider
+from stage_timing import STAGES, StageTimes
+
+PATHS = ("mcp", "client")
+DEFAULT_BASELINE = Path("benchmarks") / "baseline.json"
+DEFAULT_TOLERANCE = 0.2
+# Differences below this many seconds are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+
+CORPUS = {
+    "simple_shapes": '''from manim import *
+
+class SimpleShapes(Scene):
+    def construct(self):
+        circle = Circle(color=BLUE)
+        square = Square(color=GREEN).shift(RIGHT * 2)
+        triangle = Triangle(color=RED).shift(LEFT * 2)
+        self.play(Create(circle), Create(square), Create(triangle))
+        self.play(Transform(circle, square.copy()))
+        self.wait(0.5)
+''',
+    "mathtex_heavy": r'''from manim import *
+
+class HeavyMathTex(Scene):
+    def construct(self):
+        equations = VGroup(
+            MathTex(r"e^{i\pi} + 1 = 0"),
+            MathTex(r"\int_{-\infty}^{\infty} e^{-x^2}\,dx = \sqrt{\pi}"),
+            MathTex(r"\sum_{n=1}^{\infty} \frac{1}{n^2} = \frac{\pi^2}{6}"),
+            MathTex(r"\nabla \times \mathbf{B} = \mu_0 \mathbf{J} + \mu_0 \varepsilon_0 \frac{\partial \mathbf{E}}{\partial t}"),
+            MathTex(r"\det\begin{pmatrix} a & b \\ c & d \end{pmatrix} = ad - bc"),
+            Tex(r"The Basel problem, Gauss and Maxwell"),
+        ).arrange(DOWN)
+        for equation in equations:
+            self.play(Write(equation), run_time=0.5)
+        self.wait(0.5)
+''',
+    "three_d": '''from manim import *
+
+class ThreeDSurface(ThreeDScene):
+    def construct(self):
+        axes = ThreeDAxes()
+        surface = Surface(
+            lambda u, v: axes.c2p(u, v, np.sin(u) * np.cos(v)),
+            u_range=[-PI, PI], v_range=[-PI, PI], resolution=(16, 16),
+        )
+        self.set_camera_orientation(phi=70 * DEGREES, theta=30 * DEGREES)
+        self.play(Create(axes), Create(surface))
+        self.begin_ambient_camera_rotation(rate=0.5)
+        self.wait(2)
+''',
+    "long_run_time": '''from manim import *
+
+class LongRunTime(Scene):
+    def construct(self):
+        dot = Dot(color=YELLOW)
+        path = TracedPath(dot.get_center, stroke_color=YELLOW)
+        self.add(path, dot)
+        self.play(MoveAlongPath(dot, Circle(radius=2)), run_time=12, rate_func=linear)
+''',
+}
+
+
+def fake_llm(code: str) -> LLMBackend:
+    """A backend that always streams `code` in a markdown fence, like a chat LLM would"""
+    return LLMBackend(MockProvider([f"Here is the animation:\n```python\n{code}```\n"], model_name="benchmark-fake"))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: Dict[str, List[float]]) -> Dict[str, dict]:
+    return {
+        stage: {"p50": percentile(values, 50), "p95": percentile(values, 95), "n": len(values)}
+        for stage, values in samples.items()
+    }
+
+
+def isolate_caches(root: Path):
+    """Point every cache at `root` and keep finished renders out of the render cache"""
+    os.environ["MANIM_RENDER_CACHE_DIR"] = str(root / "renders")
+    os.environ["MANIM_RENDER_CACHE_BYTES"] = "0"
+    os.environ["MANIM_TEX_CACHE_DIR"] = str(root / "tex")
+    os.environ["MANIM_GENERATION_CACHE_PATH"] = str(root / "generations.db")
+    os.environ["MANIM_EXAMPLE_INDEX_PATH"] = str(root / "examples.db")
+
+
+def clear_tex_cache(root: Path):
+    """Drop the compiled SVGs but keep the lock and stats files running processes use"""
+    for path in (root / "tex").glob("*.svg"):
+        path.unlink(missing_ok=True)
+    shutil.rmtree(root / "tex" / "unmanaged", ignore_errors=True)
+
+
+class Benchmark:
+    def __init__(self, iterations: int, cache_root: Path, cold_tex: bool):
+        self.iterations = iterations
+        self.cache_root = cache_root
+        self.cold_tex = cold_tex
+        # path -> scene -> stage -> seconds of each run
+        self.samples = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        self.failures = []
+
+    def record(self, path: str, scene: str, timings: StageTimes, total: float):
+        for stage, seconds in timings.seconds.items():
+            self.samples[path][scene][stage].append(seconds)
+        self.samples[path][scene]["total"].append(total)
+
+    def fail(self, path: str, scene: str, iteration: int, error: str):
+        self.failures.append({"path": path, "scene": scene, "iteration": iteration, "error": error})
+        print(f"❌ {path}/{scene} #{iteration}: {error}")
+
+    async def run_mcp(self):
+        import main as server
+        from job_manifest import read_manifest
+        from preflight import preflight
+
+        for scene, code in CORPUS.items():
+            llm = fake_llm(code)
+            for i in range(self.iterations):
+                if self.cold_tex:
+                    clear_tex_cache(self.cache_root)
+                timings = StageTimes()
+                started = time.perf_counter()
+                with timings.measure("generate"):
+                    generated = CodeStream(llm.stream(scene)).result()
+                video = await server.manin_executable_code(generated)
+                total = time.perf_counter() - started
+                if video.startswith(("Error", "An error")):
+                    self.fail("mcp", scene, i, video)
+                    continue
+                manifest = read_manifest(Path(video).parent)
+                timings.update(manifest.timings if manifest else {})
+                # The tool runs preflight itself; time the same check for the breakdown
+                with timings.measure("preflight"):
+                    preflight(generated)
+                self.record("mcp", scene, timings, total)
+                print(f"✅ mcp/{scene} #{i}: {total:.2f}s")
+
+    def run_client(self, workdir: Path):
+        os.environ["MANIM_LLM_PROVIDER"] = "mock"
+        import simple_client
+
+        previous = os.getcwd()
+        os.chdir(workdir)  # simple_client copies the video into the working directory
+        try:
+            for scene, code in CORPUS.items():
+                simple_client.llm = fake_llm(code)
+                for i in range(self.iterations):
+                    if self.cold_tex:
+                        clear_tex_cache(self.cache_root)
+                    timings = StageTimes()
+                    started = time.perf_counter()
+                    with timings.measure("generate"):
+                        # A distinct prompt per run so the generation cache never answers
+                        generated = simple_client.generate_manim_code(f"{scene} run {i} {time.time()}")
+                    if not generated:
+                        self.fail("client", scene, i, "generation failed")
+                        continue
+                    status = simple_client.execute_manim_code(generated, None, timings)
+                    total = time.perf_counter() - started
+                    if not status.startswith("✅"):
+                        self.fail("client", scene, i, status)
+                        continue
+                    self.record("client", scene, timings, total)
+                    print(f"✅ client/{scene} #{i}: {total:.2f}s")
+        finally:
+            os.chdir(previous)
+
+    def report(self) -> dict:
+        from render_cache import manim_version
+
+        return {
+            "meta": {
+                "created_at": time.time(),
+                "iterations": self.iterations,
+                "cold_tex": self.cold_tex,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "manim": manim_version(),
+                "workers": os.getenv("MANIM_WORKERS", "default"),
+            },
+            "results": {
+                path: {scene: summarize(stages) for scene, stages in scenes.items()}
+                for path, scenes in self.samples.items()
+            },
+            "failures": self.failures,
+        }
+
+
+def print_report(report: dict):
+    stages = [*STAGES, "total"]
+    for path, scenes in report["results"].items():
+        print(f"\n📊 {path} (p50 / p95 ms)")
+        print(f"{'scene':<16}" + "".join(f"{stage:>18}" for stage in stages))
+        for scene, summary in scenes.items():
+            cells = []
+            for stage in stages:
+                if stage in summary:
+                    cells.append(f"{summary[stage]['p50'] * 1000:>9.0f}/{summary[stage]['p95'] * 1000:<8.0f}")
+                else:
+                    cells.append(f"{'-':>18}")
+            print(f"{scene:<16}" + "".join(cells))
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Describe every p50/p95 that got slower than `tolerance` allows"""
+    regressions = []
+    for path, scenes in report["results"].items():
+        for scene, summary in scenes.items():
+            base_summary = baseline.get("results", {}).get(path, {}).get(scene, {})
+            for stage, values in summary.items():
+                if stage not in base_summary:
+                    continue
+                for metric in ("p50", "p95"):
+                    current, base = values[metric], base_summary[stage][metric]
+                    if current > base * (1 + tolerance) and current - base > MIN_REGRESSION_SECONDS:
+                        regressions.append(
+                            f"{path}/{scene}/{stage} {metric}: {base * 1000:.0f} ms -> {current * 1000:.0f} ms "
+                            f"(+{(current / base - 1) * 100 if base else math.inf:.0f}%)"
+                        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Manim render latency per stage")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--paths", default=",".join(PATHS), help="Comma-separated subset of: " + ", ".join(PATHS))
+    parser.add_argument("--scenes", default=",".join(CORPUS), help="Comma-separated subset of the corpus")
+    parser.add_argument("--cold-tex", action="store_true", help="Clear the TeX cache before every run")
+    parser.add_argument("-o", "--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--baseline", type=Path, help=f"Baseline to compare against (default: {DEFAULT_BASELINE} if present)")
+    parser.add_argument("--save-baseline", type=Path, help="Also store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, e.g. 0.2 = 20%%")
+    args = parser.parse_args()
+
+    paths = [path for path in args.paths.split(",") if path]
+    unknown = set(paths) - set(PATHS) or set(args.scenes.split(",")) - set(CORPUS)
+    if unknown:
+        parser.error(f"unknown path or scene: {', '.join(sorted(unknown))}")
+    for scene in set(CORPUS) - set(args.scenes.split(",")):
+        del CORPUS[scene]
+
+    with tempfile.TemporaryDirectory(prefix="manim-bench-") as tmp:
+        cache_root = Path(tmp)
+        isolate_caches(cache_root)
+        benchmark = Benchmark(max(1, args.iterations), cache_root, args.cold_tex)
+        print("⏱️  Manim render benchmark")
+        print("=" * 50)
+        if "mcp" in paths:
+            asyncio.run(benchmark.run_mcp())
+        if "client" in paths:
+            workdir = cache_root / "client"
+            workdir.mkdir()
+            benchmark.run_client(workdir)
+        report = benchmark.report()
+
+    print_report(report)
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\n📝 Results: {args.output}")
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(report, indent=2))
+        print(f"📌 Baseline saved: {args.save_baseline}")
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if DEFAULT_BASELINE.exists() and not args.save_baseline else None)
+    if baseline_path:
+        regressions = compare(report, json.loads(baseline_path.read_text()), args.tolerance)
+        if regressions:
+            print(f"\n🐢 {len(regressions)} regressions against {baseline_path}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {baseline_path} (tolerance {args.tolerance:.0%})")
+    if report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+SQLite-backed chat history for the Streamlit app.
+
+Sessions and messages live in separate tables. Each session row stores its
+sidebar preview and last-update time (indexed), so listing recent chats reads
+a page of small rows instead of unpickling every conversation. Messages are
+only ever appended, apart from single-row updates such as swapping in a
+finished background render. WAL mode lets several Streamlit workers share one
+database file.
+"""
+
+import json
+import os
+import shelve
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_DB_PATH = Path("chat_history.sqlite3")
+LEGACY_SHELVE_PATH = "chat_history.db"
+PREVIEW_LENGTH = 40
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    preview TEXT NOT NULL DEFAULT '',
+    message_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at DESC, id);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    extra TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+
+class ChatStore:
+    """Chat sessions and messages in one SQLite database"""
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _split(message: Dict) -> Tuple[str, str, Optional[str]]:
+        extra = {k: v for k, v in message.items() if k not in ("role", "content")}
+        return message["role"], message["content"], json.dumps(extra) if extra else None
+
+    def append_messages(self, session_id: str, messages: List[Dict]) -> int:
+        """Store the messages of `messages` that aren't stored yet; returns how many were added"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            stored = row[0] if row else 0
+            new = messages[stored:]
+            if not new:
+                return 0
+            if row is None:
+                preview = messages[0]["content"][:PREVIEW_LENGTH]
+                db.execute(
+                    "INSERT INTO sessions (id, preview, message_count, created_at, updated_at) VALUES (?, ?, 0, ?, ?)",
+                    (session_id, preview, now, now),
+                )
+            db.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, extra, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(session_id, stored + i, *self._split(message), now) for i, message in enumerate(new)],
+            )
+            db.execute(
+                "UPDATE sessions SET message_count = ?, updated_at = ? WHERE id = ?",
+                (stored + len(new), now, session_id),
+            )
+        return len(new)
+
+    def add_message(self, session_id: str, message: Dict) -> int:
+        """Append one message after whatever is stored; returns its index in the session"""
+        now = time.time()
+        with self._connect() as db:
+            # BEGIN IMMEDIATE so two writers can't read the same message_count
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            seq = row[0] if row else 0
+            if row is None:
+                db.execute(
+                    "INSERT INTO sessions (id, preview, message_count, created_at, updated_at) VALUES (?, ?, 0, ?, ?)",
+                    (session_id, message["content"][:PREVIEW_LENGTH], now, now),
+                )
+            db.execute(
+                "INSERT INTO messages (session_id, seq, role, content, extra, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, seq, *self._split(message), now),
+            )
+            db.execute(
+                "UPDATE sessions SET message_count = ?, updated_at = ? WHERE id = ?", (seq + 1, now, session_id)
+            )
+        return seq
+
+    def update_message(self, session_id: str, seq: int, message: Dict):
+        """Replace one stored message, e.g. to point it at a finished render"""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE messages SET role = ?, content = ?, extra = ? WHERE session_id = ? AND seq = ?",
+                (*self._split(message), session_id, seq),
+            )
+
+    def load_messages(self, session_id: str) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT role, content, extra FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+        ).fetchall()
+        messages = []
+        for role, content, extra in rows:
+            message = {"role": role, "content": content}
+            if extra:
+                message.update(json.loads(extra))
+            messages.append(message)
+        return messages
+
+    def list_sessions(self, limit: int = 10, before: Optional[Tuple[float, str]] = None) -> List[Tuple[str, str, float]]:
+        """Return (session_id, preview, updated_at) newest first.
+
+        Pass the (updated_at, session_id) of the last row as `before` to get
+        the next page; the query walks the index, so it costs the same at any depth.
+        """
+        if before is None:
+            rows = self._connect().execute(
+                "SELECT id, preview, updated_at FROM sessions WHERE message_count > 0"
+                " ORDER BY updated_at DESC, id LIMIT ?", (limit,)
+            )
+        else:
+            rows = self._connect().execute(
+                "SELECT id, preview, updated_at FROM sessions WHERE message_count > 0"
+                " AND (updated_at < ? OR (updated_at = ? AND id > ?))"
+                " ORDER BY updated_at DESC, id LIMIT ?", (before[0], before[0], before[1], limit)
+            )
+        return rows.fetchall()
+
+    def delete_session(self, session_id: str):
+        with self._connect() as db:
+            db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def import_shelve(self, shelve_path: str) -> int:
+        """Copy sessions from the old shelve history; returns how many were imported"""
+        imported = 0
+        try:
+            db = shelve.open(shelve_path, flag="r")
+        except Exception:
+            return 0
+        with db:
+            for session_id, data in db.items():
+                if self.append_messages(session_id, data.get("messages", [])):
+                    with self._connect() as sql:
+                        sql.execute(
+                            "UPDATE sessions SET created_at = ?, updated_at = ? WHERE id = ?",
+                            (data["timestamp"], data["timestamp"], session_id),
+                        )
+                    imported += 1
+        return imported
+
+
+_store: Optional[ChatStore] = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store() -> ChatStore:
+    """Return the process-wide chat store, importing the old shelve history on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = Path(os.getenv("CHAT_HISTORY_PATH", DEFAULT_DB_PATH))
+            is_new = not path.exists()
+            _store = ChatStore(path)
+            if is_new:
+                _store.import_shelve(LEGACY_SHELVE_PATH)
+        return _store
@@ -8,19 +8,16 @@ import json
 import subprocess
 import sys
 from typing import Any, Dict, List
-import google.generativeai as genai
-import os
 from mcp.client.session import ClientSession
 from mcp.client.stdio import stdio_client
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    print("Please set GEMINI_API_KEY environment variable")
-    sys.exit(1)
+from llm_backend import LLMUnavailable, get_llm_backend
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+try:
+    llm = get_llm_backend()
+except LLMUnavailable as e:
+    print(e)
+    sys.exit(1)
 
 class ManimMCPClient:
     def __init__(self):
@@ -92,15 +89,21 @@ async def main():
                 continue
             
             try:
-                # Get Manim code generation prompt
-                print("🤖 Getting Manim code prompt...")
-                prompt_result = await client.get_prompt("manim_prompt", {"prompt": user_input})
-                manim_prompt = prompt_result[0].content.text if prompt_result else ""
-                
-                # Use Gemini to generate Manim code
-                print("✨ Generating Manim code with Gemini...")
-                response = model.generate_content(manim_prompt)
-                manim_code = response.text
+                # Code that already rendered for the same request needs no generation
+                example = await client.call_tool("find_example", {"prompt": user_input})
+                found = json.loads(example[0].text) if example else {}
+                if found.get("match"):
+                    print(f"♻️  Reusing code that rendered for: {found['prompt']}")
+                    manim_code = found["code"]
+                else:
+                    # Get Manim code generation prompt
+                    print("🤖 Getting Manim code prompt...")
+                    prompt_result = await client.get_prompt("manim_prompt", {"prompt": user_input})
+                    manim_prompt = prompt_result[0].content.text if prompt_result else ""
+                    
+                    # Use Gemini to generate Manim code
+                    print("✨ Generating Manim code with Gemini...")
+                    manim_code = await llm.agenerate(manim_prompt)
                 
                 print(f"\n📝 Generated Manim code:\n{manim_code}")
                 
@@ -111,7 +114,8 @@ async def main():
                     print("🎬 Executing Manim animation...")
                     
                     # Call the manim execution tool
-                    result = await client.call_tool("manin_executable_code", {"manim_code": manim_code})
+                    result = await client.call_tool("manin_executable_code",
+                                                    {"manim_code": manim_code, "prompt": user_input})
                     
                     if result:
                         print(f"✅ Result: {result[0].text if result else 'No result'}")
@@ -0,0 +1,193 @@
+"""
+Streaming code generation with on-the-fly cleanup and early validation.
+
+`CodeStream` wraps the text chunks of a streaming LLM response. It strips
+markdown fences as the chunks arrive, and runs the preflight checks on every
+top-level statement (imports, class headers, finished classes) as soon as it
+is complete. A fatal problem such as a forbidden import stops the stream
+early. When the stream closes, `CodeStream.code` is ready to render.
+
+The chunks come from llm_backend, whose mock provider runs the pipeline
+offline.
+"""
+
+import ast
+from typing import Iterable, Iterator, List, Optional
+
+from preflight import ERROR, MANIM_SCENE_BASES, PreflightChecker, PreflightIssue, PreflightResult, base_name
+
+FENCE = "```"
+CODE_STARTS = ("from ", "import ", "class ", "def ", "#", "@", '"""', "'''")
+
+
+class EarlyValidationError(Exception):
+    """Raised when a stream was stopped because the code can't possibly render"""
+
+    def __init__(self, issues: List[PreflightIssue]):
+        self.issues = issues
+        super().__init__("\n".join(str(issue) for issue in issues))
+
+
+class FenceStripper:
+    """Remove a leading ```python fence and everything from the closing fence on"""
+
+    def __init__(self):
+        self._pending = ""
+        self._started = False
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Return the complete code lines contained in `chunk`"""
+        if self._closed:
+            return []
+        self._pending += chunk
+        *lines, self._pending = self._pending.split("\n")
+        return self._filter(lines)
+
+    def close(self) -> List[str]:
+        """Return whatever is left once the stream has ended"""
+        lines = [self._pending] if self._pending else []
+        self._pending = ""
+        return self._filter(lines)
+
+    def _filter(self, lines: List[str]) -> List[str]:
+        code_lines = []
+        for line in lines:
+            if self._closed:
+                break
+            if line.strip().startswith(FENCE):
+                if self._started or code_lines:
+                    self._closed = True
+                    break
+                self._started = True
+                continue
+            if not self._started and not code_lines and not line.startswith(CODE_STARTS):
+                # Blank lines or prose ("Here is the code:") before the code starts
+                continue
+            self._started = True
+            code_lines.append(line)
+        return code_lines
+
+
+class StreamValidator:
+    """Run preflight checks on each top-level statement as soon as it is complete"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.issues: List[PreflightIssue] = []
+        self.scene_names: List[str] = []
+        self._class_names: List[str] = []
+        self._checked_upto = 0
+        self._header: Optional[List[str]] = None
+
+    @property
+    def fatal(self) -> bool:
+        return any(issue.severity == ERROR for issue in self.issues)
+
+    def feed_line(self, line: str):
+        starts_statement = line[:1] not in ("", " ", "\t", "#", ")", "]", "}")
+        if starts_statement and self.lines:
+            self._check(len(self.lines))
+        self.lines.append(line)
+
+        if line.startswith("class "):
+            self._header = []
+        if self._header is not None:
+            self._header.append(line)
+            if line.split("#")[0].rstrip().endswith(":"):
+                self._check_header("\n".join(self._header))
+                self._header = None
+
+    def close(self):
+        self._check(len(self.lines))
+
+    def _check_header(self, header: str):
+        try:
+            node = ast.parse(header + "\n    pass").body[0]
+        except SyntaxError:
+            return
+        if not isinstance(node, ast.ClassDef):
+            return
+        bases = {base_name(base) for base in node.bases}
+        self._class_names.append(node.name)
+        if bases & (MANIM_SCENE_BASES | set(self.scene_names)):
+            self.scene_names.append(node.name)
+
+    def _check(self, end: int):
+        chunk = "\n".join(self.lines[self._checked_upto:end])
+        try:
+            tree = ast.parse(chunk)
+        except SyntaxError:
+            # The statement may continue (decorators, else/except clauses); wait for more
+            return
+        result = PreflightResult()
+        PreflightChecker(result).visit(tree)
+        for issue in result.issues:
+            if issue.line is not None:
+                issue.line += self._checked_upto
+        self.issues.extend(result.issues)
+        self._checked_upto = end
+
+
+class CodeStream:
+    """Iterate over clean code deltas of a streaming response.
+
+    After iteration `code` holds the fence-free code; if a fatal issue was
+    found `aborted` is set and iteration stopped early.
+    """
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = chunks
+        self._fences = FenceStripper()
+        self.validator = StreamValidator()
+        self.aborted = False
+        self.finished = False
+        self._lines: List[str] = []
+
+    @property
+    def code(self) -> str:
+        return "\n".join(self._lines).strip()
+
+    @property
+    def issues(self) -> List[PreflightIssue]:
+        return self.validator.issues
+
+    def _accept(self, lines: List[str]) -> str:
+        for line in lines:
+            self._lines.append(line)
+            self.validator.feed_line(line)
+        return "".join(line + "\n" for line in lines)
+
+    def __iter__(self) -> Iterator[str]:
+        if self.finished:
+            return
+        for chunk in self._chunks:
+            delta = self._accept(self._fences.feed(chunk))
+            if delta:
+                yield delta
+            if self.validator.fatal:
+                self.aborted = self.finished = True
+                return
+        delta = self._accept(self._fences.close())
+        self.validator.close()
+        self.aborted = self.validator.fatal
+        self.finished = True
+        if delta:
+            yield delta
+
+    def result(self) -> str:
+        """Consume the rest of the stream and return the code, or raise on a fatal issue"""
+        for _ in self:
+            pass
+        if self.aborted:
+            raise EarlyValidationError([i for i in self.issues if i.severity == ERROR])
+        return self.code
+
+
+def response_chunks(response) -> Iterator[str]:
+    """Text of each chunk of a streamed generate_content response"""
+    for chunk in response:
+        text = getattr(chunk, "text", "")
+        if text:
+            yield text
+
@@ -0,0 +1,292 @@
+"""
+Index of requests whose generated code rendered successfully.
+
+Every successful render of a standalone request adds its (prompt, code,
+render seconds) to a local BM25 index. Generators use it two ways:
+
+- `search` returns the k most similar earlier requests. Their code goes
+  into the LLM prompt as few-shot examples of code that is known to render
+  on this setup.
+- `match` returns an earlier request with the same words as the new one,
+  up to case, punctuation and articles. Its code is reused without calling
+  the LLM at all. Near matches are only reused when a reuse similarity
+  below 1 is configured: one changed word ("red" for "blue", "left" for
+  "right") is a different animation.
+
+For BM25 scoring, prompts are tokenized into lowercase words without stop
+words and with a plural "s" stripped. Matching keeps those words, since
+"to", "from" or "in" change what a request asks for.
+Postings (term, example, term frequency) live in SQLite
+next to the examples, so adding an example is a few inserts and nothing is
+rebuilt. Document frequencies and the average length are aggregated when a
+query runs. One example is kept per normalized prompt; the latest successful
+code replaces the earlier one.
+
+Edits of existing code ("make it red") depend on the code being edited, so
+they are not indexed. Whether a request was an edit is decided per request
+by `is_edit`: the model is asked to keep the scene class when it edits, so
+code that shares a scene class with the code it was shown is an edit, and
+a new scene answers a new request even in the middle of a conversation.
+"""
+
+import ast
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import List, Optional
+
+from generation_cache import normalize_prompt
+
+DEFAULT_INDEX_PATH = Path(__file__).parent / "media" / "cache" / "examples.db"
+DEFAULT_MAX_ENTRIES = 10000
+# Examples put into each prompt
+DEFAULT_EXAMPLES = 2
+# Word-sequence similarity at which a stored example is reused without the LLM; 1 means the same words
+DEFAULT_REUSE_SIMILARITY = 1.0
+# Longer examples cost more tokens than they are worth as context
+MAX_EXAMPLE_CHARS = 4000
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Words a match may differ in; everything else must be the same
+MATCH_FILLER = {"a", "an", "the", "please"}
+# Words left out of BM25 scoring only
+STOP_WORDS = {
+    "a", "an", "the", "of", "to", "and", "or", "in", "on", "at", "for", "with", "by", "from", "as", "that",
+    "this", "it", "its", "is", "are", "be", "me", "i", "you", "please", "can", "could", "would", "some",
+    "show", "create", "make", "draw", "animate", "animation", "generate", "scene", "video", "using",
+}
+
+
+def words(prompt: str) -> List[str]:
+    """Words of `prompt` in order, without articles; what a match compares"""
+    return [w for w in re.findall(r"[^\W_]+", normalize_prompt(prompt)) if w not in MATCH_FILLER]
+
+
+def match_key(prompt: str) -> str:
+    return " ".join(words(prompt))
+
+
+def tokenize(prompt: str) -> List[str]:
+    """BM25 terms of `prompt` in order: content words with a plural "s" stripped"""
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+            for w in words(prompt) if w not in STOP_WORDS]
+
+
+@dataclass
+class Example:
+    prompt: str
+    code: str
+    render_seconds: Optional[float]
+    score: float = 0.0
+    similarity: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "prompt": self.prompt,
+            "code": self.code,
+            "render_seconds": self.render_seconds,
+            "score": round(self.score, 3),
+            "similarity": round(self.similarity, 3),
+        }
+
+
+def similarity(a: List[str], b: List[str]) -> float:
+    """How closely two token sequences agree, order included (1.0 means equal)"""
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def few_shot_section(examples: List[Example]) -> str:
+    """Prompt text listing `examples`; empty when there are none"""
+    if not examples:
+        return ""
+    parts = ["\nThese similar requests were rendered successfully with the code below. "
+             "Reuse what fits, but do what the new request asks:\n"]
+    for example in examples:
+        parts.append(f"Request: {example.prompt}\n```python\n{example.code.strip()}\n```\n")
+    return "\n".join(parts)
+
+
+def scene_classes(code: str) -> set:
+    """Names of the classes defined at the top level of `code`"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return set()
+    return {node.name for node in tree.body if isinstance(node, ast.ClassDef)}
+
+
+def is_edit(code: str, previous_code: Optional[str]) -> bool:
+    """Whether `code` edits `previous_code` rather than answering a request of its own"""
+    return bool(previous_code) and bool(scene_classes(code) & scene_classes(previous_code))
+
+
+class ExampleIndex:
+    """SQLite-backed BM25 index of successful prompt/code pairs"""
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 examples: int = DEFAULT_EXAMPLES, reuse_similarity: float = DEFAULT_REUSE_SIMILARITY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.examples = examples
+        self.reuse_similarity = reuse_similarity
+        self.searches = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS examples ("
+            " id INTEGER PRIMARY KEY, prompt TEXT NOT NULL, normalized TEXT NOT NULL UNIQUE,"
+            " code TEXT NOT NULL, render_seconds REAL, length INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, reused INTEGER NOT NULL DEFAULT 0, match_key TEXT)"
+        )
+        if "match_key" not in {row[1] for row in self._db.execute("PRAGMA table_info(examples)")}:
+            # Indexes written before exact matching get their keys filled in once
+            self._db.execute("ALTER TABLE examples ADD COLUMN match_key TEXT")
+            self._db.executemany("UPDATE examples SET match_key = ? WHERE id = ?",
+                                 [(match_key(prompt), id) for id, prompt
+                                  in self._db.execute("SELECT id, prompt FROM examples").fetchall()])
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL, example INTEGER NOT NULL REFERENCES examples (id) ON DELETE CASCADE,"
+            " tf INTEGER NOT NULL, PRIMARY KEY (term, example)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS postings_example ON postings (example)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS examples_created ON examples (created_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS examples_match_key ON examples (match_key)")
+        self._db.commit()
+
+    def add(self, prompt: str, code: str, render_seconds: Optional[float] = None):
+        """Index the code a standalone request rendered successfully with"""
+        normalized = normalize_prompt(prompt)
+        terms = tokenize(prompt)
+        if not terms or len(code) > MAX_EXAMPLE_CHARS:
+            return
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT id FROM examples WHERE normalized = ?", (normalized,)).fetchone()
+            if row is not None:
+                # Same words, so the postings stay; keep the latest working code
+                self._db.execute(
+                    "UPDATE examples SET prompt = ?, code = ?, render_seconds = ?, created_at = ?, match_key = ?"
+                    " WHERE id = ?",
+                    (prompt, code, render_seconds, now, match_key(prompt), row[0]),
+                )
+            else:
+                cursor = self._db.execute(
+                    "INSERT INTO examples (prompt, normalized, code, render_seconds, length, created_at, match_key)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (prompt, normalized, code, render_seconds, len(terms), now, match_key(prompt)),
+                )
+                self._db.executemany(
+                    "INSERT INTO postings (term, example, tf) VALUES (?, ?, ?)",
+                    [(term, cursor.lastrowid, tf) for term, tf in Counter(terms).items()],
+                )
+                self._db.execute(
+                    "DELETE FROM examples WHERE id IN ("
+                    " SELECT id FROM examples ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._db.commit()
+
+    def search(self, prompt: str, k: Optional[int] = None) -> List[Example]:
+        """The `k` indexed requests most similar to `prompt`, best first"""
+        k = self.examples if k is None else k
+        terms = set(tokenize(prompt))
+        if k <= 0 or not terms:
+            return []
+        with self._lock:
+            self.searches += 1
+            count, total_length = self._db.execute("SELECT COUNT(*), SUM(length) FROM examples").fetchone()
+            if not count:
+                return []
+            placeholders = ",".join("?" * len(terms))
+            postings = self._db.execute(
+                "SELECT p.term, p.example, p.tf, e.length FROM postings p JOIN examples e ON e.id = p.example"
+                f" WHERE p.term IN ({placeholders})", tuple(terms),
+            ).fetchall()
+
+            document_frequency = Counter(term for term, _, _, _ in postings)
+            average_length = total_length / count
+            scores = defaultdict(float)
+            for term, example, tf, length in postings:
+                df = document_frequency[term]
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                scores[example] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / average_length))
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            rows = {
+                row[0]: row for row in self._db.execute(
+                    f"SELECT id, prompt, code, render_seconds FROM examples WHERE id IN ({','.join('?' * len(best))})",
+                    tuple(example for example, _ in best),
+                )
+            } if best else {}
+
+        query = words(prompt)
+        return [
+            Example(rows[example][1], rows[example][2], rows[example][3], score,
+                    similarity(query, words(rows[example][1])))
+            for example, score in best if example in rows
+        ]
+
+    def match(self, prompt: str) -> Optional[Example]:
+        """A stored example for the same request, whose code can be reused as is"""
+        key = match_key(prompt)
+        if not key or self.reuse_similarity > 1:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT prompt, code, render_seconds FROM examples WHERE match_key = ?"
+                " ORDER BY created_at DESC LIMIT 1", (key,),
+            ).fetchone()
+        example = Example(*row, similarity=1.0) if row else None
+        if example is None and self.reuse_similarity < 1:
+            # Near matches only when asked for; they may differ in a word that matters
+            candidates = [candidate for candidate in self.search(prompt, 3)
+                          if candidate.similarity >= self.reuse_similarity]
+            example = max(candidates, key=lambda candidate: candidate.similarity) if candidates else None
+        if example is None:
+            return None
+        with self._lock:
+            self.reused += 1
+            self._db.execute("UPDATE examples SET reused = reused + 1 WHERE normalized = ?",
+                             (normalize_prompt(example.prompt),))
+            self._db.commit()
+        return example
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM examples").fetchone()[0]
+        return {"entries": entries, "searches": self.searches, "reused": self.reused}
+
+
+_index: Optional[ExampleIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_example_index() -> ExampleIndex:
+    """Return the process-wide example index configured from the environment"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ExampleIndex(
+                Path(os.getenv("MANIM_EXAMPLE_INDEX_PATH", DEFAULT_INDEX_PATH)),
+                int(os.getenv("MANIM_EXAMPLE_INDEX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                int(os.getenv("MANIM_FEW_SHOT_EXAMPLES", DEFAULT_EXAMPLES)),
+                float(os.getenv("MANIM_EXAMPLE_REUSE_SIMILARITY", DEFAULT_REUSE_SIMILARITY)),
+            )
+        return _index
@@ -0,0 +1,165 @@
+"""
+Cache of LLM-generated Manim code.
+
+Identical requests (the example buttons, resubmitted prompts) are answered
+from disk instead of calling the model again. Entries are keyed by the
+normalized prompt, the system prompt version and the model name, expire after
+a TTL and are evicted least-recently-used beyond a size limit. Concurrent
+identical requests are deduplicated: one caller generates, the rest wait for
+its result.
+
+The cache doesn't know about any particular model; `get_or_generate` takes
+the generating function, so a local stub model works the same way.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / "media" / "cache" / "generations.db"
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a user prompt so trivial variations share a cache entry"""
+    prompt = unicodedata.normalize("NFKC", prompt).casefold()
+    prompt = re.sub(r"\s+", " ", prompt).strip()
+    return prompt.rstrip(".!?").strip()
+
+
+def generation_key(prompt: str, prompt_version: str, model_name: str, context: str = "") -> str:
+    """Build the cache key; `context` covers extra prompt input such as code being edited"""
+    digest = hashlib.sha256()
+    for part in (normalize_prompt(prompt), prompt_version, model_name, context):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """SQLite-backed LRU + TTL cache with single-flight generation"""
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS generations_accessed ON generations (accessed_at)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            self._db.execute("UPDATE generations SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO generations (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        self._db.execute("DELETE FROM generations WHERE created_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM generations WHERE key IN ("
+            " SELECT key FROM generations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def get_or_generate(self, key: str, generate: Callable[[], Optional[str]]) -> Optional[str]:
+        """Return the cached value for `key`, generating it once if missing.
+
+        Falsy results and exceptions are passed to every waiting caller but
+        never stored, so failed generations are retried next time.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = generate()
+            if value:
+                self.put(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_in_flight": self.shared,
+            "hit_ratio": (self.hits + self.shared) / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+_cache: Optional[GenerationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache() -> GenerationCache:
+    """Return the process-wide generation cache configured from the environment"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GenerationCache(
+                Path(os.getenv("MANIM_GENERATION_CACHE_PATH", DEFAULT_CACHE_PATH)),
+                float(os.getenv("MANIM_GENERATION_CACHE_TTL", DEFAULT_TTL)),
+                int(os.getenv("MANIM_GENERATION_CACHE_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            )
+        return _cache
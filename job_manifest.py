@@ -0,0 +1,144 @@
+"""
+Exact output paths and per-job manifests for renders.
+
+Each render job owns a workspace directory. Manim is told to write the final
+video straight to ``<workspace>/video.mp4`` (through ``video_dir`` and
+``output_file``), and a ``manifest.json`` next to it records what was
+rendered. Finding a job's video is then a single path lookup instead of a scan
+over every video ever rendered.
+
+Jobs that belong to a conversation share that conversation's partial movie
+directory. Manim names each partial movie after a hash of the ``self.play``
+call that produced it, so when an edited scene is rendered again only the
+changed animations are rendered and the rest are reused.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from tex_cache import get_tex_cache
+
+OUTPUT_NAME = "video"
+# Partial movies kept per conversation before Manim deletes the oldest
+MAX_PARTIAL_MOVIES = 1000
+MANIFEST_NAME = "manifest.json"
+CONFIG_NAME = "manim.cfg"
+
+
+@dataclass
+class JobManifest:
+    job_id: str
+    scene: Optional[str]
+    quality: str
+    path: str
+    bytes: int
+    duration: Optional[float] = None
+    render_seconds: Optional[float] = None
+    cached: bool = False
+    created_at: float = field(default_factory=time.time)
+    # Seconds per render stage, see stage_timing.STAGES
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def output_path(workspace: Path, extension: str = ".mp4") -> Path:
+    """Return the exact path Manim writes the job's video to"""
+    return Path(workspace) / f"{OUTPUT_NAME}{extension}"
+
+
+def manim_overrides(workspace: Path, conversation_dir: Optional[Path] = None) -> dict:
+    """Manim config overrides that send the final video (or still) to `output_path`
+
+    With `conversation_dir`, partial movies go to a directory shared by every
+    render in the conversation so unchanged animations are reused.
+    """
+    workspace = Path(workspace).resolve()
+    overrides = {
+        "media_dir": str(workspace / "media"),
+        "video_dir": str(workspace),
+        "images_dir": str(workspace),
+        "tex_dir": str(get_tex_cache().unmanaged_dir),
+        "output_file": OUTPUT_NAME,
+    }
+    if conversation_dir is not None:
+        partial_dir = Path(conversation_dir).resolve() / "partial_movie_files"
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        overrides["partial_movie_dir"] = str(partial_dir)
+        overrides["max_files_cached"] = MAX_PARTIAL_MOVIES
+    return overrides
+
+
+def conversation_dir(root: Path, conversation_id: str) -> Path:
+    """Return the persistent workspace of a conversation"""
+    if not conversation_id.replace("-", "").replace("_", "").isalnum():
+        raise ValueError(f"Invalid conversation id: {conversation_id!r}")
+    path = Path(root) / conversation_id
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def write_manim_config(workspace: Path, overrides: dict) -> Path:
+    """Write `overrides` as a manim.cfg for `manim --config_file`"""
+    cfg_path = Path(workspace) / CONFIG_NAME
+    lines = ["[CLI]"] + [f"{key} = {value}" for key, value in overrides.items()]
+    cfg_path.write_text("\n".join(lines) + "\n")
+    return cfg_path
+
+
+def probe_duration(video: Path) -> Optional[float]:
+    """Return the duration of a video in seconds, or None if it can't be read"""
+    try:
+        import av
+        with av.open(str(video)) as container:
+            if container.duration is not None:
+                return container.duration / 1_000_000
+    except Exception:
+        pass
+    if shutil.which("ffprobe"):
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(video)],
+            capture_output=True, text=True,
+        )
+        try:
+            return float(result.stdout.strip())
+        except ValueError:
+            pass
+    return None
+
+
+def write_manifest(workspace: Path, job_id: str, video: Path, scene: Optional[str], quality: str,
+                   duration: Optional[float] = None, render_seconds: Optional[float] = None,
+                   cached: bool = False, timings: Optional[Dict[str, float]] = None) -> JobManifest:
+    """Record a finished render in `<workspace>/manifest.json`"""
+    video = Path(video)
+    manifest = JobManifest(
+        job_id=job_id,
+        scene=scene,
+        quality=quality,
+        path=str(video.resolve()),
+        bytes=video.stat().st_size,
+        duration=duration if duration is not None else probe_duration(video),
+        render_seconds=render_seconds,
+        cached=cached,
+        timings=timings or {},
+    )
+    manifest_path = Path(workspace) / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(asdict(manifest), indent=2))
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def read_manifest(workspace: Path) -> Optional[JobManifest]:
+    """Load a job's manifest, or None if the job never finished"""
+    try:
+        data = json.loads((Path(workspace) / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return JobManifest(**data)
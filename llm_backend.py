@@ -0,0 +1,410 @@
+"""
+One process-wide backend for LLM code generation.
+
+Every client used to configure its own Gemini model at import time, with no
+timeouts, retries or limits, so a batch run or a few Streamlit users hitting
+the per-minute quota at once failed outright. `LLMBackend` sits between the
+clients and a provider and adds:
+
+- one provider client per process, so its HTTP/gRPC connections are reused;
+- a token bucket that keeps requests under the provider's per-minute quota,
+  and a bound on the number of requests in flight;
+- a timeout on the first chunk and between chunks, and retries with
+  full-jitter exponential backoff on 429, 5xx and timeouts. A streamed
+  request is only retried before its first chunk, since the caller has
+  already seen everything after that;
+- optional hedging: when the first chunk hasn't arrived after `hedge_after`
+  seconds, the same request is sent again if the rate limit has a token to
+  spare, and whichever answers first is used.
+
+The backend runs its own event loop in a daemon thread, so synchronous
+callers (Streamlit, the CLI clients, batch threads) and async callers share
+one rate limit and one concurrency bound. Providers are blocking iterators of
+text chunks: `GeminiProvider`, and `MockProvider`, which answers
+deterministically from canned responses so benchmarks and CI never touch the
+network (MANIM_LLM_PROVIDER=mock).
+"""
+
+import asyncio
+import hashlib
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+
+from code_stream import response_chunks
+
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_BURST = 10
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_RETRIES = 4
+# The wait before retry n is uniform in [0, min(BACKOFF_CAP, BACKOFF_BASE * 2**n)]
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# google.api_core exceptions by name, for errors that carry no HTTP code
+_STATUS_NAMES = {
+    "TooManyRequests": 429, "ResourceExhausted": 429, "InternalServerError": 500,
+    "BadGateway": 502, "ServiceUnavailable": 503, "GatewayTimeout": 504, "DeadlineExceeded": 504,
+}
+
+_END = object()
+
+
+class LLMError(Exception):
+    """A failed LLM request; `status` is its HTTP status when there was one"""
+
+    def __init__(self, message: str, status: Optional[int] = None, timeout: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.timeout = timeout
+
+    @property
+    def retryable(self) -> bool:
+        return self.timeout or self.status in RETRYABLE_STATUSES
+
+
+class LLMUnavailable(Exception):
+    """Raised when the configured provider can't be set up (missing key or package)"""
+
+
+def _as_error(exc: Exception) -> LLMError:
+    if isinstance(exc, LLMError):
+        return exc
+    status = getattr(exc, "code", None)
+    if not (isinstance(status, int) and 100 <= status < 600):
+        status = next((_STATUS_NAMES[cls.__name__] for cls in type(exc).__mro__ if cls.__name__ in _STATUS_NAMES),
+                      None)
+    return LLMError(f"{type(exc).__name__}: {exc}", status)
+
+
+class GeminiProvider:
+    """Google Gemini through google-generativeai"""
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, api_key: Optional[str] = None):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise LLMUnavailable("Please set GEMINI_API_KEY environment variable (or MANIM_LLM_PROVIDER=mock)")
+        try:
+            import google.generativeai as genai
+        except ImportError as e:
+            raise LLMUnavailable("Please install google-generativeai: pip install google-generativeai") from e
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        response = self.model.generate_content(prompt, stream=True, request_options={"timeout": timeout})
+        yield from response_chunks(response)
+
+
+class MockProvider:
+    """Offline provider whose response depends only on the prompt
+
+    `latency` delays the first chunk and every `fail_every`-th request fails
+    with a 429, to exercise the rate limiting and retries without a network.
+    """
+
+    def __init__(self, responses: Optional[List[str]] = None, chunk_size: int = 16, latency: float = 0.0,
+                 fail_every: int = 0, model_name: str = "mock"):
+        self.responses = responses or [DEFAULT_MOCK_RESPONSE]
+        self.chunk_size = chunk_size
+        self.latency = latency
+        self.fail_every = fail_every
+        self.model_name = model_name
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def stream(self, prompt: str, timeout: float) -> Iterator[str]:
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and call % self.fail_every == 0:
+            raise LLMError("Mock quota exceeded", status=429)
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        text = self.responses[int.from_bytes(digest[:4], "big") % len(self.responses)]
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+
+
+class TokenBucket:
+    """Allows `per_minute` requests a minute on average, in bursts of up to `burst`
+
+    Only used from the backend's event loop, so it needs no lock.
+    """
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True  # unlimited
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self) -> float:
+        """Wait for a token; returns the seconds waited"""
+        waited = 0.0
+        while not self.try_acquire():
+            delay = (1 - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+class _Request:
+    """One provider request, streaming its chunks from a thread into the loop"""
+
+    def __init__(self, backend: "LLMBackend", prompt: str):
+        self.loop = asyncio.get_running_loop()
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.cancelled = threading.Event()
+        backend._executor.submit(self._pump, backend.provider, prompt, backend.timeout)
+
+    def _put(self, item):
+        self.loop.call_soon_threadsafe(self.chunks.put_nowait, item)
+
+    def _pump(self, provider, prompt: str, timeout: float):
+        try:
+            for text in provider.stream(prompt, timeout):
+                if self.cancelled.is_set():
+                    return
+                self._put(text)
+            self._put(_END)
+        except Exception as e:
+            self._put(_as_error(e))
+
+    async def next(self, timeout: float) -> Optional[str]:
+        """The next chunk, or None at the end of the response"""
+        try:
+            item = await asyncio.wait_for(self.chunks.get(), timeout)
+        except asyncio.TimeoutError:
+            self.cancel()
+            raise LLMError(f"No response within {timeout:g}s", timeout=True) from None
+        if isinstance(item, LLMError):
+            raise item
+        return None if item is _END else item
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class LLMBackend:
+    """Rate-limited, retrying access to one LLM provider, shared by every caller in the process"""
+
+    def __init__(self, provider, requests_per_minute: float = 0, burst: int = DEFAULT_BURST,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 retries: int = DEFAULT_RETRIES, hedge_after: Optional[float] = None):
+        self.provider = provider
+        self.model_name = provider.model_name
+        self.bucket = TokenBucket(requests_per_minute, burst)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge_after = hedge_after or None
+        # Hedges run beside the requests they back up
+        self._executor = ThreadPoolExecutor(max_workers=2 * self.concurrency, thread_name_prefix="llm")
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failed = 0
+        self.throttled_seconds = 0.0
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True, name="llm-backend").start()
+            return self._loop
+
+    async def _first_chunk(self, prompt: str):
+        """Send the request (and a hedge if it is slow); returns the winning request and its first chunk"""
+        primary = _Request(self, prompt)
+        first = asyncio.ensure_future(primary.next(self.timeout))
+        if self.hedge_after is None:
+            return primary, await first
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done or not self.bucket.try_acquire():
+            return primary, await first
+
+        self.hedged += 1
+        backup = _Request(self, prompt)
+        racers = {first: primary, asyncio.ensure_future(backup.next(self.timeout)): backup}
+        error = None
+        while racers:
+            done, _ = await asyncio.wait(racers, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                request = racers.pop(task)
+                try:
+                    text = task.result()
+                except LLMError as e:
+                    error = e
+                    continue
+                for other_task, other in racers.items():
+                    other_task.cancel()
+                    other.cancel()
+                if request is backup:
+                    self.hedge_wins += 1
+                return request, text
+        raise error
+
+    async def _stream(self, prompt: str) -> AsyncIterator[str]:
+        attempt = 0
+        while True:
+            self.throttled_seconds += await self.bucket.acquire()
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    request, text = await self._first_chunk(prompt)
+                except LLMError as e:
+                    if not e.retryable or attempt >= self.retries:
+                        self.failed += 1
+                        raise
+                else:
+                    try:
+                        while text is not None:
+                            yield text
+                            text = await request.next(self.timeout)
+                    except LLMError:
+                        self.failed += 1
+                        raise
+                    finally:
+                        request.cancel()
+                    return
+            attempt += 1
+            self.retried += 1
+            await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+    async def _pump(self, prompt: str, put: Callable):
+        """Run a request on the backend loop, handing chunks, then _END or the error, to `put`"""
+        chunks = self._stream(prompt)
+        try:
+            async for text in chunks:
+                put(text)
+            put(_END)
+        except Exception as e:
+            put(e)
+        finally:
+            await chunks.aclose()
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Text chunks of the response to `prompt`; stopping early cancels the request"""
+        chunks: queue.Queue = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._pump(prompt, chunks.put), self._get_loop())
+        try:
+            while True:
+                item = chunks.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Async version of `stream` for callers on any event loop"""
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._pump(prompt, lambda item: loop.call_soon_threadsafe(chunks.put_nowait, item)), self._get_loop())
+        try:
+            while True:
+                item = await chunks.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+    async def agenerate(self, prompt: str) -> str:
+        return "".join([text async for text in self.astream(prompt)])
+
+    def stats(self) -> dict:
+        return {
+            "provider": type(self.provider).__name__,
+            "model": self.model_name,
+            "requests": self.requests,
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failed": self.failed,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+def create_llm_backend(provider: Optional[str] = None, **overrides) -> LLMBackend:
+    """Build a backend configured from the environment; keyword arguments override LLMBackend settings"""
+    provider = provider or os.getenv("MANIM_LLM_PROVIDER", "gemini")
+    model_name = os.getenv("MANIM_LLM_MODEL", DEFAULT_MODEL)
+    if provider == "mock":
+        client = MockProvider(latency=float(os.getenv("MANIM_LLM_MOCK_LATENCY", "0")))
+    elif provider == "gemini":
+        client = GeminiProvider(model_name)
+    else:
+        raise LLMUnavailable(f"Unknown MANIM_LLM_PROVIDER '{provider}' (use gemini or mock)")
+    settings = {
+        "requests_per_minute": float(os.getenv("MANIM_LLM_RPM", DEFAULT_REQUESTS_PER_MINUTE)),
+        "burst": int(os.getenv("MANIM_LLM_BURST", DEFAULT_BURST)),
+        "concurrency": int(os.getenv("MANIM_LLM_CONCURRENCY", DEFAULT_CONCURRENCY)),
+        "timeout": float(os.getenv("MANIM_LLM_TIMEOUT", DEFAULT_TIMEOUT)),
+        "retries": int(os.getenv("MANIM_LLM_RETRIES", DEFAULT_RETRIES)),
+        "hedge_after": float(os.getenv("MANIM_LLM_HEDGE_AFTER", "0")) or None,
+    }
+    settings.update(overrides)
+    return LLMBackend(client, **settings)
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_backend() -> LLMBackend:
+    """Return the process-wide LLM backend configured from the environment
+
+    Raises LLMUnavailable when the provider can't be set up.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_llm_backend()
+        return _backend
+
+
+DEFAULT_MOCK_RESPONSE = '''```python
+from manim import *
+
+class CircleToSquare(Scene):
+    def construct(self):
+        circle = Circle(color=BLUE)
+        square = Square(color=GREEN)
+        self.play(Create(circle))
+        self.play(Transform(circle, square))
+        self.wait(1)
+```
+'''
@@ -1,71 +1,366 @@
-import subprocess
+import asyncio
+import json
+import mimetypes
 import tempfile
 import os
-import shutil
-from mcp.server.fastmcp import FastMCP
+import time
+from dataclasses import asdict
+from typing import Optional
+from mcp.server.fastmcp import Context, FastMCP
+from example_index import few_shot_section, get_example_index
+from job_manifest import conversation_dir, read_manifest
+from media_server import CHUNK_SIZE, media_url, read_range, serve_media
+from media_store import DEFAULT_EVICT_INTERVAL, get_media_store
+from preflight import ERROR, PreflightIssue, PreflightResult, preflight
+from render_cache import cache_key, get_render_cache
+from render_jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, QueueFull, RenderJob, RenderQueue
+from render_cluster import DEFAULT_CLUSTER_PARALLEL, get_coordinator, serve_coordinator, start_local_nodes
+from render_cost import get_cost_model, scene_features
+from render_limits import get_admission_controller
+from render_profiles import DEFAULT_PROFILE, RenderProfile, get_profile
+from render_runner import render_job
+from server_metrics import Metrics, Tracer, serve_prometheus
+from tex_cache import get_tex_cache
 
 mcp = FastMCP()
 
-MANIM_EXECUTABLE_PATH = os.getenv("MANIM_EXECUTABLE", "manim")
+media_store = get_media_store()
+BASE_DIR = str(media_store.root)
+os.makedirs(BASE_DIR, exist_ok=True)
 
-print(MANIM_EXECUTABLE_PATH)
+CONVERSATIONS_DIR = os.path.join(BASE_DIR, "conversations")
+
+metrics = Metrics()
+cost_model = get_cost_model()
+example_index = get_example_index()
+# Opt-in: one JSON line per span of every render
+tracer = Tracer(os.getenv("MANIM_TRACE_FILE"))
+
+
+def _record_render(job: RenderJob):
+    """Update render metrics and trace spans for a finished job (blocks; runs off the event loop)"""
+    metrics.inc("renders_total", help="Finished renders by status", status=job.status)
+    if job.status == FAILED:
+        error_class = (job.error_detail or {}).get("type", "RenderFailed")
+        metrics.inc("render_failures_total", help="Failed renders by error class", error=error_class)
+    manifest = read_manifest(job.workspace) if job.status == SUCCEEDED else None
+    if manifest is not None and job.started_at is not None:
+        metrics.observe("render_duration_seconds", job.finished_at - job.started_at,
+                        help="Render wall-clock time by render profile", profile=manifest.quality)
+        for stage, seconds in manifest.timings.items():
+            metrics.observe("render_stage_seconds", seconds, help="Render time by stage", stage=stage)
+        if not manifest.cached:
+            metrics.inc("media_bytes_written_total", manifest.bytes, help="Bytes of rendered media written")
+            if job.estimate and manifest.render_seconds:
+                metrics.observe("render_estimate_ratio", manifest.render_seconds / job.estimate,
+                                help="Measured over estimated render time")
+            if manifest.timings:
+                # Calibrate the estimator on what this render actually cost
+                checked = preflight(job.code)
+                if checked.tree is not None:
+                    cost_model.record(scene_features(checked.tree, job.scene_name), get_profile(job.profile),
+                                      manifest.timings)
+    if job.status == SUCCEEDED and job.prompt:
+        example_index.add(job.prompt, job.code, job.finished_at - job.started_at if job.started_at else None)
+    tracer.render_spans(job.id, job.created_at, job.started_at, job.finished_at,
+                        manifest.timings if manifest else {}, status=job.status, scene=job.scene_name)
+
+
+# With MANIM_COORDINATOR_PORT, render nodes do the rendering (see render_cluster.py)
+coordinator = get_coordinator(media_store)
+render_queue = RenderQueue(
+    coordinator.run if coordinator else render_job,
+    os.path.join(BASE_DIR, "jobs"),
+    max_parallel=int(os.getenv("MANIM_MAX_PARALLEL_RENDERS",
+                               DEFAULT_CLUSTER_PARALLEL if coordinator else min(2, os.cpu_count() or 1))),
+    on_finish=_record_render,
+    admission=get_admission_controller(),
+)
+
+metrics.gauge("renders_in_flight", lambda: render_queue.count(RUNNING), help="Renders running now")
+metrics.gauge("render_queue_depth", lambda: render_queue.count(QUEUED), help="Renders waiting for a slot")
+metrics.gauge("render_slots", lambda: render_queue.max_parallel, help="Renders that may run at once")
+metrics.gauge("cache_hit_ratio", lambda: {
+    "render": get_render_cache().stats()["hit_ratio"],
+    "tex": get_tex_cache().stats()["hit_ratio"],
+}, help="Hit ratio of each cache since it was created", label="cache")
+metrics.gauge("cache_bytes", lambda: {
+    "render": get_render_cache().stats()["bytes"],
+    "tex": get_tex_cache().stats()["bytes"],
+}, help="Bytes stored in each cache", label="cache")
+metrics.gauge("media_bytes", lambda: media_store.stats()["bytes"], help="Bytes of rendered media kept in the media store")
+metrics.gauge("renders_admission", lambda: {
+    "deferred": render_queue.admission.deferred,
+    "rejected": render_queue.admission.rejected,
+}, help="Renders held back or refused because the host was overloaded", label="outcome")
+
+
+async def _wait_with_progress(job: RenderJob, ctx: Optional[Context], timeout: float) -> RenderJob:
+    """Wait for a job, sending MCP progress notifications (elapsed seconds) meanwhile"""
+    deadline = time.monotonic() + timeout
+    started = time.monotonic()
+    while not job.finished and time.monotonic() < deadline:
+        if ctx is not None:
+            await ctx.report_progress(round(time.monotonic() - started, 1))
+        try:
+            await render_queue.wait(job.id, timeout=min(1.0, max(0.0, deadline - time.monotonic())))
+        except asyncio.TimeoutError:
+            pass
+    return job
+
+
+def _preflight(manim_code: str, scene_name: Optional[str]) -> PreflightResult:
+    """Check the code before it takes a render slot and resolve the scene to render"""
+    result = preflight(manim_code)
+    if scene_name and result.scenes and scene_name not in result.scenes:
+        result.issues.append(PreflightIssue(
+            ERROR, "unknown-scene", f"Scene '{scene_name}' not found; available: {', '.join(result.scenes)}"
+        ))
+    elif scene_name:
+        result.default_scene = scene_name
+    return result
+
+
+def _estimate(manim_code: str, checked: PreflightResult, profile: RenderProfile) -> float:
+    """Estimated seconds of the render; a cached render costs nothing"""
+    if get_render_cache().contains(cache_key(manim_code, checked.default_scene, profile.cache_flags()),
+                                   profile.extension):
+        return 0.0
+    return cost_model.estimate(scene_features(checked.tree, checked.default_scene), profile)
+
+
+def _too_expensive(estimate: float, profile: RenderProfile) -> Optional[str]:
+    if estimate > profile.limits.wall_seconds:
+        return (f"Estimated render time {estimate:.0f}s exceeds the {profile.limits.wall_seconds:g}s limit of the "
+                f"{profile.name} profile; shorten the scene or use a lighter profile")
+    return None
+
+
+def _conversation_dir(conversation_id: str):
+    if not conversation_id:
+        return None
+    return conversation_dir(CONVERSATIONS_DIR, conversation_id)
+
+
+def _job_video(job_id: str):
+    """Manifest of a finished job whose video is still in the media store, or None"""
+    if not job_id.isalnum():
+        return None
+    manifest = read_manifest(os.path.join(BASE_DIR, "jobs", job_id))
+    if manifest is None or media_store.entry_for(manifest.path) is None or not os.path.exists(manifest.path):
+        return None
+    return manifest
+
+
+def _video_links(job_id: str) -> dict:
+    """How a remote client can fetch a job's video: MCP resource URIs and, if served, an HTTP URL"""
+    manifest = _job_video(job_id)
+    if manifest is None:
+        return {}
+    return {
+        "resource": f"manim://jobs/{job_id}",
+        "chunks": f"manim://jobs/{job_id}/video/{{offset}}/{{length}}",
+        "bytes": manifest.bytes,
+        "mime_type": mimetypes.guess_type(manifest.path)[0] or "application/octet-stream",
+        "url": media_url(media_store, manifest.path),
+    }
+
+
+@mcp.resource("manim://jobs/{job_id}", mime_type="application/json")
+def job_video_info(job_id: str) -> str:
+    """Size, chunk size and chunk URI template of a rendered video"""
+    links = _video_links(job_id)
+    if not links:
+        raise ValueError(f"No rendered video for job {job_id!r}")
+    return json.dumps({"job_id": job_id, "chunk_size": CHUNK_SIZE, **links})
+
+
+@mcp.resource("manim://jobs/{job_id}/video/{offset}/{length}", mime_type="application/octet-stream")
+def job_video_chunk(job_id: str, offset: str, length: str) -> bytes:
+    """Up to `length` bytes of a rendered video starting at byte `offset`"""
+    manifest = _job_video(job_id)
+    if manifest is None:
+        raise ValueError(f"No rendered video for job {job_id!r}")
+    return read_range(media_store, manifest.path, int(offset), int(length))
 
-BASE_DIR = os.path.join(os.path.dirname(__file__), "media")
-os.makedirs(BASE_DIR, exist_ok=True)
 
 @mcp.tool()
-def manin_executable_code(manim_code: str ) -> str:
+@metrics.instrument("manin_executable_code")
+async def manin_executable_code(manim_code: str, conversation_id: str = "", as_resource: bool = False,
+                                profile: str = DEFAULT_PROFILE, prompt: str = "", ctx: Context = None) -> str:
     """
-        This function take the manim_code and then run it in the file named manim_code.py
+        This function take the manim_code and then run it in its own job workspace.
+        profile is one of preview (480p15), chat (720p30) or publish (1080p60), optionally with an
+        output format suffix: publish:webm, preview:gif or chat:png (a zip of PNG frames).
         The output will be saved in the media directory and the path to the file will be returned.
+        With as_resource=True a JSON object with the video's MCP resource URIs (and HTTP URL, if the
+        media server runs) is returned instead, for clients that can't read the server's disk.
+        Renders sharing a conversation_id reuse the unchanged animations of earlier renders.
+        Scenes estimated to take longer than the profile's time limit are refused up front.
+        Pass the user's request as prompt when the code was written for it from scratch (not as an edit)
+        and a successful render adds the pair to the examples used by manim_prompt and find_example.
     """
-
-    tempDir = os.path.join(BASE_DIR, "temp")
-    os.makedirs(tempDir, exist_ok=True)
-    file_path = os.path.join(tempDir, "manim_code.py")
-
     try:
-        with open(file_path, "w") as f:
-            f.write(manim_code)
-
-        # Run the manim command
-        result = subprocess.run(
-            [MANIM_EXECUTABLE_PATH, "-p", file_path],
-            capture_output=True,
-            text=True,
-            cwd=tempDir,
-        )
-
-        if result.returncode == 0:
-            # Find the output file in the media directory
-            media_dir = os.path.join(BASE_DIR, "media")
-            output_files = os.listdir(media_dir)
-            if output_files:
-                # Assuming the first file is the one we want
-                output_file = os.path.join(media_dir, output_files[0])
-                return output_file
-            else:
-                return "No output files found."
-        else:
-            return f"Error: {result.stderr}"
+        render_profile = get_profile(profile)
+        checked = _preflight(manim_code, None)
+        if not checked.ok:
+            return f"Error: Preflight failed:\n{checked.format_errors()}"
+        estimate = _estimate(manim_code, checked, render_profile)
+        too_expensive = _too_expensive(estimate, render_profile)
+        if too_expensive:
+            return f"Error: {too_expensive}"
+        job = await render_queue.submit(manim_code, checked.default_scene, _conversation_dir(conversation_id), profile,
+                                        estimate=estimate, client=conversation_id, prompt=prompt)
+        await _wait_with_progress(job, ctx, timeout=float("inf"))
+        if job.status == SUCCEEDED:
+            if as_resource:
+                return json.dumps({"job_id": job.id, **_video_links(job.id)})
+            return job.video
+        return f"Error: {job.error}"
     except Exception as e:
         return f"An error occurred: {str(e)}"
 
 
 @mcp.tool()
-def clean_manim_media(directory: str) -> str:
+@metrics.instrument("submit_render", is_error=lambda result: result.get("status") == "rejected")
+async def submit_render(manim_code: str, scene_name: str = "", conversation_id: str = "",
+                        profile: str = DEFAULT_PROFILE, prompt: str = "") -> dict:
+    """
+        Queue the manim_code for rendering and return the job id immediately.
+        Use render_status to poll it and fetch_render to get the video.
+        profile is one of preview (480p15), chat (720p30) or publish (1080p60), optionally with an
+        output format suffix such as publish:webm or preview:gif.
+        Renders sharing a conversation_id reuse the unchanged animations of earlier renders.
+        Jobs are scheduled by estimated cost, shared fairly between conversations; scenes
+        estimated to take longer than the profile's time limit are rejected.
+        prompt is the user's request the code was written for, as for manin_executable_code.
+    """
+    checked = _preflight(manim_code, scene_name or None)
+    if not checked.ok:
+        return {"job_id": None, "status": "rejected", "preflight": checked.to_dict()}
+    try:
+        conversation = _conversation_dir(conversation_id)
+        render_profile = get_profile(profile)
+    except ValueError as e:
+        return {"job_id": None, "status": "rejected", "error": str(e)}
+    estimate = _estimate(manim_code, checked, render_profile)
+    too_expensive = _too_expensive(estimate, render_profile)
+    if too_expensive:
+        return {"job_id": None, "status": "rejected", "error": too_expensive, "estimated_seconds": round(estimate, 1)}
+    try:
+        job = await render_queue.submit(manim_code, checked.default_scene, conversation, profile,
+                                        estimate=estimate, client=conversation_id, prompt=prompt)
+    except QueueFull as e:
+        return {"job_id": None, "status": "rejected", "error": str(e)}
+    return {**job.to_dict(), "preflight": checked.to_dict()}
+
+
+@mcp.tool()
+@metrics.instrument("render_status", is_error=lambda result: result.get("status") == "unknown")
+def render_status(job_id: str) -> dict:
+    """
+        Return the status of a render job (queued, running, succeeded, failed or cancelled).
+    """
+    job = render_queue.get(job_id)
+    if job is not None:
+        status = job.to_dict()
+        workspace = job.workspace
+    elif job_id.isalnum():
+        # Jobs pruned from memory can still be answered from their manifest
+        status = {"job_id": job_id, "status": "unknown", "error": "No such job"}
+        workspace = os.path.join(BASE_DIR, "jobs", job_id)
+    else:
+        return {"job_id": job_id, "status": "unknown", "error": "No such job"}
+    manifest = read_manifest(workspace)
+    if manifest is not None:
+        status.update(status=SUCCEEDED, video=manifest.path, error=None, manifest=asdict(manifest),
+                      **_video_links(job_id))
+    return status
+
+
+@mcp.tool()
+@metrics.instrument("cancel_render")
+def cancel_render(job_id: str) -> str:
+    """
+        Cancel a queued or running render job.
+    """
+    if render_queue.cancel(job_id):
+        return "Render cancelled."
+    return "Job not found or already finished."
+
+
+@mcp.tool()
+@metrics.instrument("fetch_render")
+async def fetch_render(job_id: str, wait: bool = True, timeout: float = 600, ctx: Context = None) -> str:
     """
-        This function will clean the media directory.
+        Return the video path of a finished render job.
+        With wait=True this blocks (sending progress notifications) until the job finishes or timeout seconds pass.
+    """
+    job = render_queue.get(job_id)
+    if job is None:
+        return "Error: No such job"
+    if wait:
+        await _wait_with_progress(job, ctx, timeout)
+    if job.status == SUCCEEDED:
+        return job.video
+    if job.finished:
+        return f"Error: {job.error}"
+    return f"Job is still {job.status}"
+
+
+@mcp.tool()
+@metrics.instrument("clean_manim_media")
+def clean_manim_media(directory: str = "") -> str:
+    """
+        Delete rendered media under the media directory, e.g. "jobs/<job_id>" or "conversations".
+        An empty directory cleans everything. Paths outside the media directory are refused,
+        and videos in use or referenced from chat history are kept.
     """
     try:
-        if os.path.exists(directory):
-            shutil.rmtree(directory)
-            return "Media directory cleaned."
-        else:
-            return "Media directory does not exist."
+        result = media_store.clean(directory)
+        message = f"Removed {result['removed']} media directories ({result['removed_bytes']} bytes)."
+        if result["skipped"]:
+            message += f" Kept {result['skipped']} in use or pinned."
+        return message
     except Exception as e:
         return f"An error occurred: {str(e)}"
-    
+
+
+@mcp.tool()
+@metrics.instrument("find_example")
+def find_example(prompt: str) -> dict:
+    """
+        Look up code that already rendered successfully for the same request (same words, ignoring case, punctuation and articles).
+        When "code" is returned it can be rendered as is, without generating new code.
+    """
+    example = example_index.match(prompt)
+    if example is None:
+        return {"match": False}
+    return {"match": True, **example.to_dict()}
+
+
+@mcp.tool()
+@metrics.instrument("server_stats")
+def server_stats() -> dict:
+    """
+        Return server metrics: tool request counts, in-flight renders, queue depth,
+        render durations by profile, failures by error class, cache hit ratios, bytes written,
+        the size of the media store, whether the host is admitting new renders, the
+        render-cost estimator's calibration, the example index and, when distributed, the render nodes.
+    """
+    return {
+        **metrics.snapshot(),
+        "queue": render_queue.stats(),
+        "admission": render_queue.admission.stats(),
+        "cost_model": cost_model.stats(),
+        "examples": example_index.stats(),
+        **({"cluster": coordinator.stats()} if coordinator else {}),
+        "render_cache": get_render_cache().stats(),
+        "tex_cache": get_tex_cache().stats(),
+        "media_store": media_store.stats(),
+    }
+
+
 @mcp.prompt()
 def manim_prompt(prompt: str) -> str:
     """
@@ -93,8 +388,19 @@ def manim_prompt(prompt: str) -> str:
 
     Return only the complete Python code without explanations or markdown formatting.
     """
-    return main_prompt
+    # Code that rendered for similar requests grounds the model in what works here
+    return main_prompt + few_shot_section(example_index.search(prompt))
 
 
 if __name__ == "__main__":
+    if os.getenv("MANIM_METRICS_PORT"):
+        serve_prometheus(metrics, int(os.getenv("MANIM_METRICS_PORT")), os.getenv("MANIM_METRICS_HOST", "127.0.0.1"))
+    if os.getenv("MANIM_MEDIA_PORT"):
+        serve_media(media_store, int(os.getenv("MANIM_MEDIA_PORT")), os.getenv("MANIM_MEDIA_HOST", "127.0.0.1"))
+    if coordinator:
+        port = int(os.getenv("MANIM_COORDINATOR_PORT"))
+        host = os.getenv("MANIM_COORDINATOR_HOST", "127.0.0.1")
+        serve_coordinator(coordinator, port, host)
+        start_local_nodes(int(os.getenv("MANIM_LOCAL_NODES", 0)), f"http://{host}:{port}")
+    media_store.start_background_eviction(float(os.getenv("MANIM_MEDIA_EVICT_INTERVAL", DEFAULT_EVICT_INTERVAL)))
     mcp.run(transport="stdio")
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Byte-range access to rendered media for clients that can't read our disk.
+
+Videos in the media store are served two ways:
+
+* `read_range` returns one bounded chunk of a video, which is what the MCP
+  server's ``manim://jobs/<id>/video/<offset>/<length>`` resource hands out;
+* `serve_media` serves the store as static files over HTTP with ``Range``
+  support, so browsers (and the Streamlit chat view) seek and stream videos
+  with ``sendfile`` instead of loading them into Python.
+
+Both hold a media store lease while they read, so eviction never removes a
+file that is being streamed. Only rendered media inside the store's areas is
+served: profile outputs and preview stills, never scene sources, configs,
+manifests or cache entries.
+
+The server binds to a local address, which a browser on another machine
+can't reach. Set ``MANIM_MEDIA_PUBLIC_URL`` to the address clients should
+use (e.g. behind a reverse proxy); without it, `media_url` hands out no
+browser URLs and the Streamlit app sends the bytes inline.
+"""
+
+import mimetypes
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote, unquote
+
+from media_store import MediaStore
+from render_profiles import FORMATS, get_profile
+
+
+CHUNK_SIZE = 1024 * 1024
+# Largest chunk a single resource read returns
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+# Profile outputs plus the last-frame preview stills
+SERVED_SUFFIXES = frozenset(
+    {get_profile().with_format(format).extension for format in FORMATS} | {".png"}
+)
+_base_url: Optional[str] = None
+_public_url: Optional[str] = None
+
+
+def resolve(store: MediaStore, relative: str) -> Path:
+    """Return the rendered media file at `relative` inside the store, refusing anything else"""
+    path = (store.root / relative.lstrip("/")).resolve()
+    if (store.entry_for(path) is None or not path.is_file() or path.name.startswith(".")
+            or path.suffix.lower() not in SERVED_SUFFIXES):
+        raise FileNotFoundError(relative)
+    return path
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive (start, end) of a single ``Range`` header, None for the whole file.
+
+    Raises ValueError when the range can't be satisfied.
+    """
+    if not header:
+        return None
+    match = _RANGE.match(header.strip())
+    if match is None or not (match.group(1) or match.group(2)):
+        return None  # multiple or malformed ranges: send the whole file
+    start, end = match.groups()
+    if not start:
+        # "bytes=-N" is the last N bytes
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end) if end else size - 1, size - 1)
+    if start >= size or start > end:
+        raise ValueError(f"Range {header!r} not satisfiable for {size} bytes")
+    return start, end
+
+
+def read_range(store: MediaStore, path: Path, offset: int, length: int = CHUNK_SIZE) -> bytes:
+    """Read up to `length` bytes (capped at MAX_CHUNK_SIZE) of `path` from `offset`"""
+    with store.lease(path):
+        store.touch(path)
+        with open(path, "rb") as f:
+            f.seek(max(0, offset))
+            return f.read(max(0, min(length, MAX_CHUNK_SIZE)))
+
+
+def media_url(store: MediaStore, path, public: bool = False) -> Optional[str]:
+    """The HTTP URL of a file in the store, or None when this process serves no media.
+
+    With `public` only ``MANIM_MEDIA_PUBLIC_URL`` counts, since the bound
+    address is useless to a browser on another machine.
+    """
+    base_url = _public_url if public else (_public_url or _base_url)
+    if base_url is None or store.entry_for(path) is None:
+        return None
+    try:
+        relative = Path(path).resolve().relative_to(store.root)
+        resolve(store, relative.as_posix())
+    except (FileNotFoundError, ValueError):
+        return None  # the server would refuse it anyway
+    return f"{base_url}/{quote(relative.as_posix())}"
+
+
+def serve_media(store: MediaStore, port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve the media store over HTTP from a daemon thread.
+
+    When the port can't be bound (e.g. another process already serves it),
+    return None and hand out no URLs, so callers fall back to inline bytes.
+    """
+    global _base_url, _public_url
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_HEAD(self):
+            self.do_GET(body=False)
+
+        def do_GET(self, body: bool = True):
+            try:
+                path = resolve(store, unquote(self.path.split("?")[0]))
+            except (FileNotFoundError, ValueError):
+                self.send_error(404)
+                return
+            with store.lease(path), open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                try:
+                    requested = parse_range(self.headers.get("Range"), size)
+                except ValueError:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.end_headers()
+                    return
+                start, end = requested or (0, size - 1)
+                self.send_response(206 if requested else 200)
+                self.send_header("Content-Type", mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(max(0, end - start + 1)))
+                if requested:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                self.end_headers()
+                if body:
+                    store.touch(path)
+                    self._send(f, start, end - start + 1)
+
+        def _send(self, f, offset: int, remaining: int):
+            self.wfile.flush()
+            try:
+                while remaining > 0:
+                    sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, min(remaining, CHUNK_SIZE))
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the player seeked elsewhere or closed the tab
+
+        def log_message(self, format, *args):
+            pass  # stdout carries the MCP protocol
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError:
+        return None
+    _base_url = f"http://{host}:{port}"
+    _public_url = os.getenv("MANIM_MEDIA_PUBLIC_URL", "").rstrip("/") or None
+    threading.Thread(target=server.serve_forever, daemon=True, name="media-http").start()
+    return server
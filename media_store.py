@@ -0,0 +1,287 @@
+"""
+Size-budgeted store for everything renders leave under ``media/``.
+
+Job workspaces, conversation partial movies, client sessions and batch
+outputs are *entries*: one directory each, directly below an area directory
+(``media/jobs/<id>``, ``media/conversations/<id>``, ...). The caches under
+``media/cache`` keep their own budgets and are not touched here.
+
+Eviction is least-recently-used by directory modification time, which
+`touch` bumps on access, and anything idle for longer than the TTL goes first.
+Two things protect an entry from eviction:
+
+* a *lease*, a shared ``flock`` on ``<entry>/.lease`` held while a render or
+  an open video stream uses it; leases from other processes count too, and
+  disappear with the process that held them;
+* a *pin*, a ``<entry>/.pin-<owner>`` marker for videos that must survive,
+  such as those referenced from chat history.
+
+`clean` is the only way to delete on request, and it refuses paths outside
+the store root. `publish` puts finished videos in place with hardlinks and
+``os.replace`` instead of copying their bytes.
+"""
+
+import fcntl
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+DEFAULT_ROOT = Path(__file__).parent / "media"
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_EVICT_INTERVAL = 300
+AREAS = ("jobs", "conversations", "sessions", "batch")
+LEASE_NAME = ".lease"
+PIN_PREFIX = ".pin-"
+# Entries younger than this are still being set up and are never evicted
+MIN_AGE = 60
+
+
+def publish(source, target) -> Path:
+    """Atomically make `target` a hardlink of `source`, copying only across filesystems.
+
+    Rendered videos are never modified after they are written, so sharing the
+    inode between a workspace, the render cache and a client's copy is safe.
+    """
+    source, target = Path(source), Path(target)
+    if source.resolve() == target.resolve():
+        return target
+    tmp_path = target.parent / f".{target.name}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return target
+
+
+@dataclass
+class MediaEntry:
+    path: Path
+    bytes: int
+    accessed_at: float
+    pinned: bool
+
+
+def _size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+class MediaStore:
+    """Budgeted, lease- and pin-aware store of render output directories"""
+
+    def __init__(self, root: Path = DEFAULT_ROOT, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evicted_entries = 0
+        self.evicted_bytes = 0
+        self._lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def entry_for(self, path) -> Optional[Path]:
+        """The entry directory containing `path`, or None if it isn't inside an area"""
+        try:
+            relative = Path(path).resolve().relative_to(self.root)
+        except ValueError:
+            return None
+        if len(relative.parts) < 2 or relative.parts[0] not in AREAS:
+            return None
+        return self.root / relative.parts[0] / relative.parts[1]
+
+    def touch(self, path):
+        """Mark the entry containing `path` as just used"""
+        entry = self.entry_for(path)
+        if entry is not None:
+            try:
+                os.utime(entry)
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def lease(self, path) -> Iterator[None]:
+        """Keep the entry containing `path` from being evicted inside this block.
+
+        Raises FileNotFoundError if the entry was evicted while waiting for the lease.
+        """
+        entry = self.entry_for(path) if path is not None else None
+        if entry is None:
+            yield
+            return
+        try:
+            lease_file = open(entry / LEASE_NAME, "a+")
+        except FileNotFoundError:
+            yield  # nothing there to protect
+            return
+        fcntl.flock(lease_file, fcntl.LOCK_SH)
+        try:
+            # The entry may have been evicted while we waited for the lock
+            if os.fstat(lease_file.fileno()).st_ino != os.stat(entry / LEASE_NAME).st_ino:
+                raise FileNotFoundError(entry)
+            os.utime(entry)
+            yield
+        finally:
+            lease_file.close()
+
+    def leases(self, *paths):
+        """Lease several paths at once; None entries are ignored"""
+        stack = [self.lease(path) for path in paths if path is not None]
+        return _nested(stack) if stack else nullcontext()
+
+    def pin(self, path, owner: str = "chat"):
+        """Never evict the entry containing `path` until `owner` unpins it"""
+        entry = self.entry_for(path)
+        if entry is not None and entry.exists():
+            (entry / f"{PIN_PREFIX}{owner}").touch()
+
+    def unpin(self, path, owner: str = "chat"):
+        entry = self.entry_for(path)
+        if entry is not None:
+            (entry / f"{PIN_PREFIX}{owner}").unlink(missing_ok=True)
+
+    def entries(self) -> List[MediaEntry]:
+        found = []
+        for area in AREAS:
+            area_dir = self.root / area
+            if not area_dir.is_dir():
+                continue
+            for path in area_dir.iterdir():
+                if not path.is_dir():
+                    continue
+                try:
+                    accessed_at = path.stat().st_mtime
+                    pinned = any(child.name.startswith(PIN_PREFIX) for child in path.iterdir())
+                except FileNotFoundError:
+                    continue  # removed since the area was listed
+                found.append(MediaEntry(path, _size(path), accessed_at, pinned))
+        return found
+
+    def _remove(self, entry: MediaEntry) -> bool:
+        """Delete an entry unless someone holds a lease on it"""
+        lease_path = entry.path / LEASE_NAME
+        try:
+            lease_file = open(lease_path, "a+")
+        except FileNotFoundError:
+            return False
+        with lease_file:
+            try:
+                fcntl.flock(lease_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            if any(child.name.startswith(PIN_PREFIX) for child in entry.path.iterdir()):
+                return False  # pinned since the scan
+            # Drop the lease file first so late lease() callers notice and retry
+            lease_path.unlink(missing_ok=True)
+            shutil.rmtree(entry.path, ignore_errors=True)
+        return True
+
+    def evict(self) -> dict:
+        """Remove expired entries, then least recently used ones until under budget"""
+        with self._lock:
+            now = time.time()
+            entries = self.entries()
+            total = sum(entry.bytes for entry in entries)
+            removed = removed_bytes = 0
+            for entry in sorted(entries, key=lambda e: e.accessed_at):
+                if entry.pinned or now - entry.accessed_at < MIN_AGE:
+                    continue
+                expired = now - entry.accessed_at > self.ttl
+                if not expired and total <= self.max_bytes:
+                    break
+                if self._remove(entry):
+                    total -= entry.bytes
+                    removed += 1
+                    removed_bytes += entry.bytes
+            self.evicted_entries += removed
+            self.evicted_bytes += removed_bytes
+            return {"removed": removed, "removed_bytes": removed_bytes, "bytes": total}
+
+    def clean(self, path: str = "") -> dict:
+        """Delete the unpinned, unleased entries at or below `path` (relative to the root)"""
+        target = (self.root / path).resolve()
+        if target != self.root and self.root not in target.parents:
+            raise ValueError(f"{path!r} is outside the media store")
+        removed = skipped = removed_bytes = 0
+        with self._lock:
+            for entry in self.entries():
+                inside = entry.path == target or target in entry.path.parents or entry.path in target.parents
+                if not inside:
+                    continue
+                if not entry.pinned and self._remove(entry):
+                    removed += 1
+                    removed_bytes += entry.bytes
+                else:
+                    skipped += 1
+        return {"removed": removed, "removed_bytes": removed_bytes, "skipped": skipped}
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(entry.bytes for entry in entries),
+            "pinned": sum(1 for entry in entries if entry.pinned),
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "evicted_entries": self.evicted_entries,
+            "evicted_bytes": self.evicted_bytes,
+        }
+
+    def start_background_eviction(self, interval: float = DEFAULT_EVICT_INTERVAL):
+        """Run `evict` every `interval` seconds in a daemon thread (once per store)"""
+        with self._thread_lock:
+            if self._thread is not None:
+                return
+
+            def run():
+                while True:
+                    try:
+                        self.evict()
+                    except OSError:
+                        pass  # try again next round
+                    time.sleep(interval)
+
+            self._thread = threading.Thread(target=run, daemon=True, name="media-evict")
+            self._thread.start()
+
+
+@contextmanager
+def _nested(contexts) -> Iterator[None]:
+    if not contexts:
+        yield
+        return
+    with contexts[0], _nested(contexts[1:]):
+        yield
+
+
+_store: Optional[MediaStore] = None
+_store_lock = threading.Lock()
+
+
+def get_media_store() -> MediaStore:
+    """Return the process-wide media store configured from the environment"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MediaStore(
+                Path(os.getenv("MANIM_MEDIA_ROOT", DEFAULT_ROOT)),
+                int(os.getenv("MANIM_MEDIA_BYTES", DEFAULT_MAX_BYTES)),
+                float(os.getenv("MANIM_MEDIA_TTL", DEFAULT_TTL)),
+            )
+        return _store
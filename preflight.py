@@ -0,0 +1,263 @@
+"""
+Static preflight checks for generated Manim code.
+
+Parses the code with `ast` before any render slot is spent on it: finds every
+renderable Scene subclass (including MovingCameraScene, ThreeDScene, subclass
+chains and multi-line class headers), checks imports against an allowlist and
+flags common API misuse in LLM output. Runs in milliseconds and returns
+structured issues instead of a Manim traceback.
+"""
+
+import ast
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+MANIM_SCENE_BASES = {
+    "Scene",
+    "MovingCameraScene",
+    "ThreeDScene",
+    "SpecialThreeDScene",
+    "ZoomedScene",
+    "VectorScene",
+    "LinearTransformationScene",
+}
+
+ALLOWED_IMPORTS = {
+    "manim",
+    "numpy",
+    "math",
+    "cmath",
+    "random",
+    "itertools",
+    "functools",
+    "operator",
+    "collections",
+    "typing",
+    "dataclasses",
+    "enum",
+    "string",
+    "fractions",
+    "decimal",
+    "colorsys",
+    "statistics",
+    "scipy",
+    "networkx",
+}
+
+FORBIDDEN_CALLS = {"open", "exec", "eval", "compile", "__import__", "input", "breakpoint"}
+
+# Names from manimgl / old manim versions that don't exist in Manim Community
+RENAMED_API = {
+    "ShowCreation": "Create",
+    "TextMobject": "Tex or Text",
+    "TexMobject": "MathTex",
+    "GraphScene": "Axes inside a Scene",
+    "FadeInFrom": "FadeIn(..., shift=...)",
+    "FadeInFromDown": "FadeIn(..., shift=UP)",
+    "FadeOutAndShift": "FadeOut(..., shift=...)",
+    "ShowCreationThenDestruction": "ShowPassingFlash",
+    "get_graph": "plot",
+}
+
+TEX_CLASSES = {"Tex", "MathTex", "SingleStringMathTex"}
+# Characters produced when LaTeX like "\frac" or "\times" is written without r"..."
+ESCAPE_CHARS = {"\a": r"\a", "\b": r"\b", "\f": r"\f", "\v": r"\v", "\t": r"\t", "\r": r"\r"}
+
+ERROR = "error"
+WARNING = "warning"
+
+
+@dataclass
+class PreflightIssue:
+    severity: str
+    code: str
+    message: str
+    line: Optional[int] = None
+    col: Optional[int] = None
+
+    def __str__(self) -> str:
+        where = f"line {self.line}: " if self.line else ""
+        return f"{self.severity.upper()} [{self.code}] {where}{self.message}"
+
+
+@dataclass
+class PreflightResult:
+    scenes: List[str] = field(default_factory=list)
+    issues: List[PreflightIssue] = field(default_factory=list)
+    default_scene: Optional[str] = None
+    tree: Optional[ast.Module] = field(default=None, repr=False)
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    @property
+    def errors(self) -> List[PreflightIssue]:
+        return [issue for issue in self.issues if issue.severity == ERROR]
+
+    def to_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "scenes": self.scenes,
+            "default_scene": self.default_scene,
+            "issues": [asdict(issue) for issue in self.issues],
+            "elapsed_ms": round(self.elapsed_ms, 3),
+        }
+
+    def format_errors(self) -> str:
+        return "\n".join(str(issue) for issue in self.errors)
+
+
+def base_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _find_scenes(tree: ast.Module) -> tuple[List[str], Optional[str]]:
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    scene_classes = {}
+
+    def is_scene(name: str, seen=()) -> bool:
+        if name in MANIM_SCENE_BASES and name not in classes:
+            return True
+        node = classes.get(name)
+        if node is None or name in seen:
+            return False
+        return any(is_scene(base_name(base) or "", seen + (name,)) for base in node.bases)
+
+    def has_construct(name: str, seen=()) -> bool:
+        node = classes.get(name)
+        if node is None or name in seen:
+            return False
+        if any(isinstance(item, ast.FunctionDef) and item.name == "construct" for item in node.body):
+            return True
+        return any(has_construct(base_name(base) or "", seen + (name,)) for base in node.bases)
+
+    for name, node in classes.items():
+        if is_scene(name):
+            scene_classes[name] = node
+
+    renderable = [name for name in scene_classes if has_construct(name)]
+    used_as_base = {
+        base_name(base) for node in scene_classes.values() for base in node.bases
+    }
+    leaves = [name for name in renderable if name not in used_as_base]
+    default = (leaves or renderable or [None])[0]
+    return renderable, default
+
+
+def _not_positive(node: ast.expr) -> bool:
+    """Whether `node` is a number literal (negative ones included) that is zero or less"""
+    sign = 1
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        sign = -1 if isinstance(node.op, ast.USub) else 1
+        node = node.operand
+    return isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and sign * node.value <= 0
+
+
+class PreflightChecker(ast.NodeVisitor):
+    """Collects import, API-misuse and safety issues from a parsed module"""
+
+    def __init__(self, result: PreflightResult):
+        self.result = result
+
+    def issue(self, severity: str, code: str, message: str, node: Optional[ast.AST] = None):
+        self.result.issues.append(PreflightIssue(
+            severity, code, message,
+            getattr(node, "lineno", None), getattr(node, "col_offset", None),
+        ))
+
+    def _check_module(self, module: str, node: ast.AST):
+        root = module.split(".")[0]
+        if root == "manimlib":
+            self.issue(ERROR, "manimgl-import", "manimlib is ManimGL; use 'from manim import *'", node)
+        elif root not in ALLOWED_IMPORTS:
+            self.issue(ERROR, "import-not-allowed", f"Import of '{module}' is not allowed", node)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self._check_module(alias.name, node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.level:
+            self.issue(ERROR, "import-not-allowed", "Relative imports are not allowed", node)
+        else:
+            self._check_module(node.module or "", node)
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for item in node.body:
+            if isinstance(item, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == "CONFIG" for target in item.targets
+            ):
+                self.issue(ERROR, "manimgl-config", "CONFIG dicts are ManimGL style; use __init__ arguments", item)
+            if isinstance(item, ast.FunctionDef) and item.name == "construct" and not item.args.args:
+                self.issue(ERROR, "construct-signature", "construct() must take 'self'", item)
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name):
+        if node.id in RENAMED_API:
+            self.issue(ERROR, "renamed-api", f"'{node.id}' is not in Manim Community; use {RENAMED_API[node.id]}", node)
+
+    def visit_Attribute(self, node: ast.Attribute):
+        if node.attr in RENAMED_API:
+            self.issue(ERROR, "renamed-api", f"'{node.attr}' is not in Manim Community; use {RENAMED_API[node.attr]}", node)
+        self.generic_visit(node)
+
+    def visit_While(self, node: ast.While):
+        infinite = isinstance(node.test, ast.Constant) and bool(node.test.value)
+        if infinite and not any(isinstance(child, (ast.Break, ast.Return)) for child in ast.walk(node)):
+            self.issue(ERROR, "infinite-loop", "'while True' loop without break never finishes rendering", node)
+        self.generic_visit(node)
+
+    def visit_Call(self, node: ast.Call):
+        name = base_name(node.func)
+        if isinstance(node.func, ast.Name) and name in FORBIDDEN_CALLS:
+            self.issue(ERROR, "forbidden-call", f"Call to '{name}' is not allowed in scenes", node)
+
+        is_self_method = (
+            isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and node.func.value.id == "self"
+        )
+        if is_self_method and name == "play" and not node.args:
+            self.issue(ERROR, "empty-play", "self.play() needs at least one animation", node)
+
+        for keyword in node.keywords:
+            if keyword.arg == "run_time" and _not_positive(keyword.value):
+                self.issue(ERROR, "run-time", "run_time must be positive", keyword.value)
+        if is_self_method and name == "wait" and node.args and _not_positive(node.args[0]):
+            self.issue(ERROR, "run-time", "self.wait() duration must be positive", node)
+
+        if name in TEX_CLASSES:
+            for arg in node.args:
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                    escapes = sorted({ESCAPE_CHARS[c] for c in arg.value if c in ESCAPE_CHARS})
+                    if escapes:
+                        self.issue(WARNING, "tex-escape",
+                                   f"{name} string contains {', '.join(escapes)}; use a raw string r\"...\"", arg)
+        self.generic_visit(node)
+
+
+def preflight(code: str) -> PreflightResult:
+    """Statically check generated Manim code before it is rendered"""
+    started = time.perf_counter()
+    result = PreflightResult()
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        result.issues.append(PreflightIssue(ERROR, "syntax", e.msg, e.lineno, e.offset))
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    result.tree = tree
+    result.scenes, result.default_scene = _find_scenes(tree)
+    if not result.scenes:
+        result.issues.append(PreflightIssue(ERROR, "no-scene", "No Scene subclass with a construct() method found"))
+    PreflightChecker(result).visit(tree)
+    result.elapsed_ms = (time.perf_counter() - started) * 1000
+    return result
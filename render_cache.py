@@ -0,0 +1,145 @@
+"""
+Content-addressed cache of rendered Manim videos.
+
+Entries are keyed by the SHA-256 of the normalized scene source, the scene
+name, the quality flags and the installed Manim version, so resubmitting the
+same code returns the stored MP4 without spawning ``manim`` again.
+"""
+
+import ast
+import hashlib
+import os
+import threading
+from importlib import metadata
+from pathlib import Path
+from typing import Iterable, Optional
+
+from media_store import publish
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "media" / "cache" / "renders"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def manim_version() -> str:
+    """Return the installed Manim version, or 'unknown' if it is missing"""
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def normalize_source(code: str) -> str:
+    """Normalize scene source so formatting and comments don't change the key"""
+    try:
+        return ast.unparse(ast.parse(code))
+    except (SyntaxError, ValueError):
+        lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def cache_key(code: str, scene_name: Optional[str] = None, flags: Iterable[str] = ()) -> str:
+    """Build the cache key for a render of `scene_name` with the given flags"""
+    digest = hashlib.sha256()
+    for part in (normalize_source(code), scene_name or "", " ".join(flags), manim_version()):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Size-budgeted LRU store of rendered videos.
+
+    Recency is tracked through file mtimes so several processes can share one
+    cache directory. Entries are hardlinked to the rendered video and published
+    with `os.replace`, which is atomic, so readers never see a partially
+    written video.
+    """
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: str, suffix: str = ".mp4") -> Path:
+        return self.root / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = ".mp4") -> Optional[Path]:
+        """Return the cached video for `key` and mark it as recently used"""
+        path = self._entry_path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def contains(self, key: str, suffix: str = ".mp4") -> bool:
+        """Whether `key` is cached, without counting a lookup"""
+        return self._entry_path(key, suffix).exists()
+
+    def put(self, key: str, video_path: Path) -> Path:
+        """Link a rendered video into the cache and return the cached path"""
+        video_path = Path(video_path)
+        target = publish(video_path, self._entry_path(key, video_path.suffix or ".mp4"))
+        self.evict()
+        return target
+
+    def _scan(self) -> list:
+        """(mtime, size, path) of every entry; files removed during the scan are skipped"""
+        entries = []
+        for path in self.root.iterdir():
+            if path.name.startswith(".") or not path.is_file():
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the cache fits its budget"""
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current cache size"""
+        size = sum(size for _, size, _ in self._scan())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_cache: Optional[RenderCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> RenderCache:
+    """Return the process-wide render cache configured from the environment"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RenderCache(
+                Path(os.getenv("MANIM_RENDER_CACHE_DIR", DEFAULT_CACHE_DIR)),
+                int(os.getenv("MANIM_RENDER_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _cache
@@ -0,0 +1,434 @@
+"""
+Coordinator side of distributed rendering.
+
+With MANIM_COORDINATOR_PORT set, the MCP server stops rendering itself and
+hands its jobs to render nodes (render_node.py) over a small JSON-over-HTTP
+protocol. Nodes may run on the same host or on others; they all read and
+write the same media store, so a node renders straight into the job's
+workspace and the server finds the video where a local render would have
+put it. Nodes report the video relative to the store root, and the
+coordinator refuses a report whose file it can't see, which is how a node
+whose store is not shared shows up.
+
+Nodes pull work; the coordinator never connects to them:
+
+* ``POST /register`` gives a node its id and the heartbeat interval;
+* ``POST /lease`` long-polls for the next task. Pending tasks go out
+  cheapest first (by their render-cost estimate). When none are pending, a
+  node with nothing running steals a task another node has leased in
+  reserve but not started yet. Reserve leases (``wait`` of 0) never steal,
+  so busy nodes don't take each other's reserves;
+* ``POST /start`` confirms a leased task is still the node's to run, so a
+  stolen or cancelled task is dropped instead of rendered twice;
+* ``POST /complete`` reports the video or a structured error;
+* ``POST /heartbeat`` keeps the node alive and returns the tasks to cancel.
+
+A node that misses heartbeats for MANIM_NODE_TIMEOUT seconds is dropped and
+its tasks go back to the queue. A running task fails once it outlives its
+profile's wall-clock limit plus a grace period, and waiting tasks fail when
+no node has been registered for a while, so a render never waits forever. Tasks that fail for infrastructure reasons
+(a lost node, a crashed worker) are retried on another node up to
+MANIM_RENDER_ATTEMPTS times; errors in the scene itself are not.
+
+`start_local_nodes` runs nodes as child processes, which is how a single
+Linux box stands in for a cluster (MANIM_LOCAL_NODES).
+"""
+
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from media_store import MediaStore
+from render_jobs import RenderJob
+from render_monitor import RenderError
+from render_profiles import get_profile
+from worker_pool import RenderCancelled, RenderFailed
+
+PENDING = "pending"
+LEASED = "leased"
+RUNNING = "running"
+DONE = "done"
+
+DEFAULT_HEARTBEAT_INTERVAL = 5.0
+DEFAULT_NODE_TIMEOUT = 20.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Seconds a running task may take beyond its profile's wall-clock limit before it is failed
+DEFAULT_LEASE_GRACE = 60.0
+# Seconds tasks wait with no node registered before they fail
+DEFAULT_NO_NODES_TIMEOUT = 30.0
+# Longest a /lease request is held open waiting for work
+LEASE_WAIT = 10.0
+# A task leased this long ago but not started may be stolen by an idle node
+STEAL_AFTER = 1.0
+# Jobs the MCP server hands to the cluster at once, unless MANIM_MAX_PARALLEL_RENDERS says otherwise
+DEFAULT_CLUSTER_PARALLEL = 32
+TOKEN_HEADER = "X-Render-Token"
+# Failures that say nothing about the scene, so another node may succeed
+RETRYABLE_ERRORS = {"NodeLost", "NodeError", "VideoMissing", "WorkerCrashed", "WorkerUnavailable"}
+
+
+def job_payload(job: RenderJob, store: MediaStore) -> dict:
+    """The wire form of a job; paths are relative to the shared media store"""
+    return {
+        "id": job.id,
+        "code": job.code,
+        "scene_name": job.scene_name,
+        "profile": job.profile,
+        "workspace": Path(job.workspace).resolve().relative_to(store.root).as_posix(),
+        "conversation_dir": (Path(job.conversation_dir).resolve().relative_to(store.root).as_posix()
+                             if job.conversation_dir else None),
+    }
+
+
+def job_from_payload(payload: dict, store: MediaStore) -> RenderJob:
+    conversation = payload.get("conversation_dir")
+    return RenderJob(
+        payload["id"], payload["code"], payload.get("scene_name"), store.root / payload["workspace"],
+        store.root / conversation if conversation else None, payload.get("profile"),
+    )
+
+
+@dataclass
+class ClusterTask:
+    job: RenderJob
+    order: int
+    state: str = PENDING
+    node: Optional[str] = None
+    leased_at: float = 0.0
+    started_at: float = 0.0
+    attempts: int = 0
+    # Nodes this task failed on; retries go elsewhere while other nodes are alive
+    failed_on: Set[str] = field(default_factory=set)
+    video: Optional[str] = None
+    error: Optional[RenderError] = None
+    finished: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def priority(self) -> tuple:
+        return (self.job.estimate or 0.0, self.order)
+
+
+@dataclass
+class RenderNodeInfo:
+    id: str
+    name: str
+    slots: int
+    last_seen: float = field(default_factory=time.monotonic)
+    completed: int = 0
+    failed: int = 0
+
+
+class RenderCoordinator:
+    """Queue of render tasks handed out to remote render nodes"""
+
+    def __init__(self, store: MediaStore, heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+                 node_timeout: float = DEFAULT_NODE_TIMEOUT, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 token: Optional[str] = None, lease_grace: float = DEFAULT_LEASE_GRACE,
+                 no_nodes_timeout: float = DEFAULT_NO_NODES_TIMEOUT):
+        self.store = store
+        self.heartbeat_interval = heartbeat_interval
+        self.node_timeout = node_timeout
+        self.max_attempts = max_attempts
+        self.token = token
+        self.lease_grace = lease_grace
+        self.no_nodes_timeout = no_nodes_timeout
+        self.tasks: Dict[str, ClusterTask] = {}
+        self.nodes: Dict[str, RenderNodeInfo] = {}
+        self.retried = 0
+        self.stolen = 0
+        self.lost_nodes = 0
+        self._order = 0
+        self._cond = threading.Condition()
+        self._reaper: Optional[threading.Thread] = None
+
+    # Server side: called by the render queue
+
+    def run(self, job: RenderJob) -> str:
+        """Render `job` on some node and return the video path; a RenderQueue render_fn"""
+        with self._cond:
+            self._order += 1
+            task = ClusterTask(job, self._order)
+            self.tasks[job.id] = task
+            self._cond.notify_all()
+        run_limit = get_profile(job.profile).limits.wall_seconds + self.lease_grace
+        no_nodes_since: Optional[float] = None
+        try:
+            while not task.finished.wait(0.5):
+                now = time.monotonic()
+                with self._cond:
+                    if task.state == DONE:
+                        continue
+                    if job.cancel_event.is_set():
+                        if task.state in (PENDING, LEASED):
+                            self._finish(task, error=RenderError("Cancelled", "Render cancelled"))
+                        # A running task is cancelled through the node's next heartbeat
+                    elif task.state == RUNNING and now - task.started_at > run_limit:
+                        # The node's heartbeat cancels it once it is no longer ours
+                        self._finish(task, error=RenderError(
+                            "Timeout", f"Render node did not finish within {run_limit:g} seconds"))
+                    elif self.nodes:
+                        no_nodes_since = None
+                    elif no_nodes_since is None:
+                        no_nodes_since = now
+                    elif now - no_nodes_since > self.no_nodes_timeout:
+                        self._finish(task, error=RenderError(
+                            "NoRenderNodes", f"No render node registered for {self.no_nodes_timeout:g} seconds"))
+            if job.cancel_event.is_set():
+                raise RenderCancelled("Render cancelled")
+            if task.error is not None:
+                raise RenderFailed(str(task.error), task.error)
+            return task.video
+        finally:
+            with self._cond:
+                self.tasks.pop(job.id, None)
+
+    # Node side: called by the HTTP handler
+
+    def register(self, name: str, slots: int) -> dict:
+        node = RenderNodeInfo(f"{name}-{uuid.uuid4().hex[:6]}", name, max(1, slots))
+        with self._cond:
+            self.nodes[node.id] = node
+        return {"node_id": node.id, "heartbeat_interval": self.heartbeat_interval}
+
+    def lease(self, node_id: str, wait: float = LEASE_WAIT) -> dict:
+        """Hand the node its next task, waiting up to `wait` seconds for one.
+
+        A `wait` of 0 fills a busy node's reserve and never steals.
+        """
+        deadline = time.monotonic() + min(wait, LEASE_WAIT)
+        with self._cond:
+            while True:
+                node = self.nodes.get(node_id)
+                if node is None:
+                    return {"known": False}
+                node.last_seen = time.monotonic()
+                task = self._next_task(node_id, steal=wait > 0)
+                if task is not None:
+                    task.state = LEASED
+                    task.node = node_id
+                    task.leased_at = time.monotonic()
+                    task.attempts += 1
+                    return {"known": True, "task": job_payload(task.job, self.store), "attempt": task.attempts}
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {"known": True, "task": None}
+                # Wake up now and then: reserved tasks become stealable without a notification
+                self._cond.wait(min(remaining, STEAL_AFTER))
+
+    def _next_task(self, node_id: str, steal: bool) -> Optional[ClusterTask]:
+        alive = len(self.nodes)
+        pending = [task for task in self.tasks.values() if task.state == PENDING
+                   and (node_id not in task.failed_on or len(task.failed_on) >= alive)]
+        if pending:
+            return min(pending, key=lambda task: task.priority)
+        # Work stealing: an idle node takes a task another node prefetched but hasn't started
+        if not steal or any(task.node == node_id and task.state == RUNNING for task in self.tasks.values()):
+            return None
+        now = time.monotonic()
+        leased = [task for task in self.tasks.values() if task.state == LEASED and task.node != node_id
+                  and now - task.leased_at >= STEAL_AFTER]
+        if leased:
+            task = min(leased, key=lambda task: task.priority)
+            task.attempts -= 1  # the victim never ran it
+            self.stolen += 1
+            return task
+        return None
+
+    def start(self, node_id: str, job_id: str) -> bool:
+        """Whether the node may still run a task it leased (not stolen or cancelled since)"""
+        with self._cond:
+            task = self.tasks.get(job_id)
+            if task is None or task.node != node_id or task.state != LEASED or task.job.cancel_event.is_set():
+                return False
+            task.state = RUNNING
+            task.started_at = time.monotonic()
+            return True
+
+    def complete(self, node_id: str, job_id: str, video: Optional[str] = None, error: Optional[dict] = None):
+        """Record a node's result; `video` is relative to the media store root"""
+        with self._cond:
+            task = self.tasks.get(job_id)
+            node = self.nodes.get(node_id)
+            if task is None or task.node != node_id or task.state == DONE:
+                return  # a stale report from a node the task was taken from
+            if error is None:
+                path = self.store.root / video if video else None
+                if path is None or self.store.entry_for(path) is None or not path.is_file():
+                    error = RenderError("VideoMissing", f"Render node reported {video!r}, which is not in the "
+                                        f"media store at {self.store.root}; nodes must share MANIM_MEDIA_ROOT").to_dict()
+            if error is None:
+                if node:
+                    node.completed += 1
+                self._finish(task, video=str(path))
+                return
+            if node:
+                node.failed += 1
+            self._retry_or_fail(task, RenderError(**error))
+
+    def heartbeat(self, node_id: str, running: List[str]) -> dict:
+        with self._cond:
+            node = self.nodes.get(node_id)
+            if node is None:
+                return {"known": False, "cancel": []}
+            node.last_seen = time.monotonic()
+            # Cancelled, timed out, or handed to another node after this one was dropped
+            cancel = [job_id for job_id in running
+                      if job_id not in self.tasks or self.tasks[job_id].node != node_id
+                      or self.tasks[job_id].state == DONE or self.tasks[job_id].job.cancel_event.is_set()]
+            return {"known": True, "cancel": cancel}
+
+    def _retry_or_fail(self, task: ClusterTask, error: RenderError):
+        if error.type in RETRYABLE_ERRORS and task.attempts < self.max_attempts \
+                and not task.job.cancel_event.is_set():
+            task.failed_on.add(task.node)
+            task.state = PENDING
+            task.node = None
+            self.retried += 1
+            self._cond.notify_all()
+        else:
+            self._finish(task, error=error)
+
+    def _finish(self, task: ClusterTask, video: Optional[str] = None, error: Optional[RenderError] = None):
+        task.state = DONE
+        task.video = video
+        task.error = error
+        task.finished.set()
+
+    def reap(self):
+        """Drop nodes that stopped sending heartbeats and requeue their tasks"""
+        now = time.monotonic()
+        with self._cond:
+            for node in [node for node in self.nodes.values() if now - node.last_seen > self.node_timeout]:
+                del self.nodes[node.id]
+                self.lost_nodes += 1
+                for task in self.tasks.values():
+                    if task.node == node.id and task.state in (LEASED, RUNNING):
+                        self._retry_or_fail(task, RenderError(
+                            "NodeLost", f"Render node {node.name} stopped responding"))
+            self._cond.notify_all()
+
+    def start_reaper(self):
+        if self._reaper is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.heartbeat_interval)
+                self.reap()
+
+        self._reaper = threading.Thread(target=loop, daemon=True, name="node-reaper")
+        self._reaper.start()
+
+    def stats(self) -> dict:
+        with self._cond:
+            states: Dict[str, int] = {}
+            for task in self.tasks.values():
+                states[task.state] = states.get(task.state, 0) + 1
+            return {
+                "nodes": [{"id": node.id, "slots": node.slots, "completed": node.completed, "failed": node.failed,
+                           "running": sum(1 for t in self.tasks.values() if t.node == node.id and t.state == RUNNING)}
+                          for node in self.nodes.values()],
+                "tasks": states,
+                "retried": self.retried,
+                "stolen": self.stolen,
+                "lost_nodes": self.lost_nodes,
+            }
+
+
+def serve_coordinator(coordinator: RenderCoordinator, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve the node protocol from a daemon thread and start dropping silent nodes"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/stats":
+                self.send_error(404)
+                return
+            self._reply(coordinator.stats())
+
+        def do_POST(self):
+            if coordinator.token and self.headers.get(TOKEN_HEADER) != coordinator.token:
+                self.send_error(403)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                route = self.path.split("?")[0]
+                if route == "/register":
+                    reply = coordinator.register(str(body.get("name", "node")), int(body.get("slots", 1)))
+                elif route == "/lease":
+                    reply = coordinator.lease(body["node_id"], float(body.get("wait", LEASE_WAIT)))
+                elif route == "/start":
+                    reply = {"ok": coordinator.start(body["node_id"], body["job_id"])}
+                elif route == "/complete":
+                    coordinator.complete(body["node_id"], body["job_id"], body.get("video"), body.get("error"))
+                    reply = {"ok": True}
+                elif route == "/heartbeat":
+                    reply = coordinator.heartbeat(body["node_id"], list(body.get("running", [])))
+                else:
+                    self.send_error(404)
+                    return
+            except (KeyError, TypeError, ValueError) as e:
+                self.send_error(400, str(e))
+                return
+            self._reply(reply)
+
+        def _reply(self, data: dict):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # stdout carries the MCP protocol
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="coordinator-http").start()
+    coordinator.start_reaper()
+    return server
+
+
+def start_local_nodes(count: int, coordinator_url: str) -> List[subprocess.Popen]:
+    """Run `count` render nodes on this host as child processes, stopped when we exit"""
+    nodes = [
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).with_name("render_node.py")), "--coordinator", coordinator_url,
+             "--name", f"local{i}"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+        )
+        for i in range(count)
+    ]
+
+    def stop():
+        for process in nodes:
+            process.terminate()
+        for process in nodes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    atexit.register(stop)
+    return nodes
+
+
+def get_coordinator(store: MediaStore) -> Optional[RenderCoordinator]:
+    """A coordinator configured from the environment, or None unless MANIM_COORDINATOR_PORT is set"""
+    if not os.getenv("MANIM_COORDINATOR_PORT"):
+        return None
+    return RenderCoordinator(
+        store,
+        float(os.getenv("MANIM_NODE_HEARTBEAT", DEFAULT_HEARTBEAT_INTERVAL)),
+        float(os.getenv("MANIM_NODE_TIMEOUT", DEFAULT_NODE_TIMEOUT)),
+        int(os.getenv("MANIM_RENDER_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+        os.getenv("MANIM_CLUSTER_TOKEN") or None,
+    )
@@ -0,0 +1,266 @@
+"""
+Static render-cost estimates for scheduling and admission.
+
+A render's cost is mostly decided before it starts: how many seconds of
+animation the scene plays, at what resolution and frame rate, how heavy each
+frame is (mobjects, updaters, 3D) and how many TeX strings must be compiled.
+`scene_features` reads those from the preflight AST without running anything;
+loops over ``range(n)`` or literal sequences multiply what they contain.
+
+`CostModel` turns features into seconds with one coefficient per render
+stage (see stage_timing): startup, TeX, frame rendering and encoding (per x264
+preset). After every render the coefficients move towards the measured stage
+times, so estimates track the actual host, worker pool and TeX cache. The
+coefficients are kept in a small JSON file shared by every process using
+the same media directory.
+"""
+
+import ast
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from preflight import base_name
+from render_profiles import RenderProfile
+
+DEFAULT_MODEL_PATH = Path(__file__).parent / "media" / "cache" / "render_costs.json"
+# Weight of one new measurement in a coefficient
+LEARNING_RATE = 0.2
+# Iterations assumed for loops whose length isn't known statically
+UNKNOWN_LOOP_ITERATIONS = 3
+# Manim's default run_time of an animation and duration of self.wait()
+DEFAULT_RUN_TIME = 1.0
+
+TEX_CLASSES = {"Tex", "MathTex", "SingleStringMathTex", "MathTable", "Matrix", "IntegerMatrix", "DecimalMatrix"}
+UPDATER_CALLS = {"add_updater", "always_redraw"}
+THREE_D_SCENES = {"ThreeDScene", "SpecialThreeDScene"}
+THREE_D_MOBJECTS = {"ThreeDAxes", "Surface", "Sphere", "Cube", "Prism", "Cone", "Cylinder", "Torus"}
+
+# Extra per-frame work relative to an empty frame
+MOBJECT_WEIGHT = 0.05
+UPDATER_WEIGHT = 0.5
+THREE_D_FACTOR = 3.0
+
+DEFAULT_COEFFICIENTS = {
+    "startup": 2.0,      # seconds per render
+    "tex": 0.5,          # seconds per TeX string
+    "render": 0.02,      # seconds per frame-megapixel of unit complexity
+    "encode:ultrafast": 0.002,
+    "encode:veryfast": 0.004,
+    "encode:slow": 0.015,
+}
+
+
+@dataclass
+class SceneFeatures:
+    animation_seconds: float = 0.0
+    plays: int = 0
+    tex: int = 0
+    mobjects: int = 0
+    updaters: int = 0
+    three_d: bool = False
+
+    @property
+    def complexity(self) -> float:
+        """Relative cost of one frame of this scene"""
+        weight = 1 + MOBJECT_WEIGHT * self.mobjects + UPDATER_WEIGHT * self.updaters
+        return weight * (THREE_D_FACTOR if self.three_d else 1)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _number(node: ast.expr) -> Optional[float]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _number(node.operand)
+        return -value if value is not None else None
+    return None
+
+
+def _iterations(node: ast.expr) -> int:
+    """Statically known length of a for loop's iterable, or a guess"""
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return len(node.elts)
+    if isinstance(node, ast.Call) and base_name(node.func) == "range":
+        bounds = [_number(arg) for arg in node.args]
+        if bounds and None not in bounds:
+            return max(0, len(range(*(int(bound) for bound in bounds))))
+    if isinstance(node, ast.Call) and base_name(node.func) == "enumerate" and node.args:
+        return _iterations(node.args[0])
+    return UNKNOWN_LOOP_ITERATIONS
+
+
+def _run_time(call: ast.Call) -> float:
+    """The longest constant run_time inside a self.play(...) call"""
+    times = [_number(keyword.value) for node in ast.walk(call) if isinstance(node, ast.Call)
+             for keyword in node.keywords if keyword.arg == "run_time"]
+    times = [t for t in times if t is not None and t > 0]
+    return max(times) if times else DEFAULT_RUN_TIME
+
+
+class _FeatureCollector:
+    def __init__(self):
+        self.features = SceneFeatures()
+
+    def visit(self, node: ast.AST, repeat: int = 1):
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            self.visit(node.iter, repeat)
+            for child in node.body:
+                self.visit(child, repeat * _iterations(node.iter))
+            for child in node.orelse:
+                self.visit(child, repeat)
+            return
+        if isinstance(node, ast.While):
+            for child in ast.iter_child_nodes(node):
+                self.visit(child, repeat * UNKNOWN_LOOP_ITERATIONS)
+            return
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            for generator in node.generators:
+                repeat *= _iterations(generator.iter)
+        if isinstance(node, ast.Call):
+            self._call(node, repeat)
+        for child in ast.iter_child_nodes(node):
+            self.visit(child, repeat)
+
+    def _call(self, node: ast.Call, repeat: int):
+        features = self.features
+        name = base_name(node.func) or ""
+        on_self = isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) \
+            and node.func.value.id == "self"
+        if on_self and name == "play":
+            features.plays += repeat
+            features.animation_seconds += repeat * _run_time(node)
+        elif on_self and name == "wait":
+            duration = _number(node.args[0]) if node.args else None
+            features.plays += repeat
+            features.animation_seconds += repeat * (duration if duration and duration > 0 else DEFAULT_RUN_TIME)
+        elif name in TEX_CLASSES:
+            features.tex += repeat
+            features.mobjects += repeat
+        elif name in UPDATER_CALLS:
+            features.updaters += repeat
+        elif name in THREE_D_MOBJECTS:
+            features.three_d = True
+            features.mobjects += repeat
+        elif name[:1].isupper():
+            # Mobjects and animations alike; both add work to the frames they appear in
+            features.mobjects += repeat
+
+
+def scene_features(tree: ast.Module, scene_name: Optional[str] = None) -> SceneFeatures:
+    """Estimate the work in `scene_name` (or the whole module) from its parsed code"""
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    collector = _FeatureCollector()
+
+    # The scene and the classes it inherits construct() and helpers from
+    pending = [scene_name] if scene_name in classes else list(classes)
+    seen = set()
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if name in THREE_D_SCENES:
+            collector.features.three_d = True
+        node = classes.get(name)
+        if node is None:
+            continue
+        for item in node.body:
+            collector.visit(item)
+        pending.extend(base_name(base) or "" for base in node.bases)
+    # Module-level helper functions run as often as the scene calls them; count them once
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            collector.visit(node)
+    return collector.features
+
+
+def _terms(features: SceneFeatures, profile: RenderProfile) -> Dict[str, float]:
+    """Work per coefficient: estimated seconds are the dot product with the coefficients"""
+    frames = max(features.animation_seconds * profile.fps, 1)
+    megapixel_frames = frames * profile.width * profile.height / 1_000_000
+    return {
+        "startup": 1.0,
+        "tex": float(features.tex),
+        "render": megapixel_frames * features.complexity,
+        f"encode:{profile.preset}": megapixel_frames,
+    }
+
+
+class CostModel:
+    """Render time estimates whose coefficients follow measured stage times"""
+
+    def __init__(self, path: Optional[Path] = DEFAULT_MODEL_PATH, learning_rate: float = LEARNING_RATE):
+        self.path = Path(path) if path else None
+        self.learning_rate = learning_rate
+        self.coefficients = dict(DEFAULT_COEFFICIENTS)
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.path is None:
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        self.coefficients.update({k: float(v) for k, v in data.get("coefficients", {}).items()})
+        self.samples = int(data.get("samples", 0))
+
+    def _save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"coefficients": self.coefficients, "samples": self.samples}, indent=2))
+        os.replace(tmp_path, self.path)
+
+    def estimate(self, features: SceneFeatures, profile: RenderProfile) -> float:
+        """Estimated wall-clock seconds of an uncached render"""
+        with self._lock:
+            return sum(self.coefficients.get(term, DEFAULT_COEFFICIENTS["encode:veryfast"]) * work
+                       for term, work in _terms(features, profile).items())
+
+    def record(self, features: SceneFeatures, profile: RenderProfile, timings: Dict[str, float]):
+        """Move the coefficients towards the stage times measured for one render"""
+        measured = {
+            "startup": timings.get("startup"),
+            "tex": timings.get("tex"),
+            "render": timings.get("render"),
+            f"encode:{profile.preset}": timings.get("encode"),
+        }
+        with self._lock:
+            for term, work in _terms(features, profile).items():
+                seconds = measured.get(term)
+                if seconds is None or work <= 0:
+                    continue
+                current = self.coefficients.get(term, seconds / work)
+                self.coefficients[term] = current + self.learning_rate * (seconds / work - current)
+            self.samples += 1
+            try:
+                self._save()
+            except OSError:
+                pass  # estimates still work from memory
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"samples": self.samples, "coefficients": dict(self.coefficients)}
+
+
+_model: Optional[CostModel] = None
+_model_lock = threading.Lock()
+
+
+def get_cost_model() -> CostModel:
+    """Return the process-wide cost model configured from the environment"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = CostModel(Path(os.getenv("MANIM_RENDER_COST_PATH", DEFAULT_MODEL_PATH)))
+        return _model
@@ -0,0 +1,226 @@
+"""
+Asynchronous render job queue for the MCP server.
+
+Jobs are queued on an asyncio queue and picked up by a fixed number of
+consumer tasks, which caps how many renders run in parallel. The blocking
+render itself runs in a thread so the event loop keeps serving tool calls.
+Every job gets its own workspace directory, so concurrent clients never
+overwrite each other's code or receive each other's videos. The directory is
+created when the render starts, so media eviction (see media_store) cannot
+remove it from under a job still waiting in the queue.
+
+Jobs are not run first come, first served. Each job has an estimated cost
+(see render_cost) and a client (its conversation), and the queue does
+start-time fair queuing: a job's tag is its cost added to the later of the
+queue's virtual time and its client's previous tag, and the smallest tag
+runs next. A short preview therefore overtakes a long lesson queued before
+it, a client submitting many jobs gets its turn with everyone else's, and
+long jobs still run once the virtual time reaches them.
+
+With an admission controller (see render_limits), a free consumer holds its
+next job back while the host is overloaded, and new jobs are refused once
+too many are waiting.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+@dataclass
+class RenderJob:
+    id: str
+    code: str
+    scene_name: Optional[str]
+    workspace: Path
+    conversation_dir: Optional[Path] = None
+    profile: Optional[str] = None
+    # Estimated render seconds and the client sharing the queue fairly with others
+    estimate: Optional[float] = None
+    client: str = ""
+    # The request the code was generated for; indexed as an example once the render succeeds
+    prompt: str = ""
+    status: str = QUEUED
+    video: Optional[str] = None
+    error: Optional[str] = None
+    error_detail: Optional[dict] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "scene": self.scene_name,
+            "profile": self.profile,
+            "estimated_seconds": round(self.estimate, 1) if self.estimate is not None else None,
+            "video": self.video,
+            "error": self.error,
+            "error_detail": self.error_detail,
+            "queued_seconds": round((self.started_at or now) - self.created_at, 3),
+            "render_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+        }
+
+
+class QueueFull(Exception):
+    """Raised by `RenderQueue.submit` when the admission controller refuses a job"""
+
+
+class RenderQueue:
+    """Bounded-concurrency queue of render jobs.
+
+    `render_fn` is called in a worker thread with the job and must return the
+    path of the rendered video or raise an exception describing the failure.
+    `on_finish` is called with every job that reaches a final state, in a
+    thread of the event loop's default executor so it may block.
+    `admission` is an optional render_limits.AdmissionController.
+    """
+
+    def __init__(self, render_fn: Callable[[RenderJob], str], workspace_root: Path,
+                 max_parallel: int = 2, keep_finished: int = 1000,
+                 on_finish: Optional[Callable[[RenderJob], None]] = None, admission=None):
+        self.render_fn = render_fn
+        self.on_finish = on_finish
+        self.admission = admission
+        self.workspace_root = Path(workspace_root)
+        self.max_parallel = max_parallel
+        self.keep_finished = keep_finished
+        self.jobs: Dict[str, RenderJob] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._consumers = []
+        self._virtual_time = 0.0
+        self._client_tags: Dict[str, float] = {}
+        self._order = itertools.count()
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.max_parallel)]
+
+    async def submit(self, code: str, scene_name: Optional[str] = None,
+                     conversation_dir: Optional[Path] = None, profile: Optional[str] = None,
+                     estimate: Optional[float] = None, client: str = "", prompt: str = "") -> RenderJob:
+        """Queue a render and return its job immediately; raises QueueFull when refused"""
+        self._ensure_started()
+        if self.admission is not None:
+            reason = self.admission.reject(self.count(QUEUED))
+            if reason:
+                raise QueueFull(reason)
+        job_id = uuid.uuid4().hex[:12]
+        job = RenderJob(job_id, code, scene_name, self.workspace_root / job_id, conversation_dir, profile,
+                        estimate, client, prompt)
+        self.jobs[job_id] = job
+        self._prune()
+        await self._queue.put((self._tag(job), next(self._order), job))
+        return job
+
+    def _tag(self, job: RenderJob) -> float:
+        start = max(self._virtual_time, self._client_tags.get(job.client, 0.0))
+        tag = self._client_tags[job.client] = start + (job.estimate or 0.0)
+        # Clients whose tags the virtual time has passed have nothing left to catch up
+        for client in [c for c, t in self._client_tags.items() if t <= self._virtual_time]:
+            del self._client_tags[client]
+        return tag
+
+    def get(self, job_id: str) -> Optional[RenderJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED, error="Render cancelled")
+        return True
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> RenderJob:
+        job = self.jobs[job_id]
+        await asyncio.wait_for(job.done.wait(), timeout)
+        return job
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        queued = [job.estimate or 0.0 for job in self.jobs.values() if job.status == QUEUED]
+        return {"max_parallel": self.max_parallel, "jobs": counts,
+                "queued_estimated_seconds": round(sum(queued), 1), "virtual_time": round(self._virtual_time, 1)}
+
+    def count(self, status: str) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == status)
+
+    def _finish(self, job: RenderJob, status: str, video: Optional[str] = None, error: Optional[str] = None):
+        job.status = status
+        job.video = video
+        job.error = error
+        job.finished_at = time.time()
+        job.done.set()
+        if self.on_finish is not None:
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self._notify, job)
+            except RuntimeError:
+                self._notify(job)  # no event loop to keep responsive
+
+    def _notify(self, job: RenderJob):
+        try:
+            self.on_finish(job)
+        except Exception:
+            pass  # observers must never fail a render
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    async def _consume(self):
+        while True:
+            tag, _, job = await self._queue.get()
+            try:
+                if job.finished:
+                    continue
+                self._virtual_time = max(self._virtual_time, tag - (job.estimate or 0.0))
+                if self.admission is not None:
+                    await asyncio.to_thread(self.admission.wait, job.cancel_event)
+                    if job.finished:
+                        continue
+                job.status = RUNNING
+                job.started_at = time.time()
+                try:
+                    job.workspace.mkdir(parents=True, exist_ok=True)
+                    video = await asyncio.to_thread(self.render_fn, job)
+                except Exception as e:
+                    if job.cancel_event.is_set():
+                        self._finish(job, CANCELLED, error="Render cancelled")
+                    else:
+                        if getattr(e, "error", None) is not None:
+                            job.error_detail = e.error.to_dict()
+                        self._finish(job, FAILED, error=str(e))
+                else:
+                    if job.cancel_event.is_set():
+                        self._finish(job, CANCELLED, error="Render cancelled")
+                    else:
+                        self._finish(job, SUCCEEDED, video=str(video))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,301 @@
+"""
+Resource limits for single renders and admission control for the host.
+
+A generated scene can spin forever in an updater, ask for a ten-minute
+``run_time`` or build a mobject so large it eats all memory. Every render
+profile therefore carries `RenderLimits`:
+
+* wall-clock seconds, enforced by the caller's timeout;
+* CPU seconds, through ``RLIMIT_CPU`` (the kernel sends SIGXCPU);
+* memory, through a cgroup v2 ``memory.max`` when MANIM_CGROUP_DIR points
+  at a delegated cgroup, otherwise by watching the resident set size;
+* output size, through ``RLIMIT_FSIZE`` (writes past it fail with EFBIG)
+  and a check of the finished file.
+
+Memory is deliberately not limited with ``RLIMIT_DATA``: it counts address
+space that numpy and OpenBLAS reserve for their arenas but never touch, so
+renders would fail long before their resident memory became a problem.
+
+One-off ``manim`` processes are limited from the parent right after they
+start, with `limit_process` (``prlimit(2)`` and a write to the cgroup's
+``cgroup.procs``). Nothing runs between fork and exec, which matters because
+renders are spawned from the threads of the MCP server, the Streamlit
+executor and the batch client. Warm workers apply the limits around each job
+with `apply_limits`, counted from what the worker had already used, and exit
+after a job that hits one.
+
+`AdmissionController` decides whether the host can take more work: new
+renders wait while the load average per core is above a threshold or free
+memory is below one, and are rejected outright once too many are waiting.
+"""
+
+import errno
+import os
+import resource
+import signal
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+MB = 1024 * 1024
+# Seconds between SIGXCPU and the SIGKILL of the hard limit
+CPU_GRACE_SECONDS = 5
+# How often the resident set size is checked when no cgroup limits memory
+MEMORY_POLL_SECONDS = 0.25
+
+
+@dataclass(frozen=True)
+class RenderLimits:
+    wall_seconds: float
+    cpu_seconds: int
+    memory_mb: int
+    output_mb: int
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class LimitExceeded(Exception):
+    """Raised inside a worker when a render passes its CPU limit"""
+
+
+def _clamp(limit: int, soft: int, hard: Optional[int] = None) -> Tuple[int, int]:
+    """(soft, hard) for `limit`, never above the current hard limit (which can't be raised)"""
+    current_soft, current_hard = resource.getrlimit(limit)
+    if current_hard != resource.RLIM_INFINITY:
+        soft = min(soft, current_hard)
+        hard = current_hard if hard is None else min(hard, current_hard)
+    return soft, current_hard if hard is None else hard
+
+
+def _set(limit: int, soft: int, hard: Optional[int] = None):
+    resource.setrlimit(limit, _clamp(limit, soft, hard))
+
+
+def rss_bytes(pid="self") -> int:
+    """Resident set size of a process, from /proc (0 when it is gone)"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def cgroup_for(limits: RenderLimits) -> Optional[Path]:
+    """Create a child cgroup with the memory limit, if MANIM_CGROUP_DIR is set and writable"""
+    root = os.getenv("MANIM_CGROUP_DIR")
+    if not root:
+        return None
+    path = Path(root) / f"render-{uuid.uuid4().hex[:12]}"
+    try:
+        path.mkdir()
+        (path / "memory.max").write_text(str(limits.memory_mb * MB))
+        (path / "memory.swap.max").write_text("0")
+    except OSError:
+        remove_cgroup(path)
+        return None
+    return path
+
+
+def remove_cgroup(path: Optional[Path]):
+    if path is not None:
+        try:
+            path.rmdir()
+        except OSError:
+            pass
+
+
+def limit_process(pid: int, limits: RenderLimits, cgroup: Optional[Path] = None) -> Optional[Path]:
+    """Put a just-started child under `limits`; returns `cgroup` if the child could be moved into it.
+
+    Without a cgroup the caller enforces the memory limit with `rss_bytes`.
+    The child is a Python process, which ignores SIGXFSZ, so oversized writes
+    fail with EFBIG instead of killing it.
+    """
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CPU,
+                         _clamp(resource.RLIMIT_CPU, limits.cpu_seconds, limits.cpu_seconds + CPU_GRACE_SECONDS))
+        resource.prlimit(pid, resource.RLIMIT_FSIZE, _clamp(resource.RLIMIT_FSIZE, limits.output_mb * MB))
+    except ProcessLookupError:
+        return cgroup  # already exited; its exit status tells the rest
+    if cgroup is not None:
+        try:
+            (cgroup / "cgroup.procs").write_text(str(pid))
+        except ProcessLookupError:
+            pass
+        except OSError:
+            return None
+    return cgroup
+
+
+def apply_limits(limits: Optional[dict]) -> Callable[[], None]:
+    """Limit the rest of the current job of a long-lived worker; returns a function undoing it"""
+    if not limits:
+        return lambda: None
+    limits = RenderLimits(**limits)
+    saved = {limit: resource.getrlimit(limit) for limit in (resource.RLIMIT_CPU, resource.RLIMIT_FSIZE)}
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime)
+    memory_limit = rss_bytes() + limits.memory_mb * MB
+    done = threading.Event()
+
+    def on_cpu_limit(signum, frame):
+        # The kernel repeats SIGXCPU every second; one exception is enough
+        signal.signal(signal.SIGXCPU, signal.SIG_IGN)
+        raise LimitExceeded(f"Render used more than {limits.cpu_seconds} CPU seconds")
+
+    def on_memory_limit(signum, frame):
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        raise MemoryError(f"Render used more than {limits.memory_mb} MB")
+
+    def watch_memory():
+        # Signal handlers run in the main thread, where the render is
+        while not done.wait(MEMORY_POLL_SECONDS):
+            if rss_bytes() > memory_limit:
+                os.kill(os.getpid(), signal.SIGUSR1)
+                return
+
+    signal.signal(signal.SIGXCPU, on_cpu_limit)
+    signal.signal(signal.SIGUSR1, on_memory_limit)
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    # Only soft limits: an unprivileged worker could never raise a hard one again,
+    # and the parent's wall-clock timeout stops a render that ignores SIGXCPU
+    _set(resource.RLIMIT_CPU, used + limits.cpu_seconds)
+    _set(resource.RLIMIT_FSIZE, limits.output_mb * MB)
+    threading.Thread(target=watch_memory, daemon=True, name="memory-limit").start()
+
+    def restore():
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        done.set()
+        for limit, (soft, hard) in saved.items():
+            resource.setrlimit(limit, (soft, hard))
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+    return restore
+
+
+def limit_error_type(returncode: Optional[int], cgroup: bool = False, output: str = "") -> Optional[str]:
+    """Name the limit that stopped a render process, from its exit signal or its last output"""
+    if returncode == -signal.SIGXCPU:
+        return "CpuLimit"
+    if returncode == -signal.SIGXFSZ:
+        return "OutputLimit"
+    if returncode == -signal.SIGKILL:
+        # Past the hard CPU limit, or the cgroup's OOM killer
+        return "MemoryLimit" if cgroup else "CpuLimit"
+    if "MemoryError" in output:
+        return "MemoryLimit"
+    if "File too large" in output:
+        return "OutputLimit"
+    return None
+
+
+LIMIT_NAMES = {"CpuLimit": "CPU time", "MemoryLimit": "memory", "OutputLimit": "output size"}
+
+
+def limit_message(limit: str) -> str:
+    return f"Render exceeded its {LIMIT_NAMES[limit]} limit"
+
+
+def exceeded_limit(exc: BaseException) -> Optional[str]:
+    """Name the limit a worker exception comes from, if any"""
+    if isinstance(exc, LimitExceeded):
+        return "CpuLimit"
+    if isinstance(exc, MemoryError):
+        return "MemoryLimit"
+    if isinstance(exc, OSError) and exc.errno == errno.EFBIG:
+        return "OutputLimit"
+    return None
+
+
+def check_output(path: Path, limits: RenderLimits) -> Optional[str]:
+    """An error message if a finished output is larger than the profile allows"""
+    size = Path(path).stat().st_size
+    if size > limits.output_mb * MB:
+        return f"Output is {size / MB:.1f} MB, more than the {limits.output_mb} MB limit"
+    return None
+
+
+def _available_memory_mb() -> Optional[float]:
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class AdmissionController:
+    """Hold back new renders while the host is overloaded"""
+
+    def __init__(self, max_load_per_cpu: float = 1.5, min_free_mb: int = 512, max_waiting: int = 100,
+                 poll_seconds: float = 1.0):
+        self.max_load_per_cpu = max_load_per_cpu
+        self.min_free_mb = min_free_mb
+        self.max_waiting = max_waiting
+        self.poll_seconds = poll_seconds
+        self.deferred = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def overloaded(self) -> Optional[str]:
+        """Why the host can't start another render right now, or None"""
+        try:
+            load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            load = 0.0
+        if load > self.max_load_per_cpu:
+            return f"load {load:.2f} per core is above {self.max_load_per_cpu:g}"
+        free = _available_memory_mb()
+        if free is not None and free < self.min_free_mb:
+            return f"only {free:.0f} MB of memory free"
+        return None
+
+    def reject(self, waiting: int) -> Optional[str]:
+        """Why a new render should be refused outright, given how many already wait, or None"""
+        if waiting >= self.max_waiting:
+            with self._lock:
+                self.rejected += 1
+            return f"Server busy: {waiting} renders are already waiting"
+        return None
+
+    def wait(self, cancel: Optional[threading.Event] = None):
+        """Block until the host has room for another render"""
+        deferred = False
+        while self.overloaded() and not (cancel is not None and cancel.is_set()):
+            if not deferred:
+                deferred = True
+                with self._lock:
+                    self.deferred += 1
+            time.sleep(self.poll_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "overloaded": self.overloaded(),
+            "deferred": self.deferred,
+            "rejected": self.rejected,
+            "max_load_per_cpu": self.max_load_per_cpu,
+            "min_free_mb": self.min_free_mb,
+            "max_waiting": self.max_waiting,
+        }
+
+
+_admission: Optional[AdmissionController] = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Return the process-wide admission controller configured from the environment"""
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = AdmissionController(
+                float(os.getenv("MANIM_ADMIT_MAX_LOAD", 1.5)),
+                int(os.getenv("MANIM_ADMIT_MIN_FREE_MB", 512)),
+                int(os.getenv("MANIM_MAX_WAITING_RENDERS", 100)),
+            )
+        return _admission
@@ -0,0 +1,185 @@
+"""
+Incremental monitoring of Manim render processes.
+
+`run_monitored` reads the combined output of a render as it is produced into
+a bounded ring buffer instead of buffering everything until exit. Python
+tracebacks and LaTeX errors are recognised as they appear and the process is
+killed at the first fatal error, so a scene that fails on its first
+``self.play`` releases its slot right away. Failures come back as a
+`RenderError` with the error type, the line in the scene file and a message.
+"""
+
+import re
+import subprocess
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from render_limits import (MB, RenderLimits, cgroup_for, limit_error_type, limit_message, limit_process, remove_cgroup,
+                          rss_bytes)
+
+DEFAULT_TAIL_LINES = 200
+
+# "NameError: name 'x' is not defined", "manim.utils.tex.TexError: ..."
+EXCEPTION_LINE = re.compile(r"^\s*(?:[\w.]+\.)?(\w+(?:Error|Exception|Exit|Interrupt)):\s?(.*)$")
+# Plain tracebacks: File "/path/scene.py", line 12, in construct
+PLAIN_FRAME = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+)')
+# Rich tracebacks: │ /path/scene.py:12 in construct
+RICH_FRAME = re.compile(r"(?P<file>[^\s│]+\.py):(?P<line>\d+) in ")
+LATEX_ERROR = re.compile(r"^! (.*)$|LaTeX compilation error: (.*)$")
+
+
+@dataclass
+class RenderError:
+    type: str
+    message: str
+    line: Optional[int] = None
+    tail: str = ""
+
+    def __str__(self) -> str:
+        where = f" at line {self.line}" if self.line else ""
+        return f"{self.type}{where}: {self.message}"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class MonitorResult:
+    returncode: Optional[int]
+    error: Optional[RenderError] = None
+    cancelled: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.cancelled and self.returncode == 0
+
+
+class OutputClassifier:
+    """Watch render output line by line and decide when it has failed for good"""
+
+    def __init__(self, scene_file: Optional[str] = None, tail_lines: int = DEFAULT_TAIL_LINES):
+        self.scene_file = Path(scene_file).name if scene_file else None
+        self.tail = deque(maxlen=tail_lines)
+        self.error: Optional[RenderError] = None
+        self._in_traceback = False
+        self._scene_line: Optional[int] = None
+
+    def feed(self, line: str) -> Optional[RenderError]:
+        """Classify one line; returns the error once a fatal one is recognised"""
+        line = line.rstrip("\n")
+        self.tail.append(line)
+        if self.error is not None:
+            return self.error
+
+        if "Traceback" in line:
+            self._in_traceback = True
+        for pattern in (PLAIN_FRAME, RICH_FRAME):
+            match = pattern.search(line)
+            if match and self.scene_file and Path(match.group("file")).name == self.scene_file:
+                self._scene_line = int(match.group("line"))
+
+        latex = LATEX_ERROR.search(line)
+        if latex:
+            self.error = RenderError("LatexError", (latex.group(1) or latex.group(2)).strip(), self._scene_line)
+        elif self._in_traceback:
+            exception = EXCEPTION_LINE.match(line)
+            if exception:
+                self.error = RenderError(exception.group(1), exception.group(2).strip(), self._scene_line)
+        if self.error is not None:
+            self.error.tail = self.tail_text()
+        return self.error
+
+    def tail_text(self) -> str:
+        return "\n".join(self.tail)
+
+
+def run_monitored(cmd: List[str], cwd=None, timeout: Optional[float] = None,
+                  cancel: Optional[threading.Event] = None, scene_file: Optional[str] = None,
+                  tail_lines: int = DEFAULT_TAIL_LINES, limits: Optional[RenderLimits] = None) -> MonitorResult:
+    """Run a render command, killing it on the first fatal error, timeout or cancel
+
+    With `limits`, the process runs under their CPU, memory and file size limits
+    and `timeout` defaults to their wall-clock limit.
+    """
+    cgroup = cgroup_for(limits) if limits is not None else None
+    if limits is not None and timeout is None:
+        timeout = limits.wall_seconds
+    try:
+        process = subprocess.Popen(
+            cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+        )
+    except BaseException:
+        remove_cgroup(cgroup)
+        raise
+    if limits is not None:
+        limited = limit_process(process.pid, limits, cgroup)
+        if limited is None:
+            remove_cgroup(cgroup)
+        cgroup = limited
+    # Without a cgroup, memory is limited here by the child's resident set size
+    memory_limit = limits.memory_mb * MB if limits is not None and cgroup is None else None
+    classifier = OutputClassifier(scene_file, tail_lines)
+    fatal = threading.Event()
+
+    def reader():
+        # Text mode turns progress-bar carriage returns into separate lines
+        for line in process.stdout:
+            if classifier.feed(line) is not None:
+                fatal.set()
+                break
+        process.stdout.close()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    result = MonitorResult(returncode=None)
+    while process.poll() is None:
+        if fatal.is_set():
+            break
+        if cancel is not None and cancel.is_set():
+            result.cancelled = True
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            result.error = RenderError("Timeout", f"Render took longer than {timeout:g} seconds",
+                                       tail=classifier.tail_text())
+            break
+        if memory_limit is not None and rss_bytes(process.pid) > memory_limit:
+            result.error = RenderError("MemoryLimit", limit_message("MemoryLimit"), tail=classifier.tail_text())
+            break
+        fatal.wait(0.1)
+
+    if process.poll() is None:
+        process.kill()
+    process.wait()
+    thread.join(timeout=5)
+    remove_cgroup(cgroup)
+    result.returncode = process.returncode
+
+    if result.error is None and classifier.error is not None:
+        result.error = classifier.error
+    elif result.error is None and not result.cancelled and process.returncode != 0:
+        last = next((line for line in reversed(classifier.tail) if line.strip()), "Unknown error")
+        result.error = RenderError("RenderFailed", last.strip(), tail=classifier.tail_text())
+    if limits is not None and result.error is not None and result.error.type not in ("Timeout", "MemoryLimit"):
+        # A process we killed on its first traceback says nothing through its exit signal
+        returncode = None if fatal.is_set() else process.returncode
+        limit = limit_error_type(returncode, cgroup is not None, classifier.tail_text())
+        if limit is not None:
+            result.error = RenderError(limit, limit_message(limit), result.error.line, classifier.tail_text())
+    return result
+
+
+def error_from_exception(exc: BaseException, scene_file: str) -> RenderError:
+    """Build a RenderError for an exception raised while rendering `scene_file` in-process"""
+    line = None
+    for frame in traceback.extract_tb(exc.__traceback__):
+        if frame.filename == scene_file:
+            line = frame.lineno
+    if isinstance(exc, SyntaxError) and exc.filename == scene_file:
+        line = exc.lineno
+    return RenderError(type(exc).__name__, str(exc), line, "".join(traceback.format_exception(exc)))
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Render node for distributed rendering
+
+Pulls render jobs from a coordinator (the MCP server started with
+MANIM_COORDINATOR_PORT, see render_cluster.py) and renders them with the
+same code path as a local render: the render cache, a pool of warm Manim
+workers and the media store, which must be the same directory (e.g. an NFS
+mount) as the coordinator's; videos are reported relative to its root. Each
+of the node's slots renders one job at a time; a node can also hold a few
+leased jobs in reserve, which idle nodes steal when they run out of work.
+
+Usage:
+    python render_node.py --coordinator http://127.0.0.1:8765 [--slots 2] [--prefetch 1]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+from media_store import MediaStore, get_media_store
+from render_cluster import LEASE_WAIT, TOKEN_HEADER, job_from_payload
+from render_jobs import RenderJob
+from render_monitor import RenderError
+from render_runner import render_job
+from worker_pool import RenderFailed
+
+RETRY_SECONDS = 2.0
+
+
+class CoordinatorUnavailable(Exception):
+    """Raised when the coordinator can't be reached"""
+
+
+class RenderNode:
+    def __init__(self, coordinator_url: str, name: str, slots: int, prefetch: int = 1, token: Optional[str] = None,
+                 store: Optional[MediaStore] = None):
+        self.url = coordinator_url.rstrip("/")
+        self.name = name
+        self.slots = slots
+        self.prefetch = prefetch
+        self.token = token
+        self.store = store or get_media_store()
+        self.node_id: Optional[str] = None
+        self.heartbeat_interval = 5.0
+        self.running: Dict[str, RenderJob] = {}
+        self._reserve: deque = deque()
+        self._lock = threading.Lock()
+        self._registered = threading.Lock()
+
+    def _post(self, route: str, payload: dict, timeout: float = LEASE_WAIT + 10) -> dict:
+        request = urllib.request.Request(
+            f"{self.url}{route}", data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json", **({TOKEN_HEADER: self.token} if self.token else {})},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())
+        except (OSError, urllib.error.URLError) as e:
+            raise CoordinatorUnavailable(str(e)) from e
+
+    def register(self, stale_id: Optional[str] = None):
+        with self._registered:
+            if self.node_id != stale_id:
+                return  # another thread already registered again
+            while True:
+                try:
+                    reply = self._post("/register", {"name": self.name, "slots": self.slots})
+                    break
+                except CoordinatorUnavailable as e:
+                    print(f"⏳ Coordinator unavailable ({e}); retrying", file=sys.stderr)
+                    time.sleep(RETRY_SECONDS)
+            self.node_id = reply["node_id"]
+            self.heartbeat_interval = reply.get("heartbeat_interval", self.heartbeat_interval)
+            # Leases held by the old id were requeued by the coordinator
+            self._reserve.clear()
+            print(f"✅ Registered as {self.node_id}", file=sys.stderr)
+
+    def _lease(self, wait: float) -> Optional[dict]:
+        node_id = self.node_id
+        try:
+            reply = self._post("/lease", {"node_id": node_id, "wait": wait})
+        except CoordinatorUnavailable:
+            time.sleep(RETRY_SECONDS)
+            return None
+        if not reply.get("known"):
+            self.register(node_id)
+            return None
+        return reply.get("task")
+
+    def _next_task(self) -> Optional[dict]:
+        with self._lock:
+            if self._reserve:
+                return self._reserve.popleft()
+        return self._lease(LEASE_WAIT)
+
+    def _fill_reserve(self):
+        """Lease a job to start as soon as a slot frees up; other nodes may steal it first"""
+        with self._lock:
+            if len(self._reserve) >= self.prefetch:
+                return
+        task = self._lease(0)
+        if task is not None:
+            with self._lock:
+                self._reserve.append(task)
+
+    def _slot(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                continue
+            node_id = self.node_id
+            try:
+                if not self._post("/start", {"node_id": node_id, "job_id": task["id"]}).get("ok"):
+                    continue  # stolen by another node or cancelled
+            except CoordinatorUnavailable:
+                continue
+            if self.prefetch:
+                self._fill_reserve()
+            self._run(task, node_id)
+
+    def _run(self, task: dict, node_id: str):
+        job = job_from_payload(task, self.store)
+        with self._lock:
+            self.running[job.id] = job
+        report = {"node_id": node_id, "job_id": job.id}
+        started = time.perf_counter()
+        try:
+            # Nodes may mount the shared store at different paths
+            report["video"] = Path(render_job(job)).resolve().relative_to(self.store.root).as_posix()
+            print(f"🎬 {job.id} rendered in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        except RenderFailed as e:
+            error = RenderError("Cancelled", "Render cancelled") if job.cancel_event.is_set() else e.error
+            report["error"] = error.to_dict()
+        except Exception as e:
+            report["error"] = RenderError("NodeError", f"{type(e).__name__}: {e}").to_dict()
+        finally:
+            with self._lock:
+                self.running.pop(job.id, None)
+        if "error" in report:
+            print(f"❌ {job.id}: {report['error']['type']}: {report['error']['message']}", file=sys.stderr)
+        for _ in range(5):
+            try:
+                self._post("/complete", report)
+                return
+            except CoordinatorUnavailable:
+                time.sleep(RETRY_SECONDS)
+
+    def _heartbeats(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            node_id = self.node_id
+            with self._lock:
+                running = list(self.running)
+            try:
+                reply = self._post("/heartbeat", {"node_id": node_id, "running": running})
+            except CoordinatorUnavailable:
+                continue
+            if not reply.get("known"):
+                self.register(node_id)
+                continue
+            with self._lock:
+                for job_id in reply.get("cancel", []):
+                    if job_id in self.running:
+                        self.running[job_id].cancel_event.set()
+
+    def run(self):
+        self.register()
+        threading.Thread(target=self._heartbeats, daemon=True, name="heartbeat").start()
+        slots = [threading.Thread(target=self._slot, daemon=True, name=f"slot{i}") for i in range(self.slots)]
+        for thread in slots:
+            thread.start()
+        for thread in slots:
+            thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render jobs handed out by a Manim MCP coordinator")
+    parser.add_argument("--coordinator", default=os.getenv("MANIM_COORDINATOR_URL", "http://127.0.0.1:8765"),
+                        help="Coordinator URL (default: MANIM_COORDINATOR_URL or http://127.0.0.1:8765)")
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}", help="Node name shown in stats")
+    parser.add_argument("--slots", type=int, default=int(os.getenv("MANIM_WORKERS", min(2, os.cpu_count() or 1))) or 1,
+                        help="Jobs rendered at once (default: MANIM_WORKERS)")
+    parser.add_argument("--prefetch", type=int, default=1, help="Jobs leased in reserve for when a slot frees up")
+    args = parser.parse_args()
+
+    print(f"🖥️  Render node {args.name}: {args.slots} slots, coordinator {args.coordinator}", file=sys.stderr)
+    try:
+        RenderNode(args.coordinator, args.name, max(1, args.slots), max(0, args.prefetch),
+                   os.getenv("MANIM_CLUSTER_TOKEN") or None).run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
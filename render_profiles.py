@@ -0,0 +1,191 @@
+"""
+Named render profiles shared by the MCP server and the clients.
+
+A profile fixes everything that decides how expensive a render is and what
+comes out of it: resolution, frame rate, the x264 preset and CRF of the
+encoded movie, the output format and the resource limits a render of it
+may use (see render_limits). Renders ask for a profile by name
+(``preview``, ``chat`` or ``publish``), optionally with a format suffix such
+as ``publish:webm`` or ``preview:gif``.
+
+Profiles turn into plain Manim config overrides (so they work both in warm
+workers through ``tempconfig`` and in ``manim`` processes through
+``--config_file``) plus encoder options. Manim has no setting for the
+encoder preset, so `install_encoder_hook` passes the options to PyAV when
+Manim creates the video stream of a partial movie, before the codec is
+opened. Only x264/x265 streams get them; the preset and CRF mean nothing
+to the WebM and GIF encoders.
+
+The ``png`` format renders a PNG sequence, which is delivered as one zip
+archive so it can be cached and served like any other output.
+"""
+
+import os
+import zipfile
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from job_manifest import output_path
+from render_limits import RenderLimits
+from worker_pool import RenderFailed
+
+FORMATS = ("mp4", "webm", "gif", "png")
+FRAMES_DIR = "frames"
+# Encoders that understand the preset and CRF options
+X264_CODECS = ("libx264", "libx265")
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    name: str
+    width: int
+    height: int
+    fps: int
+    # x264 speed/size trade-off; faster presets give bigger files for the same CRF
+    preset: str
+    crf: int
+    limits: RenderLimits
+    format: str = "mp4"
+
+    @property
+    def label(self) -> str:
+        """Name including a non-default format, e.g. ``publish:webm``"""
+        return self.name if self.format == "mp4" else f"{self.name}:{self.format}"
+
+    @property
+    def extension(self) -> str:
+        return ".zip" if self.format == "png" else f".{self.format}"
+
+    def with_format(self, format: str) -> "RenderProfile":
+        if format not in FORMATS:
+            raise ValueError(f"Unknown output format {format!r}; choose one of {', '.join(FORMATS)}")
+        return replace(self, format=format)
+
+    def overrides(self, workspace: Path) -> dict:
+        """Manim config overrides for this profile, to merge over job_manifest.manim_overrides"""
+        overrides = {
+            "pixel_width": self.width,
+            "pixel_height": self.height,
+            "frame_rate": self.fps,
+            "format": self.format,
+        }
+        if self.format == "png":
+            overrides.update(
+                write_to_movie=False,
+                save_pngs=True,
+                images_dir=str((Path(workspace) / FRAMES_DIR).resolve()),
+            )
+        return overrides
+
+    def encoder_options(self) -> Dict[str, str]:
+        """x264 options of the movie; other formats keep Manim's encoder settings"""
+        if self.format != "mp4":
+            return {}
+        return {"preset": self.preset, "crf": str(self.crf)}
+
+    def cache_flags(self) -> List[str]:
+        """Render cache key flags; anything that changes the output bytes belongs here"""
+        return [f"profile={self.label}", f"{self.width}x{self.height}@{self.fps}",
+                f"preset={self.preset}", f"crf={self.crf}"]
+
+    def output(self, workspace: Path) -> Path:
+        """Path of the finished output, packing a PNG sequence into a zip first
+
+        Raises RenderFailed when a PNG render left no frames to pack. Before
+        the render, use ``job_manifest.output_path(workspace, profile.extension)``.
+        """
+        target = output_path(workspace, self.extension)
+        if self.format == "png" and not target.exists():
+            frames = sorted((Path(workspace) / FRAMES_DIR).glob("*.png"))
+            if not frames:
+                raise RenderFailed("No output files found.")
+            tmp_path = target.with_suffix(".zip.tmp")
+            # PNGs are already compressed; storing them keeps packing cheap
+            with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED) as archive:
+                for frame in frames:
+                    archive.write(frame, frame.name)
+            tmp_path.replace(target)
+        return target
+
+
+def _limits(wall_seconds: float, cpu_seconds: int, memory_mb: int, output_mb: int) -> RenderLimits:
+    # MANIM_RENDER_TIMEOUT replaces every profile's wall-clock limit
+    return RenderLimits(float(os.getenv("MANIM_RENDER_TIMEOUT", wall_seconds)), cpu_seconds, memory_mb, output_mb)
+
+
+PROFILES = {
+    "preview": RenderProfile("preview", 854, 480, 15, preset="ultrafast", crf=28,
+                             limits=_limits(60, 120, 1024, 50)),
+    "chat": RenderProfile("chat", 1280, 720, 30, preset="veryfast", crf=23,
+                          limits=_limits(300, 600, 2048, 200)),
+    "publish": RenderProfile("publish", 1920, 1080, 60, preset="slow", crf=18,
+                             limits=_limits(900, 3600, 4096, 1024)),
+}
+DEFAULT_PROFILE = "publish"
+
+
+def get_profile(name: Optional[str] = None) -> RenderProfile:
+    """Look up ``name`` or ``name:format``; raises ValueError for unknown names"""
+    name, _, format = (name or DEFAULT_PROFILE).partition(":")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown render profile {name!r}; choose one of {', '.join(PROFILES)}")
+    profile = PROFILES[name]
+    return profile.with_format(format) if format else profile
+
+
+_encoder_options: Dict[str, str] = {}
+
+
+def set_encoder_options(options: Optional[Dict[str, str]]):
+    """Encoder options for the movies this process renders from now on"""
+    _encoder_options.clear()
+    _encoder_options.update(options or {})
+
+
+class _EncoderOptionsContainer:
+    """An output container whose x264 streams get the current encoder options"""
+
+    def __init__(self, container):
+        self._container = container
+
+    def __getattr__(self, name):
+        return getattr(self._container, name)
+
+    def __enter__(self):
+        self._container.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._container.__exit__(*exc_info)
+
+    def add_stream(self, *args, **kwargs):
+        codec_name = kwargs.get("codec_name", args[0] if args else None)
+        # Manim passes options only for the video stream of a partial movie
+        if kwargs.get("options") is not None and codec_name in X264_CODECS and _encoder_options:
+            kwargs["options"] = {**kwargs["options"], **_encoder_options}
+        return self._container.add_stream(*args, **kwargs)
+
+
+class _EncoderOptionsAV:
+    """The av module as Manim's scene file writer sees it once the hook is installed"""
+
+    def __init__(self, av):
+        self._av = av
+
+    def __getattr__(self, name):
+        return getattr(self._av, name)
+
+    def open(self, *args, **kwargs):
+        container = self._av.open(*args, **kwargs)
+        if isinstance(container, self._av.container.OutputContainer):
+            return _EncoderOptionsContainer(container)
+        return container
+
+
+def install_encoder_hook():
+    """Pass the current encoder options to every partial movie stream Manim creates"""
+    from manim.scene import scene_file_writer
+
+    if not isinstance(scene_file_writer.av, _EncoderOptionsAV):
+        scene_file_writer.av = _EncoderOptionsAV(scene_file_writer.av)
@@ -0,0 +1,105 @@
+"""
+Renders one job of the MCP server's queue.
+
+`render_job` is what a render slot runs: it answers from the render cache
+when it can, otherwise renders on the warm worker pool (splitting long scenes
+into segments) or, without workers, in a one-off ``manim`` process. The
+video, ``manifest.json`` and stage timings end up in the job's workspace in
+the media store. The MCP server calls it for local renders and render nodes
+(see render_node) call it for jobs handed out by a coordinator.
+"""
+
+import os
+import time
+
+from job_manifest import manim_overrides, output_path, write_manifest, write_manim_config
+from media_store import get_media_store, publish
+from render_cache import cache_key, get_render_cache
+from render_jobs import RenderJob
+from render_limits import check_output
+from render_monitor import RenderError, run_monitored
+from render_profiles import RenderProfile, get_profile
+from segment_render import render_segmented
+from stage_timing import StageTimes, read_process_timings
+from tex_cache import manim_command
+from worker_pool import RenderCancelled, RenderFailed, WorkerUnavailable, get_worker_pool
+
+MANIM_EXECUTABLE_PATH = os.getenv("MANIM_EXECUTABLE", "manim")
+# A custom executable can't load the shared TeX cache hook; it only shares the cache directory
+MANIM_COMMAND = [MANIM_EXECUTABLE_PATH] if os.getenv("MANIM_EXECUTABLE") else manim_command()
+
+
+def _check_output(video, profile: RenderProfile):
+    error = check_output(video, profile.limits)
+    if error:
+        raise RenderFailed(error, RenderError("OutputLimit", error))
+
+
+def render_job(job: RenderJob) -> str:
+    """Render a job inside its own workspace and return the video path (blocks)"""
+    # Eviction must not remove the workspace or the shared partial movies mid-render
+    with get_media_store().leases(job.workspace, job.conversation_dir):
+        return _render_in_workspace(job)
+
+
+def _render_in_workspace(job: RenderJob) -> str:
+    profile = get_profile(job.profile)
+    render_cache = get_render_cache()
+    key = cache_key(job.code, job.scene_name, flags=profile.cache_flags())
+    cached = render_cache.get(key, profile.extension)
+    if cached:
+        # Link the cached video into the workspace so the job owns its output
+        video = publish(cached, output_path(job.workspace, profile.extension))
+        write_manifest(job.workspace, job.id, video, job.scene_name, profile.label, cached=True)
+        return str(video)
+
+    file_path = job.workspace / "manim_code.py"
+    file_path.write_text(job.code)
+    overrides = {**manim_overrides(job.workspace, job.conversation_dir), **profile.overrides(job.workspace)}
+
+    pool = get_worker_pool()
+    if pool:
+        try:
+            result = render_segmented(
+                pool, job.code, job.scene_name, overrides,
+                filename=str(file_path), timeout=profile.limits.wall_seconds, cancel=job.cancel_event,
+                encoder=profile.encoder_options(), limits=profile.limits,
+            )
+            timings = StageTimes(result.timings)
+            with timings.measure("publish"):
+                video = profile.output(job.workspace)
+                _check_output(video, profile)
+                render_cache.put(key, video)
+            write_manifest(job.workspace, job.id, video, result.scene, profile.label,
+                           duration=result.duration, render_seconds=result.seconds, timings=timings.to_dict())
+            return str(video)
+        except WorkerUnavailable:
+            pass  # fall back to a one-off manim process
+
+    # Run the manim command
+    started = time.monotonic()
+    config_file = write_manim_config(job.workspace, overrides)
+    timings_file = job.workspace / "stage_timings.json"
+    command = MANIM_COMMAND if os.getenv("MANIM_EXECUTABLE") else manim_command(timings_file, profile.encoder_options())
+    cmd = [*command, "--progress_bar", "none", "--config_file", str(config_file), str(file_path)]
+    if job.scene_name:
+        cmd.append(job.scene_name)
+    result = run_monitored(
+        cmd, cwd=job.workspace, cancel=job.cancel_event, scene_file=str(file_path), limits=profile.limits
+    )
+    if result.cancelled:
+        raise RenderCancelled("Render cancelled")
+    if not result.ok:
+        raise RenderFailed(str(result.error), result.error)
+
+    render_seconds = time.monotonic() - started
+    timings = StageTimes(read_process_timings(timings_file, render_seconds))
+    with timings.measure("publish"):
+        video = profile.output(job.workspace)
+        if not video.exists():
+            raise RenderFailed("No output files found.")
+        _check_output(video, profile)
+        render_cache.put(key, video)
+    write_manifest(job.workspace, job.id, video, job.scene_name, profile.label,
+                   render_seconds=render_seconds, timings=timings.to_dict())
+    return str(video)
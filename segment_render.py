@@ -0,0 +1,146 @@
+"""
+Parallel rendering of one long scene split into animation ranges.
+
+A scene's ``self.play``/``self.wait`` calls are numbered from 0. Manim can
+render just a range of them (``-n start,end``, i.e. ``from_animation_number``
+and ``upto_animation_number``): the animations before the range are skipped,
+which only advances the scene state, and rendering stops after the range.
+So the animations can be split into contiguous ranges, each range rendered by
+its own warm worker, and the segment movies joined.
+
+The join remuxes the encoded packets without re-encoding, the same way Manim
+combines its own partial movies, so the result is identical to a serial render
+of the same profile. Only MP4 and WebM movies are split; stills, GIFs, PNG
+sequences, scenes with sound and short scenes are rendered in one piece.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from job_manifest import probe_duration
+from render_limits import RenderLimits
+from worker_pool import ManimWorkerPool, RenderResult
+
+SEGMENT_FORMATS = ("mp4", "webm")
+# Fewer animations than this per segment isn't worth a worker of its own
+MIN_ANIMATIONS_PER_SEGMENT = 4
+SEGMENTS_DIR = "segments"
+
+
+def default_segments() -> int:
+    """Segments per render from MANIM_RENDER_SEGMENTS; 0 or 1 disables splitting"""
+    return int(os.getenv("MANIM_RENDER_SEGMENTS", 0))
+
+
+def split_ranges(plays: int, segments: int) -> List[Tuple[int, int]]:
+    """Split animations 0..plays-1 into at most `segments` inclusive (start, end) ranges"""
+    segments = max(1, min(segments, plays // MIN_ANIMATIONS_PER_SEGMENT))
+    size, extra = divmod(plays, segments)
+    ranges = []
+    start = 0
+    for i in range(segments):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end - 1))
+        start = end
+    return ranges
+
+
+def concat_movies(parts: List[Path], target: Path):
+    """Join movies with identical encoding into `target` without re-encoding them"""
+    list_file = target.parent / f".{target.stem}.concat.txt"
+    tmp_path = target.parent / f".{target.stem}.concat{target.suffix}"
+    list_file.write_text("".join(f"file '{part.resolve()}'\n" for part in parts))
+    try:
+        try:
+            import av
+        except ImportError:
+            subprocess.run(
+                [shutil.which("ffmpeg") or "ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                 "-i", str(list_file), "-c", "copy", str(tmp_path)],
+                check=True,
+            )
+        else:
+            with av.open(str(list_file), format="concat", options={"safe": "0"}) as source, \
+                    av.open(str(tmp_path), mode="w") as output:
+                source_stream = source.streams.video[0]
+                add_from_template = getattr(output, "add_stream_from_template", None)
+                stream = (add_from_template(source_stream) if add_from_template
+                          else output.add_stream(template=source_stream))
+                for packet in source.demux(source_stream):
+                    if packet.dts is None:
+                        continue
+                    packet.stream = stream
+                    output.mux(packet)
+        os.replace(tmp_path, target)
+    finally:
+        list_file.unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
+
+
+def _splittable(code: str, config: dict) -> bool:
+    return (
+        config.get("format", "mp4") in SEGMENT_FORMATS
+        and config.get("write_to_movie", True)
+        and not config.get("save_last_frame")
+        and "add_sound" not in code
+    )
+
+
+def render_segmented(pool: ManimWorkerPool, code: str, scene_name: Optional[str], config: dict,
+                     filename: str = "scene.py", timeout: Optional[float] = None,
+                     cancel: Optional[threading.Event] = None, encoder: Optional[dict] = None,
+                     segments: Optional[int] = None, limits: Optional[RenderLimits] = None) -> RenderResult:
+    """Render like `pool.render`, splitting long scenes across up to `segments` workers.
+
+    `config` must contain the ``video_dir`` and ``output_file`` overrides from
+    job_manifest.manim_overrides; the joined movie ends up where a serial render
+    would have written it.
+    """
+    segments = default_segments() if segments is None else segments
+    segments = min(segments, pool.size)
+    if segments <= 1 or not _splittable(code, config):
+        return pool.render(code, scene_name, config, filename, timeout, cancel, encoder, limits)
+
+    started = time.perf_counter()
+    plays = pool.count_animations(code, scene_name, config, filename, timeout, cancel, limits)
+    ranges = split_ranges(plays, segments)
+    if len(ranges) == 1:
+        return pool.render(code, scene_name, config, filename, timeout, cancel, encoder, limits)
+
+    video_dir = Path(config["video_dir"])
+    segment_dir = video_dir / SEGMENTS_DIR
+    segment_dir.mkdir(parents=True, exist_ok=True)
+
+    def render_range(index: int, first: int, last: int) -> RenderResult:
+        segment_config = {
+            **config,
+            "from_animation_number": first,
+            "upto_animation_number": last,
+            "video_dir": str(segment_dir),
+            "output_file": f"segment{index:03d}",
+        }
+        return pool.render(code, scene_name, segment_config, filename, timeout, cancel, encoder, limits)
+
+    with ThreadPoolExecutor(max_workers=len(ranges), thread_name_prefix="segment") as executor:
+        futures = [executor.submit(render_range, i, first, last) for i, (first, last) in enumerate(ranges)]
+        results = [future.result() for future in futures]
+
+    target = video_dir / f"{config['output_file']}.{config.get('format', 'mp4')}"
+    join_started = time.perf_counter()
+    concat_movies([result.video for result in results], target)
+    join_seconds = time.perf_counter() - join_started
+
+    # Segments run side by side, so the slowest one bounds each stage
+    timings = {}
+    for result in results:
+        for stage, seconds in result.timings.items():
+            timings[stage] = max(timings.get(stage, 0.0), seconds)
+    timings["encode"] = timings.get("encode", 0.0) + join_seconds
+    # A segment's own duration may include the skipped animations before it
+    return RenderResult(target, results[0].scene, probe_duration(target) or 0.0, time.perf_counter() - started, timings)
@@ -0,0 +1,283 @@
+"""
+Metrics and trace spans for the MCP server.
+
+`Metrics` keeps counters, gauges and histograms in memory under a lock and can
+render them as a JSON-friendly dict (the `server_stats` tool) or in the
+Prometheus text exposition format. Gauges such as queue depth are callables
+evaluated when the metrics are read, so nothing has to keep them up to date.
+`serve_prometheus` exposes ``/metrics`` over HTTP from a daemon thread.
+
+`Tracer` writes one JSON line per span when tracing is enabled, covering a
+render's queue wait, execution and the per-stage breakdown from stage_timing.
+It is off by default and costs nothing while off.
+"""
+
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+DURATION_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, math.inf)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def returned_error(result: object) -> bool:
+    """Whether a tool result reports a failure; tools return "Error: ..." strings rather than raise"""
+    return isinstance(result, str) and result.startswith(("Error", "An error occurred"))
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "buckets": {("+Inf" if bound == math.inf else f"{bound:g}"): total for bound, total in self.cumulative()},
+        }
+
+
+class Metrics:
+    """Thread-safe in-memory metrics registry"""
+
+    def __init__(self, namespace: str = "manim"):
+        self.namespace = namespace
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+        self._help: Dict[str, str] = {}
+
+    def inc(self, name: str, value: float = 1, help: str = "", **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0) + value
+            self._help.setdefault(name, help)
+
+    def observe(self, name: str, value: float, help: str = "", buckets: Iterable[float] = DURATION_BUCKETS, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+            self._help.setdefault(name, help)
+
+    def gauge(self, name: str, read: Callable[[], object], help: str = "", label: Optional[str] = None):
+        """Register a gauge read at collection time.
+
+        `read` returns a number, or with `label` a dict mapping label values to numbers.
+        """
+        def collect() -> Dict[Labels, float]:
+            value = read()
+            if label is None:
+                return {(): float(value)}
+            return {((label, str(key)),): float(number) for key, number in value.items()}
+
+        with self._lock:
+            self._gauges[name] = collect
+            self._help[name] = help
+
+    def instrument(self, tool: str, is_error: Optional[Callable[[object], bool]] = None):
+        """Decorator counting calls, errors and latency of an MCP tool.
+
+        A call failed when it raised or when `is_error` (by default
+        `returned_error`) says so of its result.
+        """
+        is_error = is_error or returned_error
+
+        def decorator(function):
+            def record(started: float, failed: bool):
+                self.inc("tool_requests_total", help="MCP tool calls", tool=tool)
+                if failed:
+                    self.inc("tool_errors_total", help="MCP tool calls that raised or returned an error",
+                             tool=tool)
+                self.observe("tool_duration_seconds", time.perf_counter() - started,
+                             help="MCP tool call latency", tool=tool)
+
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        result = await function(*args, **kwargs)
+                    except BaseException:
+                        record(started, True)
+                        raise
+                    record(started, is_error(result))
+                    return result
+            else:
+                @functools.wraps(function)
+                def wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        result = function(*args, **kwargs)
+                    except BaseException:
+                        record(started, True)
+                        raise
+                    record(started, is_error(result))
+                    return result
+            return wrapper
+        return decorator
+
+    def _read_gauges(self) -> Dict[str, Dict[Labels, float]]:
+        with self._lock:
+            gauges = dict(self._gauges)
+        values = {}
+        for name, collect in gauges.items():
+            try:
+                values[name] = collect()
+            except Exception:
+                continue  # a failing source must not break the whole scrape
+        return values
+
+    def snapshot(self) -> dict:
+        """All metrics as plain data, for the server_stats tool"""
+        def series_dict(series, convert=lambda v: v):
+            return {",".join(f"{k}={v}" for k, v in labels) or "value": convert(value) for labels, value in series.items()}
+
+        gauges = self._read_gauges()
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "counters": {name: series_dict(series) for name, series in self._counters.items()},
+                "gauges": {name: series_dict(series) for name, series in gauges.items()},
+                "histograms": {
+                    name: series_dict(series, Histogram.to_dict) for name, series in self._histograms.items()
+                },
+            }
+
+    def prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        gauges = self._read_gauges()
+        lines = []
+        with self._lock:
+            def header(name: str, kind: str) -> str:
+                full = f"{self.namespace}_{name}"
+                if self._help.get(name):
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} {kind}")
+                return full
+
+            for name, series in sorted(self._counters.items()):
+                full = header(name, "counter")
+                lines.extend(f"{full}{_format_labels(labels)} {value:g}" for labels, value in series.items())
+            for name, series in sorted(gauges.items()):
+                full = header(name, "gauge")
+                lines.extend(f"{full}{_format_labels(labels)} {value:g}" for labels, value in series.items())
+            for name, series in sorted(self._histograms.items()):
+                full = header(name, "histogram")
+                for labels, histogram in series.items():
+                    for bound, total in histogram.cumulative():
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{full}_bucket{_format_labels(labels, [('le', le)])} {total}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum:g}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(metrics: Metrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``GET /metrics`` in the Prometheus text format from a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # stdout carries the MCP protocol
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
+
+class Tracer:
+    """Append spans as JSON lines to a file; a Tracer without a path records nothing"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def span(self, trace_id: str, name: str, start: float, end: float, parent: Optional[str] = None, **attributes):
+        if not self.enabled:
+            return
+        record = {
+            "trace_id": trace_id,
+            "name": name,
+            "parent": parent,
+            "start": round(start, 6),
+            "duration": round(max(0.0, end - start), 6),
+            "attributes": attributes,
+        }
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def render_spans(self, trace_id: str, created: float, started: Optional[float], finished: float,
+                     stages: Dict[str, float], **attributes):
+        """Spans for one render: the whole job, its queue wait, its execution and each stage"""
+        if not self.enabled:
+            return
+        self.span(trace_id, "render", created, finished, **attributes)
+        if started is None:
+            return
+        self.span(trace_id, "queue", created, started, parent="render")
+        self.span(trace_id, "execute", started, finished, parent="render")
+        # Stages are measured as durations; lay them out back to back inside the execution
+        offset = started
+        for stage, seconds in stages.items():
+            self.span(trace_id, stage, offset, offset + seconds, parent="execute")
+            offset += seconds
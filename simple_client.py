@@ -8,28 +8,46 @@ import json
 import os
 import sys
 import tempfile
-import subprocess
+import time
 from pathlib import Path
 
-# Check if we have the required environment variable
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    print("❌ Please set GEMINI_API_KEY environment variable")
-    print("   export GEMINI_API_KEY='your-api-key-here'")
-    sys.exit(1)
+from code_stream import CodeStream
+from example_index import few_shot_section, get_example_index, is_edit
+from generation_cache import generation_key, get_generation_cache
+from job_manifest import manim_overrides, write_manim_config
+from llm_backend import LLMUnavailable, get_llm_backend
+from media_store import get_media_store, publish
+from preflight import preflight
+from render_cache import cache_key, get_render_cache
+from render_limits import check_output
+from render_monitor import run_monitored
+from render_profiles import RenderProfile, get_profile
+from segment_render import render_segmented
+from stage_timing import StageTimes, read_process_timings
+from tex_cache import manim_command
+from worker_pool import RenderFailed, WorkerUnavailable, get_worker_pool
 
 try:
-    import google.generativeai as genai
-except ImportError:
-    print("❌ Please install google-generativeai: pip install google-generativeai")
+    llm = get_llm_backend()
+except LLMUnavailable as e:
+    print(f"❌ {e}")
     sys.exit(1)
+# Bump when the prompt below changes so cached generations are not reused
+PROMPT_VERSION = "2"
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+SESSIONS_DIR = get_media_store().root / "sessions"
+# Render profile (see render_profiles.py); chat renders 720p30 with a fast encoder preset
+PROFILE = os.getenv("MANIM_PROFILE", "chat")
 
-def generate_manim_code(user_request: str) -> str:
-    """Generate Manim code using Gemini AI"""
+def generate_manim_code(user_request: str, previous_code: str = None, on_delta=None) -> str:
+    """Generate Manim code using Gemini AI, streaming clean code to `on_delta`"""
+    
+    examples = get_example_index()
+    # Code that already rendered for the same request needs no LLM call
+    reused = examples.match(user_request)
+    if reused:
+        print(f"♻️  Reusing code that rendered for: {reused.prompt}")
+        return reused.code
     
     prompt = f"""
 You are a professional Manim developer. Your task is to generate correct Manim code that will run without errors and create the animation the user requested.
@@ -57,77 +75,142 @@ class MyAnimation(Scene):
         pass
 ```
 """
+    prompt += few_shot_section(examples.search(user_request))
     
+    if previous_code:
+        # Small edits keep earlier self.play calls identical, so their partial movies are reused
+        prompt += f"""
+If the request changes the previous animation, edit this code and keep every
+unchanged line exactly as it is (same class name, same order):
+{previous_code}
+"""
+    
+    key = generation_key(user_request, PROMPT_VERSION, llm.model_name, previous_code or "")
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return get_generation_cache().get_or_generate(key, lambda: _stream_code(prompt, on_delta))
     except Exception as e:
         print(f"❌ Error generating code with Gemini: {e}")
         return None
 
-def execute_manim_code(manim_code: str) -> str:
-    """Execute Manim code directly"""
+def _stream_code(prompt: str, on_delta=None) -> str:
+    # Fences are stripped and statements checked while the response streams in
+    stream = CodeStream(llm.stream(prompt))
+    for delta in stream:
+        if on_delta:
+            on_delta(delta)
+    return stream.result()
+
+def execute_manim_code(manim_code: str, session_dir: Path = None, timings: StageTimes = None,
+                       profile: str = None) -> str:
+    """Execute Manim code directly
     
-    # Create a temporary directory for this animation
-    with tempfile.TemporaryDirectory() as temp_dir:
-        temp_path = Path(temp_dir)
-        
-        # Write the code to a temporary file
-        code_file = temp_path / "animation.py"
-        with open(code_file, 'w') as f:
-            f.write(manim_code)
-        
-        # Create media directory
-        media_dir = temp_path / "media"
-        media_dir.mkdir(exist_ok=True)
-        
-        # Extract scene class name from the code
-        scene_name = None
-        for line in manim_code.split('\n'):
-            if 'class ' in line and '(Scene)' in line:
-                scene_name = line.split('class ')[1].split('(')[0].strip()
-                break
-        
-        if not scene_name:
-            return "❌ Could not find Scene class in the generated code"
-        
+    With a session directory every render keeps its workspace there and shares
+    the session's partial movies, so re-rendering an edited scene only renders
+    the animations that changed. Seconds spent per stage are added to `timings`.
+    `profile` names a render profile and defaults to MANIM_PROFILE.
+    """
+    timings = timings if timings is not None else StageTimes()
+    try:
+        render_profile = get_profile(profile or PROFILE)
+    except ValueError as e:
+        return f"❌ {e}"
+    
+    if session_dir is None:
+        # Create a temporary directory for this animation
+        with tempfile.TemporaryDirectory() as temp_dir:
+            return _execute_in_workspace(manim_code, Path(temp_dir), None, timings, render_profile)
+    
+    renders_dir = session_dir / "renders"
+    renders_dir.mkdir(parents=True, exist_ok=True)
+    return _execute_in_workspace(manim_code, Path(tempfile.mkdtemp(dir=renders_dir)), session_dir, timings,
+                                 render_profile)
+
+def _execute_in_workspace(manim_code: str, temp_path: Path, session_dir: Path, timings: StageTimes,
+                          profile: RenderProfile) -> str:
+    """Render the code inside `temp_path` and publish the video to the current directory"""
+    
+    # Write the code to the workspace
+    code_file = temp_path / "animation.py"
+    with open(code_file, 'w') as f:
+        f.write(manim_code)
+
+    # Send the final video to a known path instead of searching for it
+    overrides = {**manim_overrides(temp_path, session_dir), **profile.overrides(temp_path)}
+
+    # Check the code and find the scene to render before starting Manim
+    with timings.measure("preflight"):
+        checked = preflight(manim_code)
+    if not checked.ok:
+        return f"❌ Generated code failed preflight checks:\n{checked.format_errors()}"
+    scene_name = checked.default_scene
+
+    render_cache = get_render_cache()
+    key = cache_key(manim_code, scene_name, profile.cache_flags())
+    cached = render_cache.get(key, profile.extension)
+    final_output = Path(f"{scene_name}{profile.extension}")
+    if cached:
+        final_output = publish(cached, final_output)
+        return f"✅ Animation loaded from cache: {final_output.absolute()}"
+
+    pool = get_worker_pool()
+    if pool:
         try:
-            # Run manim command
-            cmd = [
-                sys.executable, "-m", "manim", 
-                str(code_file), scene_name, 
-                "-q", "m",  # medium quality
-                "--media_dir", str(media_dir)
-            ]
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=temp_dir,
-                timeout=60  # 60 second timeout
+            result = render_segmented(
+                pool, manim_code, scene_name,
+                overrides, filename=str(code_file), timeout=profile.limits.wall_seconds,
+                encoder=profile.encoder_options(), limits=profile.limits,
             )
-            
-            if result.returncode == 0:
-                # Find the output video file
-                video_files = list(media_dir.glob("**/*.mp4"))
-                if video_files:
-                    output_file = video_files[0]
-                    
-                    # Copy to current directory
-                    final_output = Path(f"{scene_name}.mp4")
-                    final_output.write_bytes(output_file.read_bytes())
-                    
-                    return f"✅ Animation created successfully: {final_output.absolute()}"
-                else:
-                    return "❌ Animation completed but no video file found"
+            timings.update(result.timings)
+            with timings.measure("publish"):
+                video_file = profile.output(temp_path)
+                too_big = check_output(video_file, profile.limits)
+                if too_big:
+                    return f"❌ {too_big}"
+                render_cache.put(key, video_file)
+                final_output = publish(video_file, final_output)
+            return f"✅ Animation created successfully: {final_output.absolute()}"
+        except RenderFailed as e:
+            return f"❌ Manim execution failed: {e}"
+        except WorkerUnavailable:
+            pass  # fall back to a one-off manim process
+
+    try:
+        # Run manim command
+        timings_file = temp_path / "stage_timings.json"
+        cmd = [
+            *manim_command(timings_file, profile.encoder_options()),
+            str(code_file), scene_name,
+            "--progress_bar", "none",
+            "--config_file", str(write_manim_config(temp_path, overrides))
+        ]
+
+        # Output is watched as it arrives; the first traceback stops the render
+        started = time.perf_counter()
+        result = run_monitored(cmd, cwd=temp_path, scene_file=str(code_file), limits=profile.limits)
+        timings.update(read_process_timings(timings_file, time.perf_counter() - started))
+
+        if result.ok:
+            video_file = profile.output(temp_path)
+            if video_file.exists():
+                too_big = check_output(video_file, profile.limits)
+                if too_big:
+                    return f"❌ {too_big}"
+                with timings.measure("publish"):
+                    render_cache.put(key, video_file)
+
+                    # Link into the current directory instead of copying the bytes
+                    final_output = publish(video_file, final_output)
+
+                return f"✅ Animation created successfully: {final_output.absolute()}"
             else:
-                return f"❌ Manim execution failed:\n{result.stderr}"
-                
-        except subprocess.TimeoutExpired:
-            return "❌ Animation timed out (took longer than 60 seconds)"
-        except Exception as e:
-            return f"❌ Error executing animation: {str(e)}"
+                return "❌ Animation completed but no video file found"
+        elif result.error.type == "Timeout":
+            return f"❌ Animation timed out (took longer than {profile.limits.wall_seconds:g} seconds)"
+        else:
+            return f"❌ Manim execution failed: {result.error}"
+
+    except Exception as e:
+        return f"❌ Error executing animation: {str(e)}"
 
 def main():
     print("🎬 Manim Animation Generator with Gemini AI")
@@ -139,6 +222,11 @@ def main():
     print("  - Animate a mathematical function")
     print("=" * 50)
     
+    # One persistent workspace per run, so follow-up edits reuse unchanged animations
+    session_dir = SESSIONS_DIR / time.strftime("%Y%m%d-%H%M%S")
+    session_dir.mkdir(parents=True, exist_ok=True)
+    previous_code = None
+    
     while True:
         try:
             user_input = input("\n🎯 What animation do you want? > ").strip()
@@ -151,20 +239,22 @@ def main():
                 continue
             
             print("\n🤖 Generating Manim code with Gemini...")
-            manim_code = generate_manim_code(user_input)
+            print("\n📝 Generated code:")
+            print("-" * 40)
+            streamed = []
+            
+            def show_delta(delta):
+                streamed.append(delta)
+                print(delta, end="", flush=True)
+            
+            manim_code = generate_manim_code(user_input, previous_code, on_delta=show_delta)
             
             if not manim_code:
                 continue
             
-            # Clean up the code (remove markdown if present)
-            if "```python" in manim_code:
-                manim_code = manim_code.split("```python")[1].split("```")[0].strip()
-            elif "```" in manim_code:
-                manim_code = manim_code.split("```")[1].split("```")[0].strip()
-            
-            print("\n📝 Generated code:")
-            print("-" * 40)
-            print(manim_code)
+            if not streamed:
+                # Served from the generation cache or the example index
+                print(manim_code)
             print("-" * 40)
             
             # Ask if user wants to execute
@@ -172,7 +262,13 @@ def main():
             
             if execute in ['y', 'yes']:
                 print("\n🎥 Creating animation...")
-                result = execute_manim_code(manim_code)
+                timings = StageTimes()
+                with get_media_store().lease(session_dir):
+                    result = execute_manim_code(manim_code, session_dir, timings)
+                if result.startswith("✅") and not is_edit(manim_code, previous_code):
+                    # Standalone requests that rendered become examples for later ones
+                    get_example_index().add(user_input, manim_code, timings.total())
+                previous_code = manim_code
                 print(result)
             else:
                 print("⏭️  Animation skipped")
@@ -0,0 +1,143 @@
+"""
+Per-stage timing of a render.
+
+A render's wall-clock time is split into the stages that can be tuned
+independently: code generation, preflight, process startup, TeX compile,
+frame rendering, video encoding and publishing the file. `StageTimes`
+collects the seconds spent in each. Inside a render process, `install_hooks`
+wraps the Manim functions that compile TeX and write frames, and `collect`
+gathers what they measure for one scene. Time spent in ``Scene.render`` that
+is neither TeX nor encoding is counted as frame rendering.
+
+The hooks only add a `perf_counter` call around each wrapped call and do
+nothing while no collection is active.
+"""
+
+import functools
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+STAGES = ("generate", "preflight", "startup", "tex", "render", "encode", "publish")
+
+
+class StageTimes:
+    """Seconds spent in each render stage"""
+
+    def __init__(self, seconds: Optional[Dict[str, float]] = None):
+        self.seconds: Dict[str, float] = dict(seconds or {})
+
+    def add(self, stage: str, seconds: float):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def update(self, seconds: Dict[str, float]):
+        for stage, value in seconds.items():
+            self.add(stage, value)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def total(self) -> float:
+        return sum(self.seconds.values())
+
+    def to_dict(self) -> Dict[str, float]:
+        return {stage: round(value, 6) for stage, value in self.seconds.items()}
+
+
+_active: Optional[StageTimes] = None
+_nesting = 0
+
+
+def _timed(stage: str, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        global _nesting
+        if _active is None or _nesting:
+            # Nested calls (a TeX compile inside an encode hook) count once
+            return function(*args, **kwargs)
+        _nesting += 1
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _nesting -= 1
+            _active.add(stage, time.perf_counter() - started)
+
+    wrapper._stage_timed = True
+    return wrapper
+
+
+def install_hooks():
+    """Wrap Manim's TeX compile and movie writing in this process with stage timers"""
+    from manim.mobject.text import tex_mobject
+    from manim.scene.scene_file_writer import SceneFileWriter
+    from manim.utils import tex_file_writing
+
+    if getattr(tex_file_writing.tex_to_svg_file, "_stage_timed", False):
+        return
+    tex_to_svg_file = _timed("tex", tex_file_writing.tex_to_svg_file)
+    tex_file_writing.tex_to_svg_file = tex_to_svg_file
+    tex_mobject.tex_to_svg_file = tex_to_svg_file
+    for name in ("write_frame", "close_partial_movie_stream", "combine_to_movie", "save_final_image"):
+        if hasattr(SceneFileWriter, name):
+            setattr(SceneFileWriter, name, _timed("encode", getattr(SceneFileWriter, name)))
+
+
+@contextmanager
+def collect() -> Iterator[StageTimes]:
+    """Collect the hooked stages of the scene rendered inside this block.
+
+    Wrap ``Scene.render`` with it; the block's time minus TeX and encoding
+    is recorded as frame rendering.
+    """
+    global _active
+    times = StageTimes()
+    previous, _active = _active, times
+    started = time.perf_counter()
+    try:
+        yield times
+    finally:
+        _active = previous
+        elapsed = time.perf_counter() - started
+        times.add("render", max(0.0, elapsed - times.seconds.get("tex", 0.0) - times.seconds.get("encode", 0.0)))
+
+
+def collect_process(path: Path):
+    """Time every scene this process renders and write the totals to `path` at exit.
+
+    Used by one-off manim processes; their startup is everything the caller
+    measured that isn't in the file.
+    """
+    import atexit
+    from manim.scene.scene import Scene
+
+    install_hooks()
+    totals = StageTimes()
+    render = Scene.render
+
+    def timed_render(self, *args, **kwargs):
+        with collect() as times:
+            try:
+                return render(self, *args, **kwargs)
+            finally:
+                totals.update(times.seconds)
+
+    Scene.render = timed_render
+    atexit.register(lambda: Path(path).write_text(json.dumps(totals.to_dict())))
+
+
+def read_process_timings(path: Path, wall_seconds: float) -> Dict[str, float]:
+    """Stage timings written by `collect_process`, with startup derived from `wall_seconds`"""
+    try:
+        seconds = json.loads(Path(path).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"startup": wall_seconds}
+    seconds["startup"] = max(0.0, wall_seconds - sum(seconds.values()))
+    return seconds
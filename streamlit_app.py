@@ -1,15 +1,34 @@
 import streamlit as st
 import os
 import sys
-import tempfile
-import subprocess
-import shelve
+import sqlite3
+import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import List, Dict
-import google.generativeai as genai
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+from chat_store import get_chat_store
+from code_stream import CodeStream
+from example_index import few_shot_section, get_example_index, is_edit
+from generation_cache import generation_key, get_generation_cache
+from job_manifest import conversation_dir, manim_overrides, output_path, write_manifest, write_manim_config
+from llm_backend import LLMBackend, LLMUnavailable, get_llm_backend
+from media_server import media_url, serve_media
+from media_store import DEFAULT_EVICT_INTERVAL, get_media_store, publish
+from preflight import preflight
+from render_cache import cache_key, get_render_cache
+from render_limits import check_output, get_admission_controller
+from render_monitor import run_monitored
+from render_profiles import RenderProfile, get_profile
+from segment_render import render_segmented
+from tex_cache import manim_command
+from worker_pool import RenderFailed, WorkerUnavailable, get_worker_pool
+
 # Page config
 st.set_page_config(
     page_title="Manim Generator",
@@ -21,18 +40,38 @@ st.set_page_config(
 # Load environment
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    st.error("Please set GEMINI_API_KEY in .env file")
+try:
+    # Shared by every session, so all users together stay within the rate limit
+    get_llm_backend()
+except LLMUnavailable as e:
+    st.error(f"{e} (GEMINI_API_KEY can go in the .env file)")
     st.stop()
 
-genai.configure(api_key=GEMINI_API_KEY)
+# Bump when the system prompt changes so cached generations are not reused
+PROMPT_VERSION = '1'
+
+JOBS_DIR = get_media_store().root / 'jobs'
+CONVERSATIONS_DIR = get_media_store().root / 'conversations'
+
+# Render tiers are render profile names (see render_profiles.py); a still is
+# the last frame of the preview profile
+STILL_TIER = 'still'
+PREVIEW_TIERS = (STILL_TIER, 'preview')
+FINAL_TIER_OPTIONS = {
+    "Preview only": None,
+    "Chat (720p30)": 'chat',
+    "Publish (1080p60)": 'publish',
+    "Publish as WebM": 'publish:webm',
+    "GIF (720p30)": 'chat:gif',
+}
 
 class ManimChatBot:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+    def __init__(self, llm: Optional[LLMBackend] = None):
+        # Pass a backend with a MockProvider to run offline
+        self.llm = llm or get_llm_backend()
         
-    def generate_manim_code(self, prompt: str) -> str:
+    def generate_manim_code(self, prompt: str, previous_code: str = None, on_code=None) -> str:
+        """Stream code for `prompt`, calling `on_code(code_so_far)` as it arrives"""
         system_prompt = """
         Generate Manim code for mathematical animations.
         Use Manim Community (import from manim import *)
@@ -41,98 +80,345 @@ class ManimChatBot:
         Return only complete Python code.
         """
         
-        full_prompt = f"{system_prompt}\n\nRequest: {prompt}"
+        examples = get_example_index()
+        # Code that already rendered for the same request needs no LLM call
+        reused = examples.match(prompt)
+        if reused:
+            if on_code:
+                on_code(reused.code)
+            return reused.code
+
+        full_prompt = f"{system_prompt}\n\nRequest: {prompt}" + few_shot_section(examples.search(prompt))
+        if previous_code:
+            # Small edits keep earlier self.play calls identical, so their partial movies are reused
+            full_prompt += (
+                "\n\nIf the request changes the current animation, edit this code and keep "
+                "every unchanged line exactly as it is (same class name, same order):\n"
+                f"{previous_code}"
+            )
         
+        key = generation_key(prompt, PROMPT_VERSION, self.llm.model_name, previous_code or "")
         try:
-            response = self.model.generate_content(full_prompt)
-            code = response.text.strip()
-            
-            if code.startswith("```python"):
-                code = code[9:]
-            if code.startswith("```"):
-                code = code[3:]
-            if code.endswith("```"):
-                code = code[:-3]
-                
-            return code.strip()
+            return get_generation_cache().get_or_generate(key, lambda: self._generate(full_prompt, on_code))
         except Exception as e:
             return f"Error: {str(e)}"
 
-    def execute_manim_code(self, code: str) -> tuple[str, str]:
+    def _generate(self, full_prompt: str, on_code=None) -> str:
+        # Fences are stripped and statements checked while the response streams in
+        stream = CodeStream(self.llm.stream(full_prompt))
+        for _ in stream:
+            if on_code:
+                on_code(stream.code)
+        return stream.result()
+
+    def execute_manim_code(self, code: str, tier: str = 'preview', conversation_id: str = None) -> tuple[str, str]:
         try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-
-            scene_name = "Scene"
-            for line in code.split('\n'):
-                if line.strip().startswith('class ') and '(Scene)' in line:
-                    scene_name = line.split()[1].split('(')[0]
-                    break
-
-            result = subprocess.run([
-                'manim', temp_file, scene_name, '-ql', '--media_dir', './media'
-            ], capture_output=True, text=True, cwd=os.getcwd())
-
-            os.unlink(temp_file)
-
-            if result.returncode == 0:
-                media_dir = Path('./media/videos')
-                if media_dir.exists():
-                    mp4_files = list(media_dir.rglob('*.mp4'))
-                    if mp4_files:
-                        latest_video = max(mp4_files, key=lambda p: p.stat().st_mtime)
-                        return "Animation created", str(latest_video)
-                
-                return "Animation completed, video not found", ""
-            else:
-                error_msg = result.stderr or result.stdout or "Unknown error"
-                return f"Execution failed: {error_msg}", ""
+            checked = preflight(code)
+            if not checked.ok:
+                return f"Preflight failed:\n{checked.format_errors()}", ""
+            scene_name = checked.default_scene
+
+            still = tier == STILL_TIER
+            profile = get_profile('preview' if still else tier)
+            extension = '.png' if still else profile.extension
+            render_cache = get_render_cache()
+            key = cache_key(code, scene_name, [*profile.cache_flags(), *(['-s'] if still else [])])
+            # Every render gets its own workspace so the video path is known up front
+            job_id = uuid.uuid4().hex[:12]
+            workspace = JOBS_DIR / job_id
+            workspace.mkdir(parents=True, exist_ok=True)
+            cached = render_cache.get(key, extension)
+            if cached:
+                # A hardlink, so the chat can pin it without copying the video
+                video = publish(cached, output_path(workspace, cached.suffix))
+                write_manifest(workspace, job_id, video, scene_name, tier, cached=True)
+                return "Animation created", str(video)
+
+            conversation = conversation_dir(CONVERSATIONS_DIR, conversation_id) if conversation_id else None
+            with get_media_store().leases(workspace, conversation):
+                return self._render_in_workspace(code, tier, profile, scene_name, key, job_id, workspace, conversation)
 
         except Exception as e:
             return f"Error: {str(e)}", ""
 
+    def _render_in_workspace(self, code: str, tier: str, profile: RenderProfile, scene_name: str, key: str,
+                             job_id: str, workspace: Path, conversation: Optional[Path]) -> tuple[str, str]:
+        still = tier == STILL_TIER
+        render_cache = get_render_cache()
+        code_file = workspace / 'scene.py'
+        code_file.write_text(code)
+        config = {**manim_overrides(workspace, conversation), **profile.overrides(workspace)}
+        if still:
+            config.update(save_last_frame=True, write_to_movie=False)
+
+        def finished_output() -> Path:
+            return output_path(workspace, '.png') if still else profile.output(workspace)
+
+        pool = get_worker_pool()
+        if pool:
+            try:
+                # Long final renders are split across workers; previews are too short to gain
+                render = pool.render if tier in PREVIEW_TIERS else partial(render_segmented, pool)
+                result = render(code, scene_name, config, filename=str(code_file),
+                                timeout=profile.limits.wall_seconds, encoder=profile.encoder_options(),
+                                limits=profile.limits)
+                video = finished_output()
+                too_big = check_output(video, profile.limits)
+                if too_big:
+                    return f"Execution failed: {too_big}", ""
+                render_cache.put(key, video)
+                write_manifest(workspace, job_id, video, result.scene, tier,
+                               duration=result.duration, render_seconds=result.seconds)
+                return "Animation created", str(video)
+            except RenderFailed as e:
+                return f"Execution failed: {e}", ""
+            except WorkerUnavailable:
+                pass  # fall back to a one-off manim process
+
+        config_file = write_manim_config(workspace, config)
+        result = run_monitored([
+            *manim_command(encoder=profile.encoder_options()), str(code_file), scene_name,
+            '--progress_bar', 'none', '--config_file', str(config_file)
+        ], cwd=os.getcwd(), scene_file=str(code_file), limits=profile.limits)
+
+        if result.ok:
+            video = finished_output()
+            if video.exists():
+                too_big = check_output(video, profile.limits)
+                if too_big:
+                    return f"Execution failed: {too_big}", ""
+                render_cache.put(key, video)
+                write_manifest(workspace, job_id, video, scene_name, tier)
+                return "Animation created", str(video)
+            
+            return "Animation completed, video not found", ""
+        else:
+            return f"Execution failed: {result.error}", ""
+
+    def render_progressive(self, code: str, conversation_id: str = None):
+        """Yield (tier, status, path) for a last-frame still and then a preview-profile draft"""
+        for tier in PREVIEW_TIERS:
+            status, path = self.execute_manim_code(code, tier, conversation_id)
+            yield tier, status, path
+            if not path:
+                return
+
+@st.cache_resource
+def get_chatbot():
+    # One model client per process, shared by every session
+    return ManimChatBot()
+
+# Background chat jobs
+JOB_GENERATING, JOB_RENDERING, JOB_FINAL, JOB_DONE = 'generating', 'rendering', 'final', 'done'
+KEEP_FINISHED_JOBS = 3600
+
+@dataclass
+class ChatJob:
+    """Generation and rendering for one prompt, running outside the script thread"""
+    id: str
+    session_id: str
+    prompt: str
+    previous_code: Optional[str] = None
+    final_tier: Optional[str] = None
+    stage: str = JOB_GENERATING
+    code: str = ""
+    preview: Optional[str] = None
+    revision: int = 0  # bumped whenever the job writes to the chat history
+    finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.stage != JOB_DONE
+
+class ChatJobs:
+    """Process-wide registry of chat jobs on a globally capped executor.
+
+    Jobs write their results to the chat history themselves, so a session that
+    reruns or reconnects only has to look its jobs up again by session id.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='chat-job')
+        self._jobs: Dict[str, ChatJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job: ChatJob, chatbot: ManimChatBot):
+        with self._lock:
+            now = time.time()
+            for job_id in [j.id for j in self._jobs.values() if j.finished_at and now - j.finished_at > KEEP_FINISHED_JOBS]:
+                del self._jobs[job_id]
+            self._jobs[job.id] = job
+        self._executor.submit(run_chat_job, job, chatbot)
+
+    def for_session(self, session_id: str) -> List[ChatJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.session_id == session_id]
+
+@st.cache_resource
+def start_media_services():
+    store = get_media_store()
+    if os.getenv("MANIM_MEDIA_PORT"):
+        # The browser streams videos from here, so reruns never read them into the app
+        serve_media(store, int(os.getenv("MANIM_MEDIA_PORT")), os.getenv("MANIM_MEDIA_HOST", "127.0.0.1"))
+    store.start_background_eviction(float(os.getenv("MANIM_MEDIA_EVICT_INTERVAL", DEFAULT_EVICT_INTERVAL)))
+
+@st.cache_resource
+def get_chat_jobs():
+    return ChatJobs(int(os.getenv("MANIM_BACKGROUND_JOBS", 2)))
+
+def run_chat_job(job: ChatJob, chatbot: ManimChatBot):
+    store = get_chat_store()
+
+    def add_message(message):
+        index = store.add_message(job.session_id, message)
+        job.revision += 1
+        if message.get('video'):
+            # Videos in the chat history must outlive media eviction
+            get_media_store().pin(message['video'])
+        return index
+
+    try:
+        code = chatbot.generate_manim_code(job.prompt, job.previous_code, on_code=lambda c: setattr(job, 'code', c))
+        if code.startswith("Error"):
+            add_message({"role": "assistant", "content": code})
+            return
+        job.code = code
+        # Hold the render back while the host is overloaded
+        get_admission_controller().wait()
+        job.stage = JOB_RENDERING
+
+        message = {"role": "assistant", "content": "Animation created", "code": code}
+        status = ""
+        started = time.perf_counter()
+        for tier, status, path in chatbot.render_progressive(code, job.session_id):
+            if not path:
+                break
+            job.preview = message['video'] = path
+        if not message.get('video'):
+            add_message({"role": "assistant", "content": f"Error: {status}"})
+            return
+        if not is_edit(code, job.previous_code):
+            # Standalone requests that rendered become examples for later ones
+            get_example_index().add(job.prompt, code, time.perf_counter() - started)
+        index = add_message(message)
+
+        if job.final_tier and message['video'].endswith('.mp4'):
+            job.stage = JOB_FINAL
+            status, path = chatbot.execute_manim_code(code, job.final_tier, job.session_id)
+            if path:
+                message['video'] = path
+                store.update_message(job.session_id, index, message)
+                get_media_store().pin(path)
+                job.revision += 1
+    except Exception as e:
+        add_message({"role": "assistant", "content": f"Error: {str(e)}"})
+    finally:
+        job.finished_at = time.time()
+        job.stage = JOB_DONE
+
 # Chat history storage
-CHAT_HISTORY_DB = "chat_history.db"
+HISTORY_PAGE_SIZE = 10
 
-def save_chat_session(session_id: str, messages: List[Dict]):
-    with shelve.open(CHAT_HISTORY_DB) as db:
-        db[session_id] = {
-            'messages': messages,
-            'timestamp': time.time()
-        }
+def add_chat_message(session_id: str, message: Dict):
+    # Messages are appended one at a time; background jobs add theirs the same way
+    get_chat_store().add_message(session_id, message)
 
-def load_chat_sessions():
+def load_chat_sessions(limit: int = HISTORY_PAGE_SIZE):
     try:
-        with shelve.open(CHAT_HISTORY_DB) as db:
-            sessions = []
-            for session_id, data in db.items():
-                if data['messages']:
-                    first_message = data['messages'][0]['content'][:40] + "..."
-                    sessions.append((session_id, first_message, data['timestamp']))
-            return sorted(sessions, key=lambda x: x[2], reverse=True)
-    except:
+        return get_chat_store().list_sessions(limit)
+    except sqlite3.Error:
         return []
 
 def load_chat_session(session_id: str):
     try:
-        with shelve.open(CHAT_HISTORY_DB) as db:
-            return db.get(session_id, {}).get('messages', [])
-    except:
+        return get_chat_store().load_messages(session_id)
+    except sqlite3.Error:
         return []
 
-# Initialize session state
-if 'chatbot' not in st.session_state:
-    st.session_state.chatbot = ManimChatBot()
+def open_session(session_id: str):
+    # The session id lives in the URL so a reload or reconnect comes back to it
+    st.session_state.current_session_id = session_id
+    st.session_state.messages = load_chat_session(session_id)
+    st.session_state.show_welcome = not st.session_state.messages
+    st.query_params['chat'] = session_id
 
-if 'messages' not in st.session_state:
-    st.session_state.messages = []
+start_media_services()
 
+# Initialize session state
 if 'current_session_id' not in st.session_state:
-    st.session_state.current_session_id = str(int(time.time()))
+    open_session(st.query_params.get('chat') or str(int(time.time())))
+
+if 'seen_revisions' not in st.session_state:
+    st.session_state.seen_revisions = {}
+
+if 'loaded_videos' not in st.session_state:
+    st.session_state.loaded_videos = set()
+
+# Videos older than this many messages are loaded only when asked for
+AUTOLOAD_VIDEOS = 3
+
+def show_media(path: str, autoload: bool = True, key: str = None):
+    if not os.path.exists(path):
+        st.caption("🗑️ This video has been removed from the media store")
+        return
+    # The browser may be on another machine, so only a public URL will do
+    url = media_url(get_media_store(), path, public=True)
+    if url is None and not autoload and key not in st.session_state.loaded_videos:
+        # Without a media server st.video reads the whole file on every rerun
+        if st.button("▶️ Load video", key=f"load-{key}"):
+            st.session_state.loaded_videos.add(key)
+            st.rerun()
+        return
+    if path.endswith('.png'):
+        st.image(url or path, caption="Preview (last frame)")
+    elif path.endswith('.gif'):
+        st.image(url or path)
+    elif url:
+        st.video(url, autoplay=autoload, loop=True, start_time=0)
+    else:
+        # Hold a lease while Streamlit reads the file so eviction can't remove it halfway
+        with get_media_store().lease(path):
+            st.video(path, autoplay=True, loop=True, start_time=0)
 
-if 'show_welcome' not in st.session_state:
-    st.session_state.show_welcome = True
+def start_chat_job(prompt: str):
+    """Store the user's prompt and hand generation and rendering to the background"""
+    session_id = st.session_state.current_session_id
+    previous_code = next(
+        (m['code'] for m in reversed(st.session_state.messages) if m.get('code')), None
+    )
+    add_chat_message(session_id, {"role": "user", "content": prompt})
+    st.session_state.messages = load_chat_session(session_id)
+    job = ChatJob(uuid.uuid4().hex[:12], session_id, prompt, previous_code, st.session_state.get('final_tier'))
+    st.session_state.seen_revisions[job.id] = job.revision
+    get_chat_jobs().submit(job, get_chatbot())
+
+def has_unseen_jobs(session_id: str) -> bool:
+    seen = st.session_state.seen_revisions
+    return any(job.active or seen.get(job.id) != job.revision for job in get_chat_jobs().for_session(session_id))
+
+@st.fragment(run_every=1)
+def poll_chat_jobs():
+    """Show progress of this session's jobs and reload the chat when they store results"""
+    session_id = st.session_state.current_session_id
+    jobs = get_chat_jobs().for_session(session_id)
+    seen = st.session_state.seen_revisions
+    if any(seen.get(job.id) != job.revision for job in jobs):
+        seen.update({job.id: job.revision for job in jobs})
+        st.session_state.messages = load_chat_session(session_id)
+        st.rerun()
+    if not any(job.active for job in jobs):
+        st.rerun()  # stops polling
+
+    for job in jobs:
+        if job.stage == JOB_FINAL:
+            st.caption("Rendering final quality in the background...")
+        elif job.active:
+            with st.chat_message("assistant"):
+                if job.code:
+                    st.code(job.code, language="python")
+                if job.preview:
+                    show_media(job.preview)
+                st.caption("Generating animation..." if job.stage == JOB_GENERATING else "Rendering preview...")
 
 # Custom CSS
 st.markdown("""
@@ -235,28 +521,36 @@ st.markdown("""
 # Sidebar
 with st.sidebar:
     if st.button("✧˖°󠀠⠀New Chat", use_container_width=True):
-        st.session_state.messages = []
-        st.session_state.current_session_id = str(int(time.time()))
-        st.session_state.show_welcome = True
+        open_session(str(int(time.time())))
         st.rerun()
     
     st.markdown("---")
     st.markdown("#### Chat History")
     
-    # Load and display chat sessions
-    sessions = load_chat_sessions()
-    for session_id, preview, timestamp in sessions[:10]:
-        # Remove the "..." and truncate to fit one line
-        display_text = preview.replace("...", "")[:30]
+    # Load and display chat sessions, one page at a time
+    history_limit = st.session_state.get('history_limit', HISTORY_PAGE_SIZE)
+    sessions = load_chat_sessions(history_limit + 1)
+    for session_id, preview, timestamp in sessions[:history_limit]:
+        # Truncate to fit one line
+        display_text = preview[:30]
         if st.button(
             display_text,
             key=f"session_{session_id}",
             use_container_width=True
         ):
-            st.session_state.current_session_id = session_id
-            st.session_state.messages = load_chat_session(session_id)
-            st.session_state.show_welcome = False
+            open_session(session_id)
             st.rerun()
+    if len(sessions) > history_limit and st.button("Show more", use_container_width=True):
+        st.session_state.history_limit = history_limit + HISTORY_PAGE_SIZE
+        st.rerun()
+    
+    st.markdown("---")
+    final_label = st.selectbox(
+        "Final render profile",
+        list(FINAL_TIER_OPTIONS),
+        help="A still and a low-quality draft are always shown first; the final render runs in the background",
+    )
+    st.session_state.final_tier = FINAL_TIER_OPTIONS[final_label]
 
 # Main content area ✨
 if st.session_state.show_welcome:
@@ -279,34 +573,15 @@ if st.session_state.show_welcome:
         col = col1 if i % 2 == 0 else col2
         with col:
             if st.button(example, key=f"example_{i}", use_container_width=True):
-                st.session_state.messages = []
+                # The chat view shows the job's previews as they arrive
+                start_chat_job(example)
                 st.session_state.show_welcome = False
-                # Process the example immediately
-                with st.spinner("Generating animation..."):
-                    code = st.session_state.chatbot.generate_manim_code(example)
-                    if not code.startswith("Error"):
-                        status, video_path = st.session_state.chatbot.execute_manim_code(code)
-                        st.session_state.messages.append({"role": "user", "content": example})
-                        st.session_state.messages.append({"role": "assistant", "content": "Animation created", "video": video_path if video_path else None})
-                        save_chat_session(st.session_state.current_session_id, st.session_state.messages)
                 st.rerun()
 
     # Add chat input to welcome screen
     if prompt := st.chat_input("Describe your animation..."):
-        st.session_state.messages = []
+        start_chat_job(prompt)
         st.session_state.show_welcome = False
-        # Process the prompt immediately
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
-        with st.spinner("Generating animation..."):
-            code = st.session_state.chatbot.generate_manim_code(prompt)
-            if not code.startswith("Error"):
-                status, video_path = st.session_state.chatbot.execute_manim_code(code)
-                st.session_state.messages.append({"role": "assistant", "content": "Animation created", "video": video_path if video_path else None})
-            else:
-                st.session_state.messages.append({"role": "assistant", "content": f"Error: {code}"})
-        
-        save_chat_session(st.session_state.current_session_id, st.session_state.messages)
         st.rerun()
 
 else:
@@ -314,39 +589,20 @@ else:
     st.title("Manim Generator")
     
     # Display chat messages
-    for message in st.session_state.messages:
+    messages = st.session_state.messages
+    with_video = [i for i, message in enumerate(messages) if message.get("video")]
+    autoload = set(with_video[-AUTOLOAD_VIDEOS:])
+    for i, message in enumerate(messages):
         with st.chat_message(message["role"]):
             st.write(message["content"])
             if message.get("video"):
-                st.video(message["video"], autoplay=True, loop=True, start_time=0)
+                show_media(message["video"], autoload=i in autoload, key=f"{st.session_state.current_session_id}-{i}")
+    
+    # Progress of this session's background jobs, also after a reload
+    if has_unseen_jobs(st.session_state.current_session_id):
+        poll_chat_jobs()
     
     # Chat input
     if prompt := st.chat_input("Describe your animation..."):
-        # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        
-        with st.chat_message("user"):
-            st.write(prompt)
-        
-        # Generate response
-        with st.chat_message("assistant"):
-            with st.spinner("Generating animation..."):
-                code = st.session_state.chatbot.generate_manim_code(prompt)
-                
-                if code.startswith("Error"):
-                    st.error(code)
-                    st.session_state.messages.append({"role": "assistant", "content": f"Error: {code}"})
-                else:
-                    status, video_path = st.session_state.chatbot.execute_manim_code(code)
-                    
-                    if video_path:
-                        st.success("Animation created successfully!")
-                        st.video(video_path, autoplay=True, loop=True, start_time=0)
-                        st.session_state.messages.append({"role": "assistant", "content": "Animation created", "video": video_path})
-                    else:
-                        st.error(f"Failed to create animation: {status}")
-                        st.session_state.messages.append({"role": "assistant", "content": f"Error: {status}"})
-        
-        # Save chat session
-        save_chat_session(st.session_state.current_session_id, st.session_state.messages)
+        start_chat_job(prompt)
         st.rerun()
@@ -11,22 +11,21 @@ if not GEMINI_API_KEY:
     print("Please run: export GEMINI_API_KEY='your-api-key-here'")
     sys.exit(1)
 
+from llm_backend import LLMUnavailable, create_llm_backend
+
 try:
-    import google.generativeai as genai
-    print("✅ google-generativeai imported successfully")
-except ImportError:
-    print("❌ google-generativeai not installed")
+    # No retries, so a bad key or an exhausted quota shows up right away
+    llm = create_llm_backend("gemini", retries=0)
+    print(f"✅ google-generativeai imported successfully ({llm.model_name})")
+except LLMUnavailable as e:
+    print(f"❌ {e}")
     print("Please run: uv pip install google-generativeai")
     sys.exit(1)
 
 try:
-    # Configure and test Gemini
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
-    
     print("🧪 Testing Gemini API connection...")
-    response = model.generate_content("Hello! Please respond with 'API connection successful'")
-    print(f"✅ Gemini response: {response.text}")
+    response = llm.generate("Hello! Please respond with 'API connection successful'")
+    print(f"✅ Gemini response: {response}")
     
     print("\n🎉 All tests passed! You're ready to use the client.")
     
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from batch_client import BatchItem, BatchResult, BatchRunner, FAILED, read_prompts
+
+
+def write_prompts(path, *lines):
+    path.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+    return path
+
+
+def test_ids_default_to_a_prompt_hash_and_duplicates_are_skipped(tmp_path):
+    path = write_prompts(tmp_path / "prompts.jsonl",
+                         "Draw a circle", {"id": "square-1", "prompt": "Draw a square"},
+                         {"id": "square-1", "prompt": "Draw another square"})
+    items = read_prompts(path)
+    assert [item.prompt for item in items] == ["Draw a circle", "Draw a square"]
+    assert items[0].id.isalnum() and len(items[0].id) == 12
+    assert items[1].id == "square-1"
+
+
+@pytest.mark.parametrize("item_id", ["../escape", "/tmp/abs", "a/b", "..", "with space", "."])
+def test_ids_that_are_not_safe_directory_names_are_rejected(tmp_path, item_id):
+    path = write_prompts(tmp_path / "prompts.jsonl", {"id": item_id, "prompt": "Draw a circle"})
+    with pytest.raises(ValueError, match="invalid id"):
+        read_prompts(path)
+
+
+def test_render_refuses_a_workspace_outside_the_output_directory(tmp_path):
+    out_dir = tmp_path / "batch"
+    out_dir.mkdir()
+    victim = tmp_path / "victim"
+    victim.mkdir()
+    runner = BatchRunner.__new__(BatchRunner)
+    runner.out_dir = out_dir
+    item = BatchItem("../victim", "Draw a circle")
+    with pytest.raises(ValueError):
+        runner.render(item, "", BatchResult(item.id, item.prompt, FAILED))
+    assert victim.exists()
@@ -0,0 +1,34 @@
+import pytest
+
+from benchmark import CORPUS, compare, fake_llm, percentile, summarize
+from code_stream import CodeStream
+from preflight import preflight
+
+
+def report(p50, p95):
+    return {"results": {"mcp": {"SimpleShapes": {"render": {"p50": p50, "p95": p95, "n": 5}}}}}
+
+
+def test_nearest_rank_percentiles():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 5.0
+    assert percentile([7.0], 95) == 7.0
+    assert summarize({"render": values}) == {"render": {"p50": 3.0, "p95": 5.0, "n": 5}}
+
+
+def test_regressions_need_both_the_tolerance_and_a_minimum_slowdown():
+    baseline = report(1.0, 2.0)
+    assert compare(report(1.1, 2.1), baseline, 0.2) == []
+    assert compare(report(0.011, 0.02), report(0.005, 0.01), 0.2) == []  # +100% but only milliseconds
+    [regression] = compare(report(1.5, 2.1), baseline, 0.2)
+    assert regression.startswith("mcp/SimpleShapes/render p50: 1000 ms -> 1500 ms")
+    assert compare(report(9.0, 9.0), {"results": {}}, 0.2) == []  # nothing to compare with
+
+
+@pytest.mark.parametrize("scene", sorted(CORPUS))
+def test_corpus_scenes_pass_preflight_through_the_fake_llm(scene):
+    code = CodeStream(fake_llm(CORPUS[scene]).stream("prompt")).result()
+    result = preflight(code)
+    assert result.ok, result.format_errors()
+    assert len(result.scenes) == 1
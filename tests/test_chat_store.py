@@ -0,0 +1,62 @@
+import shelve
+import threading
+
+from chat_store import ChatStore
+
+
+def test_messages_round_trip_with_their_extra_fields(tmp_path):
+    store = ChatStore(tmp_path / "chat.sqlite3")
+    store.add_message("s1", {"role": "user", "content": "Draw a circle"})
+    seq = store.add_message("s1", {"role": "assistant", "content": "Rendering", "code": "..."})
+    store.update_message("s1", seq, {"role": "assistant", "content": "Done", "code": "...", "video": "v.mp4"})
+    assert store.load_messages("s1") == [
+        {"role": "user", "content": "Draw a circle"},
+        {"role": "assistant", "content": "Done", "code": "...", "video": "v.mp4"},
+    ]
+
+
+def test_append_only_stores_new_messages(tmp_path):
+    store = ChatStore(tmp_path / "chat.sqlite3")
+    history = [{"role": "user", "content": "a"}, {"role": "assistant", "content": "b"}]
+    assert store.append_messages("s1", history) == 2
+    assert store.append_messages("s1", history) == 0
+    assert store.append_messages("s1", history + [{"role": "user", "content": "c"}]) == 1
+    assert [m["content"] for m in store.load_messages("s1")] == ["a", "b", "c"]
+
+
+def test_concurrent_writers_get_distinct_positions(tmp_path):
+    path = tmp_path / "chat.sqlite3"
+    ChatStore(path)
+    positions = []
+
+    def write(i):
+        positions.append(ChatStore(path).add_message("s1", {"role": "user", "content": str(i)}))
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert sorted(positions) == list(range(8))
+
+
+def test_sessions_are_listed_newest_first_in_pages(tmp_path):
+    store = ChatStore(tmp_path / "chat.sqlite3")
+    for i in range(5):
+        store.add_message(f"s{i}", {"role": "user", "content": f"prompt {i}"})
+    first = store.list_sessions(limit=2)
+    assert [row[0] for row in first] == ["s4", "s3"]
+    second = store.list_sessions(limit=2, before=(first[-1][2], first[-1][0]))
+    assert [row[0] for row in second] == ["s2", "s1"]
+    store.delete_session("s4")
+    assert store.list_sessions(limit=1)[0][:2] == ("s3", "prompt 3")
+
+
+def test_shelve_history_is_imported(tmp_path):
+    legacy = str(tmp_path / "chat_history.db")
+    with shelve.open(legacy) as db:
+        db["old"] = {"timestamp": 100.0, "messages": [{"role": "user", "content": "Show a square"}]}
+    store = ChatStore(tmp_path / "chat.sqlite3")
+    assert store.import_shelve(legacy) == 1
+    assert store.list_sessions() == [("old", "Show a square", 100.0)]
+    assert store.import_shelve(str(tmp_path / "missing.db")) == 0
@@ -0,0 +1,83 @@
+import pytest
+
+from code_stream import CodeStream, EarlyValidationError, FenceStripper
+
+CODE = """from manim import *
+
+class CircleScene(Scene):
+    def construct(self):
+        circle = Circle()
+        self.play(Create(circle))"""
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class Consumed:
+    """A fake streaming response that counts how many chunks were pulled"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pulled = 0
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.pulled += 1
+            yield chunk
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, 64])
+def test_fences_are_stripped_across_chunk_boundaries(size):
+    response = f"Here is the code:\n\n```python\n{CODE}\n```\n\nThis draws a circle. ```more```"
+    stream = CodeStream(chunked(response, size))
+    deltas = list(stream)
+    assert stream.code == CODE
+    assert "".join(deltas).strip() == CODE
+    assert not stream.aborted
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_unfenced_code_and_unclosed_fences(size):
+    assert CodeStream(chunked(CODE, size)).result() == CODE
+    assert CodeStream(chunked(f"```py\n{CODE}\n", size)).result() == CODE
+
+
+def test_fence_split_inside_its_backticks():
+    fences = FenceStripper()
+    lines = fences.feed("`") + fences.feed("``pyth") + fences.feed("on\nx = 1\n`") + fences.feed("``\ny = 2\n")
+    assert lines + fences.close() == ["x = 1"]
+
+
+def test_forbidden_import_stops_the_stream_early():
+    body = "\n".join(f"        self.wait({i})" for i in range(200))
+    response = f"```python\nimport os\nfrom manim import *\n\nclass A(Scene):\n    def construct(self):\n{body}\n```"
+    chunks = Consumed(chunked(response, 8))
+    stream = CodeStream(chunks)
+    with pytest.raises(EarlyValidationError) as error:
+        stream.result()
+    assert stream.aborted
+    assert chunks.pulled < len(chunks.chunks) // 10
+    assert [issue.code for issue in error.value.issues] == ["import-not-allowed"]
+
+
+def test_forbidden_call_in_a_finished_class_stops_the_stream():
+    response = CODE.replace("circle = Circle()", "circle = eval('Circle()')") + "\n\nclass B(Scene):\n    pass\n" * 50
+    chunks = Consumed(chunked(response, 10))
+    stream = CodeStream(chunks)
+    with pytest.raises(EarlyValidationError):
+        stream.result()
+    assert chunks.pulled < len(chunks.chunks)
+
+
+def test_statements_spanning_chunks_are_not_flagged_while_incomplete():
+    response = "from manim import (\n    Scene,\n    Circle,\n)\n\n@decorator\nclass A(Scene):\n    pass\n"
+    stream = CodeStream(chunked(response, 3))
+    assert stream.result() == response.strip()
+    assert not stream.issues
+
+
+def test_scene_classes_are_found_from_their_headers():
+    stream = CodeStream(chunked(CODE + "\n\nclass Sub(CircleScene):\n    pass\n", 4))
+    stream.result()
+    assert stream.validator.scene_names == ["CircleScene", "Sub"]
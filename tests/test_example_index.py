@@ -0,0 +1,48 @@
+import sqlite3
+
+from example_index import ExampleIndex, is_edit, tokenize
+
+CODE = "class A(Scene):\n    def construct(self):\n        pass\n"
+
+
+def test_match_requires_the_same_words(tmp_path):
+    index = ExampleIndex(tmp_path / "examples.db")
+    index.add("Draw a blue circle that moves left", CODE)
+
+    assert index.match("draw the blue circle that moves left!").code == CODE
+    assert index.match("Draw a red circle that moves left") is None
+    assert index.match("Draw a blue circle that moves to the left") is None
+    assert index.stats()["reused"] == 1
+
+
+def test_near_matches_are_opt_in(tmp_path):
+    index = ExampleIndex(tmp_path / "examples.db", reuse_similarity=0.8)
+    index.add("Draw a blue circle that moves left", CODE)
+    assert index.match("Draw a red circle that moves left").similarity < 1
+
+
+def test_prepositions_are_kept_for_matching_but_not_scored(tmp_path):
+    assert "to" not in tokenize("move from the origin to the corner")
+    index = ExampleIndex(tmp_path / "examples.db")
+    index.add("move the dot from the origin to the corner", CODE)
+    assert index.match("move the dot to the origin from the corner") is None
+    assert index.search("move dot corner origin")[0].code == CODE
+
+
+def test_existing_indexes_get_match_keys(tmp_path):
+    path = tmp_path / "examples.db"
+    ExampleIndex(path).add("Show a square", CODE)
+    with sqlite3.connect(path) as db:
+        db.execute("DROP INDEX examples_match_key")
+        db.execute("ALTER TABLE examples DROP COLUMN match_key")
+    assert ExampleIndex(path).match("show the square").code == CODE
+
+
+def test_edits_are_told_apart_from_new_requests_per_request():
+    circle = "from manim import *\n\nclass CircleScene(Scene):\n    def construct(self):\n        self.play(Create(Circle()))\n"
+    red_circle = circle.replace("Circle()", "Circle(color=RED)")
+    square = "from manim import *\n\nclass SquareScene(Scene):\n    def construct(self):\n        self.play(Create(Square()))\n"
+    assert not is_edit(circle, None)
+    assert is_edit(red_circle, circle)
+    assert not is_edit(square, red_circle)
+    assert not is_edit(square, "not python (")
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from code_stream import CodeStream, EarlyValidationError
+from generation_cache import GenerationCache, generation_key
+
+CODE = "from manim import *\n\nclass A(Scene):\n    def construct(self):\n        self.wait()"
+
+
+def fake_stream(text, chunk_size=7, delay=0.0):
+    """A streaming model response, chunk by chunk"""
+    for i in range(0, len(text), chunk_size):
+        time.sleep(delay)
+        yield text[i:i + chunk_size]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GenerationCache(tmp_path / "generations.db")
+
+
+def test_key_ignores_case_whitespace_and_final_punctuation():
+    assert generation_key("Draw a  Circle!", "v1", "mock") == generation_key("draw a circle", "v1", "mock")
+    assert generation_key("draw a circle", "v1", "mock") != generation_key("draw a circle", "v2", "mock")
+    assert generation_key("draw a circle", "v1", "mock", "old code") != generation_key("draw a circle", "v1", "mock")
+
+
+def test_concurrent_identical_requests_generate_once(cache):
+    calls = []
+    started = threading.Event()
+
+    def generate():
+        calls.append(1)
+        started.set()
+        return CodeStream(fake_stream(f"```python\n{CODE}\n```", delay=0.02)).result()
+
+    with ThreadPoolExecutor(5) as executor:
+        leader = executor.submit(cache.get_or_generate, "key", generate)
+        started.wait(5)
+        followers = [executor.submit(cache.get_or_generate, "key", generate) for _ in range(4)]
+        results = [leader.result(5)] + [future.result(5) for future in followers]
+
+    assert results == [CODE] * 5
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["shared_in_flight"] == 4
+    assert cache.get_or_generate("key", generate) == CODE
+    assert cache.stats()["hits"] == 1
+
+
+def test_early_validation_error_reaches_every_waiter_and_is_not_cached(cache):
+    started = threading.Event()
+
+    def generate():
+        started.set()
+        return CodeStream(fake_stream("import os\n" + CODE, delay=0.05)).result()
+
+    with ThreadPoolExecutor(3) as executor:
+        leader = executor.submit(cache.get_or_generate, "key", generate)
+        started.wait(5)
+        follower = executor.submit(cache.get_or_generate, "key", generate)
+        for future in (leader, follower):
+            with pytest.raises(EarlyValidationError):
+                future.result(5)
+
+    assert cache.get("key") is None
+    # The next request generates again
+    assert cache.get_or_generate("key", lambda: CodeStream(fake_stream(CODE)).result()) == CODE
+
+
+def test_empty_results_are_not_cached(cache):
+    assert cache.get_or_generate("key", lambda: "") == ""
+    assert cache.get("key") is None
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = GenerationCache(tmp_path / "generations.db", ttl=0.1)
+    cache.put("key", CODE)
+    assert cache.get("key") == CODE
+    time.sleep(0.2)
+    assert cache.get("key") is None
+    assert cache.get_or_generate("key", lambda: "new code") == "new code"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = GenerationCache(tmp_path / "generations.db", max_entries=2)
+    cache.put("a", "code a")
+    time.sleep(0.01)
+    cache.put("b", "code b")
+    time.sleep(0.01)
+    assert cache.get("a") == "code a"  # now more recent than b
+    time.sleep(0.01)
+    cache.put("c", "code c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "code a" and cache.get("c") == "code c"
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,51 @@
+import pytest
+
+import job_manifest
+from job_manifest import (conversation_dir, manim_overrides, output_path, read_manifest, write_manifest,
+                          write_manim_config)
+from tex_cache import TexCache
+
+
+@pytest.fixture(autouse=True)
+def tex_cache(tmp_path, monkeypatch):
+    cache = TexCache(tmp_path / "tex")
+    monkeypatch.setattr(job_manifest, "get_tex_cache", lambda: cache)
+    return cache
+
+
+def test_overrides_send_the_video_to_the_output_path(tmp_path, tex_cache):
+    workspace = tmp_path / "job"
+    overrides = manim_overrides(workspace)
+    assert overrides["video_dir"] == str(workspace.resolve())
+    assert overrides["tex_dir"] == str(tex_cache.unmanaged_dir)
+    video = output_path(workspace, ".webm")
+    assert video == workspace / f"{overrides['output_file']}.webm"
+
+
+def test_conversations_share_their_partial_movies(tmp_path):
+    conversation = conversation_dir(tmp_path / "conversations", "chat-1_a")
+    overrides = manim_overrides(tmp_path / "job", conversation)
+    assert overrides["partial_movie_dir"].startswith(str(conversation.resolve()))
+    assert (conversation / "partial_movie_files").is_dir()
+
+
+@pytest.mark.parametrize("conversation_id", ["../up", "a/b", "", "with space"])
+def test_unsafe_conversation_ids_are_rejected(tmp_path, conversation_id):
+    with pytest.raises(ValueError):
+        conversation_dir(tmp_path, conversation_id)
+
+
+def test_config_file_lists_every_override(tmp_path):
+    cfg = write_manim_config(tmp_path, {"frame_rate": 30, "format": "mp4"})
+    assert cfg.read_text() == "[CLI]\nframe_rate = 30\nformat = mp4\n"
+
+
+def test_manifest_round_trip(tmp_path):
+    assert read_manifest(tmp_path) is None
+    video = output_path(tmp_path)
+    video.write_bytes(b"x" * 42)
+    written = write_manifest(tmp_path, "job1", video, "A", "chat", duration=1.5, render_seconds=3.0,
+                             timings={"render": 2.0})
+    manifest = read_manifest(tmp_path)
+    assert manifest == written
+    assert (manifest.path, manifest.bytes, manifest.duration) == (str(video.resolve()), 42, 1.5)
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import llm_backend
+from llm_backend import LLMBackend, LLMError, MockProvider, TokenBucket
+
+RESPONSE = "```python\nfrom manim import *\n```\n"
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_backend, "BACKOFF_BASE", 0.01)
+
+
+class ScriptedProvider(MockProvider):
+    """MockProvider whose n-th call waits, fails or breaks off as scripted"""
+
+    def __init__(self, script, **kwargs):
+        super().__init__([RESPONSE], chunk_size=8, **kwargs)
+        self.script = script
+
+    def stream(self, prompt, timeout):
+        with self._lock:
+            self.calls += 1
+            step = self.script.get(self.calls, {})
+        time.sleep(step.get("latency", 0))
+        if "status" in step:
+            raise LLMError("scripted failure", status=step["status"])
+        for i in range(0, len(RESPONSE), self.chunk_size):
+            if i == step.get("fail_after", -1) * self.chunk_size:
+                raise LLMError("connection reset", status=503)
+            yield RESPONSE[i:i + self.chunk_size]
+
+
+def backend(provider, **settings):
+    return LLMBackend(provider, **{"requests_per_minute": 0, "retries": 2, "timeout": 5.0, **settings})
+
+
+def test_mock_provider_streams_its_response():
+    llm = backend(MockProvider([RESPONSE], chunk_size=4))
+    chunks = list(llm.stream("prompt"))
+    assert "".join(chunks) == RESPONSE and len(chunks) > 1
+    assert asyncio.run(llm.agenerate("prompt")) == RESPONSE
+    assert llm.stats()["requests"] == 2
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(per_minute=600, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    time.sleep(0.12)
+    assert bucket.try_acquire()
+
+
+def test_requests_are_throttled_to_the_rate_limit():
+    llm = backend(MockProvider([RESPONSE]), requests_per_minute=600, burst=1)
+    started = time.monotonic()
+    for _ in range(4):
+        llm.generate("prompt")
+    # One request from the burst, then one every 0.1s
+    assert time.monotonic() - started >= 0.25
+    assert llm.stats()["throttled_seconds"] >= 0.25
+
+
+def test_concurrent_requests_are_bounded():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    class Counting(MockProvider):
+        def stream(self, prompt, timeout):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            yield from super().stream(prompt, timeout)
+
+    llm = backend(Counting([RESPONSE]), concurrency=2)
+    threads = [threading.Thread(target=llm.generate, args=("prompt",)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert max(peak) == 2
+
+
+def test_429_is_retried_with_full_jitter_backoff(monkeypatch):
+    waits = []
+    monkeypatch.setattr(llm_backend.random, "uniform", lambda low, high: waits.append((low, high)) or 0.0)
+    provider = ScriptedProvider({1: {"status": 429}, 2: {"status": 503}})
+    llm = backend(provider)
+    assert llm.generate("prompt") == RESPONSE
+    assert provider.calls == 3
+    assert waits == [(0, 0.02), (0, 0.04)]
+    assert llm.stats()["retried"] == 2 and llm.stats()["failed"] == 0
+
+
+def test_retries_give_up_after_the_limit():
+    provider = MockProvider([RESPONSE], fail_every=1)
+    llm = backend(provider, retries=2)
+    with pytest.raises(LLMError) as error:
+        llm.generate("prompt")
+    assert error.value.status == 429
+    assert provider.calls == 3
+    assert llm.stats()["failed"] == 1
+
+
+def test_client_errors_are_not_retried():
+    provider = ScriptedProvider({1: {"status": 400}})
+    with pytest.raises(LLMError):
+        backend(provider).generate("prompt")
+    assert provider.calls == 1
+
+
+def test_a_request_without_a_first_chunk_times_out_and_is_retried():
+    provider = ScriptedProvider({1: {"latency": 0.5}})
+    llm = backend(provider, timeout=0.1)
+    assert llm.generate("prompt") == RESPONSE
+    assert provider.calls == 2 and llm.stats()["retried"] == 1
+
+
+def test_a_stream_is_not_retried_after_its_first_chunk():
+    provider = ScriptedProvider({1: {"fail_after": 2}})
+    chunks = []
+    with pytest.raises(LLMError):
+        for text in backend(provider).stream("prompt"):
+            chunks.append(text)
+    assert len(chunks) == 2
+    assert provider.calls == 1
+
+
+def test_a_slow_request_is_hedged():
+    provider = ScriptedProvider({1: {"latency": 0.5}})
+    llm = backend(provider, hedge_after=0.05)
+    started = time.monotonic()
+    assert llm.generate("prompt") == RESPONSE
+    assert time.monotonic() - started < 0.4
+    assert llm.stats()["hedged"] == 1 and llm.stats()["hedge_wins"] == 1
+
+
+def test_no_hedge_when_the_rate_limit_has_no_token_to_spare():
+    provider = ScriptedProvider({1: {"latency": 0.2}})
+    llm = backend(provider, hedge_after=0.05, requests_per_minute=6, burst=1)
+    assert llm.generate("prompt") == RESPONSE
+    assert provider.calls == 1 and llm.stats()["hedged"] == 0
@@ -0,0 +1,95 @@
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+import media_server
+from media_server import media_url, parse_range, read_range, resolve, serve_media
+from media_store import MediaStore
+
+VIDEO = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_server, "_base_url", None)
+    monkeypatch.setattr(media_server, "_public_url", None)
+    store = MediaStore(tmp_path / "media")
+    job = store.root / "jobs" / "abc"
+    job.mkdir(parents=True)
+    (job / "output.mp4").write_bytes(VIDEO)
+    (job / "scene.py").write_text("secret")
+    (job / ".lease").touch()
+    return store
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get(url, range_header=None):
+    request = urllib.request.Request(url, headers={"Range": range_header} if range_header else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, dict(response.headers), response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), b""
+
+
+def test_ranges():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+@pytest.mark.parametrize("relative", ["jobs/abc/scene.py", "jobs/abc/.lease", "jobs/abc/../../../etc/passwd",
+                                      "jobs/abc/missing.mp4", "cache/renders/x.mp4"])
+def test_only_rendered_media_inside_the_store_is_served(store, relative):
+    with pytest.raises(FileNotFoundError):
+        resolve(store, relative)
+
+
+def test_chunks_are_read_by_offset(store):
+    path = resolve(store, "jobs/abc/output.mp4")
+    assert read_range(store, path, 100, 50) == VIDEO[100:150]
+    assert read_range(store, path, len(VIDEO) - 5) == VIDEO[-5:]
+
+
+def test_http_serves_whole_files_and_byte_ranges(store):
+    video = store.root / "jobs" / "abc" / "output.mp4"
+    assert media_url(store, video) is None  # nothing serves media yet
+    port = free_port()
+    server = serve_media(store, port)
+    try:
+        url = media_url(store, video)
+        assert url == f"http://127.0.0.1:{port}/jobs/abc/output.mp4"
+        assert media_url(store, video, public=True) is None
+
+        status, headers, body = get(url)
+        assert (status, body, headers["Content-Type"]) == (200, VIDEO, "video/mp4")
+        status, headers, body = get(url, "bytes=10-19")
+        assert (status, body, headers["Content-Range"]) == (206, VIDEO[10:20], f"bytes 10-19/{len(VIDEO)}")
+        status, headers, _ = get(url, f"bytes={len(VIDEO)}-")
+        assert (status, headers["Content-Range"]) == (416, f"bytes */{len(VIDEO)}")
+        assert get(f"http://127.0.0.1:{port}/jobs/abc/scene.py")[0] == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_a_taken_port_serves_nothing(store):
+    port = free_port()
+    first = serve_media(store, port)
+    try:
+        assert serve_media(store, port) is None
+    finally:
+        first.shutdown()
+        first.server_close()
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import media_store
+from media_store import MediaStore, publish
+from render_jobs import QUEUED, SUCCEEDED, RenderQueue
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MediaStore(tmp_path / "media", max_bytes=1000)
+
+
+def make_entry(store, area, name, size, age):
+    path = store.root / area / name
+    path.mkdir(parents=True)
+    (path / "video.mp4").write_bytes(b"x" * size)
+    old = time.time() - age
+    os.utime(path, (old, old))
+    return path
+
+
+def test_least_recently_used_entries_are_evicted_until_under_budget(store):
+    oldest = make_entry(store, "jobs", "a", 600, age=3000)
+    older = make_entry(store, "jobs", "b", 600, age=2000)
+    newest = make_entry(store, "jobs", "c", 300, age=1000)
+    result = store.evict()
+    assert result["removed"] == 1 and result["bytes"] == 900
+    assert not oldest.exists() and older.exists() and newest.exists()
+
+
+def test_expired_entries_are_evicted_under_budget(tmp_path):
+    store = MediaStore(tmp_path / "media", ttl=600)
+    expired = make_entry(store, "sessions", "old", 10, age=1200)
+    fresh = make_entry(store, "sessions", "new", 10, age=300)
+    store.evict()
+    assert not expired.exists() and fresh.exists()
+
+
+def test_young_pinned_and_leased_entries_survive(store):
+    young = make_entry(store, "jobs", "young", 2000, age=media_store.MIN_AGE / 2)
+    pinned = make_entry(store, "conversations", "pinned", 2000, age=3000)
+    store.pin(pinned / "video.mp4")
+    leased = make_entry(store, "batch", "leased", 2000, age=3000)
+    with store.lease(leased / "video.mp4"):
+        os.utime(leased, (0, 0))  # as old as it gets
+        store.evict()
+        assert young.exists() and pinned.exists() and leased.exists()
+    store.unpin(pinned)
+    os.utime(pinned, (0, 0))
+    store.evict()
+    assert not pinned.exists() and not leased.exists() and young.exists()
+
+
+def test_leasing_a_cleaned_entry_is_a_no_op(store):
+    entry = make_entry(store, "jobs", "a", 10, age=3000)
+    with store.lease(entry):
+        pass
+    store.clean("jobs/a")
+    with store.lease(entry):
+        pass  # nothing left to protect
+    assert not entry.exists()
+
+
+def test_entries_that_vanish_during_a_scan_are_skipped(store, monkeypatch):
+    gone = make_entry(store, "jobs", "gone", 10, age=3000)
+    kept = make_entry(store, "jobs", "kept", 10, age=3000)
+    iterdir = type(gone).iterdir
+
+    def racing_iterdir(path):
+        if path == gone:
+            raise FileNotFoundError(path)
+        return iterdir(path)
+
+    monkeypatch.setattr(type(gone), "iterdir", racing_iterdir)
+    assert [entry.path for entry in store.entries()] == [kept]
+
+
+def test_clean_refuses_paths_outside_the_store(store):
+    with pytest.raises(ValueError):
+        store.clean("../elsewhere")
+
+
+def test_publish_links_instead_of_copying(tmp_path):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"video")
+    target = publish(source, tmp_path / "target.mp4")
+    assert target.read_bytes() == b"video"
+    assert os.stat(source).st_ino == os.stat(target).st_ino
+
+
+def test_queued_jobs_get_their_workspace_only_when_they_start(store):
+    jobs_dir = store.root / "jobs"
+
+    async def scenario():
+        release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def render(job):
+            assert job.workspace.is_dir()
+            asyncio.run_coroutine_threadsafe(release.wait(), loop).result(5)
+            return str(job.workspace / "video.mp4")
+
+        queue = RenderQueue(render, jobs_dir, max_parallel=1)
+        running = await queue.submit("code")
+        queued = await queue.submit("code")
+        await asyncio.sleep(0.05)
+        assert queued.status == QUEUED and not queued.workspace.exists()
+        release.set()
+        await queue.wait(queued.id, timeout=5)
+        return running, queued
+
+    running, queued = asyncio.run(scenario())
+    assert running.status == queued.status == SUCCEEDED
+    assert queued.workspace.is_dir()
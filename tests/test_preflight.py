@@ -0,0 +1,66 @@
+import pytest
+
+from preflight import WARNING, preflight
+
+HEADER = "from manim import *\n\n"
+SCENE = HEADER + "class A(Scene):\n    def construct(self):\n{body}\n"
+
+
+def scene(*lines):
+    return SCENE.format(body="\n".join(f"        {line}" for line in lines))
+
+
+def error_codes(code):
+    return [issue.code for issue in preflight(code).errors]
+
+
+def test_a_valid_scene_passes():
+    result = preflight(scene("circle = Circle()", "self.play(Create(circle), run_time=2)", "self.wait(0.5)"))
+    assert result.ok and result.scenes == ["A"] and result.default_scene == "A"
+
+
+def test_scenes_are_found_through_base_classes():
+    code = HEADER + ("class Base(ThreeDScene):\n    def construct(self):\n        pass\n\n"
+                     "class Child(Base):\n    pass\n\nclass Helper:\n    pass\n")
+    result = preflight(code)
+    assert result.ok and result.scenes == ["Base", "Child"]
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("class A(Scene)\n    pass", "syntax"),
+    (HEADER + "x = 1\n", "no-scene"),
+    ("import os\n" + scene("pass"), "import-not-allowed"),
+    ("from subprocess import run\n" + scene("pass"), "import-not-allowed"),
+    ("from . import helpers\n" + scene("pass"), "import-not-allowed"),
+    ("from manimlib import *\n" + scene("pass"), "manimgl-import"),
+    (scene("self.play(ShowCreation(Circle()))"), "renamed-api"),
+    (scene("axes.get_graph(lambda x: x)"), "renamed-api"),
+    (scene("eval('1 + 1')"), "forbidden-call"),
+    (scene("open('/etc/passwd')"), "forbidden-call"),
+    (scene("while True:", "    self.wait()"), "infinite-loop"),
+    (scene("self.play()"), "empty-play"),
+    (scene("self.play(Create(Circle()), run_time=0)"), "run-time"),
+    (scene("self.wait(-1)"), "run-time"),
+    (HEADER + "class A(Scene):\n    CONFIG = {}\n    def construct(self):\n        pass\n", "manimgl-config"),
+    (HEADER + "class A(Scene):\n    def construct():\n        pass\n", "construct-signature"),
+])
+def test_bad_scenes_are_rejected(code, expected):
+    assert expected in error_codes(code)
+
+
+def test_a_loop_with_a_break_is_allowed():
+    assert preflight(scene("while True:", "    self.wait()", "    break")).ok
+
+
+def test_tex_escapes_are_warnings_only():
+    result = preflight(scene("tex = MathTex('\\frac{a}{b}')"))
+    assert result.ok
+    assert [(issue.severity, issue.code) for issue in result.issues] == [(WARNING, "tex-escape")]
+
+
+def test_errors_are_reported_with_their_line():
+    result = preflight(scene("circle = Circle()", "eval('circle')"))
+    (issue,) = result.errors
+    assert issue.line == 6
+    assert result.format_errors() == "ERROR [forbidden-call] line 6: Call to 'eval' is not allowed in scenes"
+    assert result.to_dict()["ok"] is False
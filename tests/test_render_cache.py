@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+from render_cache import RenderCache, cache_key
+
+
+def video(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_key_ignores_formatting_and_comments():
+    code = "from manim import *\nclass A(Scene):\n    def construct(self):\n        self.wait()\n"
+    reformatted = "from manim import *\n\n\nclass A(Scene):  # a scene\n    def construct(self):\n        self.wait( )\n"
+    assert cache_key(code, "A", ["-ql"]) == cache_key(reformatted, "A", ["-ql"])
+    assert cache_key(code, "A", ["-ql"]) != cache_key(code, "A", ["-qh"])
+
+
+def test_hits_misses_and_linked_entries(tmp_path):
+    cache = RenderCache(tmp_path / "cache")
+    source = video(tmp_path, "out.mp4", 10)
+    assert cache.get("key") is None
+    cached = cache.put("key", source)
+    assert cache.get("key") == cached
+    assert os.stat(cached).st_ino == os.stat(source).st_ino
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["bytes"]) == (1, 1, 10)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=25)
+    cache.put("a", video(tmp_path, "a.mp4", 10))
+    cache.put("b", video(tmp_path, "b.mp4", 10))
+    os.utime(cache.root / "a.mp4", (1, 1))
+    os.utime(cache.root / "b.mp4", (2, 2))
+    cache.get("a")  # now the most recent
+    cache.put("c", video(tmp_path, "c.mp4", 10))
+    assert cache.contains("a") and cache.contains("c") and not cache.contains("b")
+    assert cache.stats()["bytes"] == 20
+
+
+def test_stats_skip_entries_evicted_during_the_scan(tmp_path, monkeypatch):
+    cache = RenderCache(tmp_path / "cache")
+    cache.put("kept", video(tmp_path, "kept.mp4", 10))
+    cache.put("gone", video(tmp_path, "gone.mp4", 7))
+    gone = cache.root / "gone.mp4"
+    is_file = Path.is_file
+
+    def evicted_after_listing(path):
+        found = is_file(path)
+        if path == gone:
+            path.unlink()  # another process evicts it between the listing and the stat
+        return found
+
+    monkeypatch.setattr(Path, "is_file", evicted_after_listing)
+    assert cache.stats()["bytes"] == 10
+    assert cache.evict() == 0
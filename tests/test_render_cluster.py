@@ -0,0 +1,219 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import render_cluster
+import render_node
+from media_store import MediaStore
+from render_cluster import RenderCoordinator, serve_coordinator
+from render_jobs import RenderJob
+from render_monitor import RenderError
+from worker_pool import RenderFailed
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MediaStore(tmp_path / "media")
+
+
+@pytest.fixture
+def coordinator(store):
+    return RenderCoordinator(store, heartbeat_interval=0.1, node_timeout=0.5, no_nodes_timeout=0.5)
+
+
+@pytest.fixture
+def submit(coordinator):
+    """Run coordinator.run in the background, as the render queue does"""
+    executor = ThreadPoolExecutor(4)
+    jobs = []
+
+    def submit(job):
+        jobs.append(job)
+        future = executor.submit(coordinator.run, job)
+        deadline = time.monotonic() + 5
+        while job.id not in coordinator.tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return future
+
+    yield submit
+    # Cancel what the test left behind and drop every node so running tasks end too
+    for job in jobs:
+        job.cancel_event.set()
+    coordinator.node_timeout = -1
+    coordinator.reap()
+    executor.shutdown(wait=True)
+
+
+def make_job(store, job_id, estimate=1.0):
+    workspace = store.root / "jobs" / job_id
+    workspace.mkdir(parents=True)
+    job = RenderJob(job_id, "code", "Scene", workspace, profile="preview")
+    job.estimate = estimate
+    return job
+
+
+def write_video(job):
+    video = Path(job.workspace) / "video.mp4"
+    video.write_bytes(b"video")
+    return video
+
+
+def test_local_nodes_render_over_http(store, coordinator, submit, monkeypatch):
+    rendered_by = []
+
+    def render_job(job):
+        rendered_by.append(threading.current_thread().name)
+        return write_video(job)
+
+    monkeypatch.setattr(render_node, "render_job", render_job)
+    server = serve_coordinator(coordinator, 0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        for i in range(2):
+            node = render_node.RenderNode(url, f"local{i}", slots=1, store=store)
+            threading.Thread(target=node.run, daemon=True).start()
+        futures = [submit(make_job(store, f"job{i}")) for i in range(4)]
+        videos = [future.result(timeout=10) for future in futures]
+    finally:
+        server.shutdown()
+    assert videos == [str(store.root / "jobs" / f"job{i}" / "video.mp4") for i in range(4)]
+    assert len(rendered_by) == 4
+    assert sum(node["completed"] for node in coordinator.stats()["nodes"]) == 4
+
+
+def test_silent_node_is_dropped_and_its_task_retried(store, coordinator, submit):
+    a = coordinator.register("a", 1)["node_id"]
+    b = coordinator.register("b", 1)["node_id"]
+    job = make_job(store, "job")
+    future = submit(job)
+    assert coordinator.lease(a, 0)["task"]["id"] == "job"
+    assert coordinator.start(a, "job")
+
+    # Only b keeps sending heartbeats
+    deadline = time.monotonic() + 5
+    while a in coordinator.nodes and time.monotonic() < deadline:
+        coordinator.heartbeat(b, [])
+        coordinator.reap()
+        time.sleep(0.05)
+    assert a not in coordinator.nodes
+    assert coordinator.lease(a, 0) == {"known": False}
+
+    reply = coordinator.lease(b, 0)
+    assert reply["task"]["id"] == "job" and reply["attempt"] == 2
+    assert coordinator.start(b, "job")
+    coordinator.complete(b, "job", write_video(job).relative_to(store.root).as_posix())
+    assert future.result(timeout=5) == str(store.root / "jobs" / "job" / "video.mp4")
+    assert coordinator.lost_nodes == 1 and coordinator.retried == 1
+
+
+def test_infrastructure_errors_are_retried_on_another_node(store, coordinator, submit):
+    a = coordinator.register("a", 1)["node_id"]
+    b = coordinator.register("b", 1)["node_id"]
+    job = make_job(store, "job")
+    future = submit(job)
+    coordinator.lease(a, 0)
+    coordinator.start(a, "job")
+    coordinator.complete(a, "job", error=RenderError("WorkerCrashed", "worker died").to_dict())
+
+    # The node it failed on is skipped while another one is alive
+    assert coordinator.lease(a, 0)["task"] is None
+    assert coordinator.lease(b, 0)["task"]["id"] == "job"
+    coordinator.start(b, "job")
+    coordinator.complete(b, "job", write_video(job).relative_to(store.root).as_posix())
+    assert future.result(timeout=5).endswith("video.mp4")
+
+
+def test_scene_errors_are_not_retried(store, coordinator, submit):
+    a = coordinator.register("a", 1)["node_id"]
+    coordinator.register("b", 1)
+    future = submit(make_job(store, "job"))
+    coordinator.lease(a, 0)
+    coordinator.start(a, "job")
+    coordinator.complete(a, "job", error=RenderError("NameError", "name 'x' is not defined", 3).to_dict())
+    with pytest.raises(RenderFailed) as failed:
+        future.result(timeout=5)
+    assert failed.value.error.type == "NameError"
+    assert coordinator.retried == 0
+
+
+def test_video_missing_from_the_store_is_retried(store, coordinator, submit):
+    a = coordinator.register("a", 1)["node_id"]
+    b = coordinator.register("b", 1)["node_id"]
+    job = make_job(store, "job")
+    future = submit(job)
+    coordinator.lease(a, 0)
+    coordinator.start(a, "job")
+    # A node with its own, unshared store
+    coordinator.complete(a, "job", "jobs/job/video.mp4")
+    assert coordinator.lease(b, 0)["task"]["id"] == "job"
+    coordinator.start(b, "job")
+    coordinator.complete(b, "job", write_video(job).relative_to(store.root).as_posix())
+    assert future.result(timeout=5).endswith("video.mp4")
+
+
+def test_idle_node_steals_an_unstarted_reserve(store, coordinator, submit, monkeypatch):
+    monkeypatch.setattr(render_cluster, "STEAL_AFTER", 0.05)
+    a = coordinator.register("a", 1)["node_id"]
+    b = coordinator.register("b", 1)["node_id"]
+    submit(make_job(store, "first", estimate=1.0))
+    submit(make_job(store, "reserved", estimate=2.0))
+    assert coordinator.lease(a, 1)["task"]["id"] == "first"
+    assert coordinator.start(a, "first")
+    assert coordinator.lease(a, 0)["task"]["id"] == "reserved"
+    time.sleep(0.1)
+
+    reply = coordinator.lease(b, 0.5)
+    assert reply["task"]["id"] == "reserved" and reply["attempt"] == 1
+    assert coordinator.stolen == 1
+    # a finishes its render and finds its reserve gone
+    assert not coordinator.start(a, "reserved")
+    assert coordinator.start(b, "reserved")
+
+
+def test_busy_nodes_do_not_steal_each_others_reserve(store, coordinator, submit, monkeypatch):
+    monkeypatch.setattr(render_cluster, "STEAL_AFTER", 0.05)
+    a = coordinator.register("a", 1)["node_id"]
+    b = coordinator.register("b", 1)["node_id"]
+    for job_id, estimate in (("a-running", 1.0), ("b-running", 2.0), ("a-reserve", 3.0)):
+        submit(make_job(store, job_id, estimate))
+    assert coordinator.lease(a, 1)["task"]["id"] == "a-running"
+    coordinator.start(a, "a-running")
+    assert coordinator.lease(b, 1)["task"]["id"] == "b-running"
+    coordinator.start(b, "b-running")
+    assert coordinator.lease(a, 0)["task"]["id"] == "a-reserve"
+    time.sleep(0.1)
+
+    # Neither b's reserve lease nor its long poll while rendering may take a's reserve
+    assert coordinator.lease(b, 0)["task"] is None
+    assert coordinator.lease(b, 0.2)["task"] is None
+    assert coordinator.stolen == 0
+    assert coordinator.start(a, "a-reserve")
+
+
+def test_fails_when_no_node_is_registered(store, coordinator, submit):
+    future = submit(make_job(store, "job"))
+    with pytest.raises(RenderFailed) as failed:
+        future.result(timeout=5)
+    assert failed.value.error.type == "NoRenderNodes"
+
+
+def test_running_task_fails_after_its_wall_limit(store, coordinator, submit, monkeypatch):
+    limits = SimpleNamespace(wall_seconds=0.2)
+    monkeypatch.setattr(render_cluster, "get_profile", lambda name: SimpleNamespace(limits=limits))
+    coordinator.lease_grace = 0.2
+    a = coordinator.register("a", 1)["node_id"]
+    future = submit(make_job(store, "job"))
+    coordinator.lease(a, 0)
+    coordinator.start(a, "job")
+    while not future.done():
+        coordinator.heartbeat(a, ["job"])
+        time.sleep(0.05)
+    with pytest.raises(RenderFailed) as failed:
+        future.result()
+    assert failed.value.error.type == "Timeout"
+    # The node is told to stop rendering it
+    assert coordinator.heartbeat(a, ["job"])["cancel"] == ["job"]
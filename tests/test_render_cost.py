@@ -0,0 +1,89 @@
+import ast
+import asyncio
+
+import pytest
+
+from render_cost import DEFAULT_COEFFICIENTS, CostModel, SceneFeatures, scene_features
+from render_jobs import RenderQueue
+from render_profiles import get_profile
+
+CODE = """from manim import *
+
+def helper():
+    return MathTex("x")
+
+class Base(Scene):
+    def intro(self):
+        self.play(Write(Tex("Hello")), run_time=2)
+
+class Lesson(Base):
+    def construct(self):
+        self.intro()
+        for i in range(4):
+            self.play(FadeIn(Circle()))
+        dot = Dot()
+        dot.add_updater(lambda m: m)
+        self.wait(3)
+"""
+
+
+def features(code, scene=None):
+    return scene_features(ast.parse(code), scene)
+
+
+def test_features_follow_loops_run_times_and_base_classes():
+    found = features(CODE, "Lesson")
+    assert found.plays == 6
+    assert found.animation_seconds == pytest.approx(2 + 4 * 1 + 3)
+    assert found.tex == 2  # Tex in Base.intro and MathTex in the module helper
+    assert found.updaters == 1
+    assert not found.three_d
+    assert features("class S(ThreeDScene):\n    def construct(self):\n        self.wait()\n").three_d
+
+
+def test_estimates_grow_with_resolution_and_encoder_preset():
+    model = CostModel(None)
+    scene = features(CODE, "Lesson")
+    estimates = [model.estimate(scene, get_profile(name)) for name in ("preview", "chat", "publish")]
+    assert estimates == sorted(estimates) and estimates[0] > DEFAULT_COEFFICIENTS["startup"]
+    assert model.estimate(SceneFeatures(animation_seconds=60), get_profile("chat")) > \
+        model.estimate(SceneFeatures(animation_seconds=1), get_profile("chat"))
+
+
+def test_measurements_move_coefficients_and_are_shared_through_the_file(tmp_path):
+    path = tmp_path / "costs.json"
+    model = CostModel(path, learning_rate=0.5)
+    scene = SceneFeatures(animation_seconds=10, tex=4)
+    profile = get_profile("chat")
+    before = model.estimate(scene, profile)
+    model.record(scene, profile, {"startup": 6.0, "tex": 8.0, "render": 100.0, "encode": 20.0})
+    assert model.coefficients["startup"] == pytest.approx(2.0 + 0.5 * (6.0 - 2.0))
+    assert model.coefficients["tex"] == pytest.approx(0.5 + 0.5 * (8.0 / 4 - 0.5))
+    assert model.estimate(scene, profile) > before
+    other = CostModel(path)
+    assert other.coefficients == model.coefficients and other.samples == 1
+
+
+def test_missing_stages_leave_their_coefficients_alone():
+    model = CostModel(None)
+    model.record(SceneFeatures(), get_profile("preview"), {"startup": 1.0})
+    assert model.coefficients["tex"] == DEFAULT_COEFFICIENTS["tex"]
+    assert model.coefficients["encode:ultrafast"] == DEFAULT_COEFFICIENTS["encode:ultrafast"]
+    assert model.coefficients["startup"] < DEFAULT_COEFFICIENTS["startup"]
+
+
+def test_short_jobs_overtake_long_ones_and_clients_take_turns(tmp_path):
+    order = []
+
+    async def scenario():
+        queue = RenderQueue(lambda job: order.append(job.code) or "video.mp4", tmp_path, max_parallel=1)
+        jobs = [await queue.submit("long", estimate=100, client="a"),
+                await queue.submit("short", estimate=5, client="b"),
+                await queue.submit("a-second", estimate=5, client="a"),
+                await queue.submit("b-second", estimate=5, client="b")]
+        for job in jobs:
+            await queue.wait(job.id, timeout=5)
+
+    asyncio.run(scenario())
+    # Tags: long 100, short 5, a-second 100 + 5, b-second 5 + 5
+    assert order == ["short", "b-second", "long", "a-second"]
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+from render_jobs import CANCELLED, FAILED, SUCCEEDED, RenderQueue
+from worker_pool import RenderFailed
+
+
+def run(scenario):
+    return asyncio.run(scenario())
+
+
+def test_parallel_renders_are_capped(tmp_path):
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def render(job):
+        with lock:
+            running.append(job.id)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(job.id)
+        return str(job.workspace / "video.mp4")
+
+    async def scenario():
+        queue = RenderQueue(render, tmp_path, max_parallel=2)
+        jobs = [await queue.submit("code") for _ in range(6)]
+        for job in jobs:
+            await queue.wait(job.id, timeout=5)
+        return jobs
+
+    jobs = run(scenario)
+    assert max(peak) == 2
+    assert {job.status for job in jobs} == {SUCCEEDED}
+    assert len({job.workspace for job in jobs}) == 6
+
+
+def test_failures_keep_their_error_details(tmp_path):
+    def render(job):
+        raise RenderFailed("NameError: name 'Circl' is not defined")
+
+    async def scenario():
+        queue = RenderQueue(render, tmp_path)
+        job = await queue.submit("code")
+        return await queue.wait(job.id, timeout=5)
+
+    job = run(scenario)
+    assert job.status == FAILED and "Circl" in job.error
+    assert job.error_detail["type"] == "RenderFailed"
+    assert job.to_dict()["render_seconds"] is not None
+
+
+def test_queued_and_running_jobs_can_be_cancelled(tmp_path):
+    def render(job):
+        job.cancel_event.wait(5)
+        raise RenderFailed("killed")
+
+    async def scenario():
+        queue = RenderQueue(render, tmp_path, max_parallel=1)
+        running = await queue.submit("code")
+        queued = await queue.submit("code")
+        await asyncio.sleep(0.05)
+        assert queue.cancel(queued.id) and queued.status == CANCELLED
+        assert queue.cancel(running.id)
+        await queue.wait(running.id, timeout=5)
+        assert not queue.cancel(running.id)
+        return running, queued
+
+    running, queued = run(scenario)
+    assert running.status == CANCELLED
+    assert queued.started_at is None
+
+
+def test_finished_jobs_are_reported_off_the_event_loop(tmp_path):
+    finished = []
+    loop_threads = []
+
+    async def scenario():
+        loop_threads.append(threading.get_ident())
+        done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def on_finish(job):
+            finished.append((job.status, threading.get_ident()))
+            loop.call_soon_threadsafe(done.set)
+
+        queue = RenderQueue(lambda job: "video.mp4", tmp_path, on_finish=on_finish)
+        await queue.submit("code")
+        await asyncio.wait_for(done.wait(), 5)
+
+    run(scenario)
+    [(status, thread)] = finished
+    assert status == SUCCEEDED and thread != loop_threads[0]
+
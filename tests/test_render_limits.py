@@ -0,0 +1,81 @@
+import asyncio
+import signal
+import sys
+import threading
+
+import pytest
+
+import render_limits
+from render_jobs import QueueFull, RenderQueue
+from render_limits import AdmissionController, RenderLimits, check_output, limit_error_type
+from render_monitor import run_monitored
+
+LIMITS = RenderLimits(wall_seconds=20, cpu_seconds=1, memory_mb=256, output_mb=1)
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+@pytest.mark.parametrize("code, expected", [
+    ("while True: pass", "CpuLimit"),
+    ("x = bytearray(900 * 1024 * 1024); import time; time.sleep(3)", "MemoryLimit"),
+    ("open('big', 'wb').write(b'x' * 3 * 1024 * 1024)", "OutputLimit"),
+])
+def test_a_render_past_its_limit_is_stopped_and_named(tmp_path, code, expected):
+    result = run_monitored(python(code), cwd=tmp_path, timeout=20, limits=LIMITS)
+    assert not result.ok
+    assert result.error.type == expected
+
+
+def test_a_render_within_its_limits_succeeds(tmp_path):
+    assert run_monitored(python("print('done')"), cwd=tmp_path, timeout=20, limits=LIMITS).ok
+
+
+def test_exit_signals_name_the_limit():
+    assert limit_error_type(-signal.SIGXCPU) == "CpuLimit"
+    assert limit_error_type(-signal.SIGXFSZ) == "OutputLimit"
+    assert limit_error_type(-signal.SIGKILL, cgroup=True) == "MemoryLimit"
+    assert limit_error_type(1, output="MemoryError") == "MemoryLimit"
+    assert limit_error_type(1, output="NameError: x") is None
+
+
+def test_outputs_over_the_profile_size_are_reported(tmp_path):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"x" * (2 * 1024 * 1024))
+    assert "more than the 1 MB limit" in check_output(video, LIMITS)
+    assert check_output(video, RenderLimits(20, 1, 256, 5)) is None
+
+
+def test_renders_wait_while_the_host_is_overloaded(monkeypatch):
+    load = [100.0]
+    monkeypatch.setattr(render_limits.os, "getloadavg", lambda: (load[0], 0, 0))
+    admission = AdmissionController(max_load_per_cpu=1.5, poll_seconds=0.01)
+    assert "per core" in admission.overloaded()
+    waiter = threading.Thread(target=admission.wait)
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    load[0] = 0.0
+    waiter.join(5)
+    assert not waiter.is_alive() and admission.deferred == 1
+
+    load[0] = 100.0
+    cancel = threading.Event()
+    cancel.set()
+    admission.wait(cancel)  # a cancelled render stops waiting at once
+
+
+def test_the_queue_refuses_jobs_once_too_many_wait(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_limits.os, "getloadavg", lambda: (100.0, 0, 0))
+    admission = AdmissionController(max_waiting=1, poll_seconds=0.01)
+
+    async def scenario():
+        queue = RenderQueue(lambda job: "video.mp4", tmp_path, admission=admission)
+        first = await queue.submit("code")
+        with pytest.raises(QueueFull, match="1 renders are already waiting"):
+            await queue.submit("code")
+        queue.cancel(first.id)
+
+    asyncio.run(scenario())
+    assert admission.rejected == 1
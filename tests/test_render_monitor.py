@@ -0,0 +1,70 @@
+import sys
+import threading
+import time
+
+from render_monitor import OutputClassifier, error_from_exception, run_monitored
+
+FAILING_SCENE = """
+import sys, time
+print("Animation 0: Create(Circle)", flush=True)
+def construct():
+    undefined_name
+try:
+    construct()
+except NameError:
+    import traceback
+    traceback.print_exc()
+    sys.stderr.flush()
+time.sleep(30)  # a hung render after the traceback
+"""
+
+
+def test_a_traceback_stops_the_render_at_once(tmp_path):
+    scene = tmp_path / "scene.py"
+    scene.write_text(FAILING_SCENE)
+    started = time.monotonic()
+    result = run_monitored([sys.executable, str(scene)], cwd=tmp_path, timeout=20, scene_file=str(scene))
+    assert time.monotonic() - started < 10
+    assert not result.ok
+    assert result.error.type == "NameError"
+    assert result.error.line == 5
+    assert "Animation 0" in result.error.tail
+
+
+def test_timeouts_and_cancellation(tmp_path):
+    sleep = [sys.executable, "-c", "import time; time.sleep(30)"]
+    result = run_monitored(sleep, timeout=0.3)
+    assert result.error.type == "Timeout"
+
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    result = run_monitored(sleep, timeout=20, cancel=cancel)
+    assert result.cancelled and not result.ok
+
+
+def test_a_failing_exit_without_a_traceback_reports_the_last_line():
+    result = run_monitored([sys.executable, "-c", "print('ffmpeg exploded'); raise SystemExit(3)"], timeout=20)
+    assert result.returncode == 3
+    assert (result.error.type, result.error.message) == ("RenderFailed", "ffmpeg exploded")
+
+
+def test_latex_errors_and_rich_tracebacks_are_recognised():
+    latex = OutputClassifier("scene.py")
+    assert latex.feed("! Undefined control sequence.").type == "LatexError"
+
+    rich = OutputClassifier("scene.py")
+    for line in ["╭──── Traceback (most recent call last) ────╮",
+                 "│ /work/scene.py:12 in construct             │",
+                 "╰────────────────────────────────────────────╯"]:
+        assert rich.feed(line) is None
+    error = rich.feed("AttributeError: 'Circle' object has no attribute 'foo'")
+    assert (error.type, error.line) == ("AttributeError", 12)
+
+
+def test_in_process_errors_point_at_the_scene_line(tmp_path):
+    scene = str(tmp_path / "scene.py")
+    try:
+        exec(compile("x = 1\nundefined_name\n", scene, "exec"), {})
+    except NameError as e:
+        error = error_from_exception(e, scene)
+    assert (error.type, error.line) == ("NameError", 2)
@@ -0,0 +1,78 @@
+import zipfile
+
+import pytest
+
+import render_profiles
+from render_profiles import get_profile, set_encoder_options
+from worker_pool import RenderFailed
+
+
+@pytest.fixture(autouse=True)
+def reset_encoder_options():
+    yield
+    set_encoder_options(None)
+
+
+def encode(path, codec="libx264", frames=5):
+    """Write a few blank frames the way Manim writes a partial movie"""
+    av = pytest.importorskip("av")
+    with render_profiles._EncoderOptionsAV(av).open(str(path), mode="w") as container:
+        stream = container.add_stream(codec, rate=15, options={"an": "1", "crf": "23"})
+        stream.pix_fmt = "yuv420p"
+        stream.width = 64
+        stream.height = 64
+        for _ in range(frames):
+            frame = av.VideoFrame(64, 64, "yuv420p")
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    return path.read_bytes()
+
+
+def test_encoder_options_only_for_x264():
+    assert get_profile("preview").encoder_options() == {"preset": "ultrafast", "crf": "28"}
+    for format in ("webm", "gif", "png"):
+        assert get_profile(f"preview:{format}").encoder_options() == {}
+
+
+def test_profile_preset_and_crf_reach_the_encoder(tmp_path):
+    # x264 writes the settings it ran with into the stream
+    assert b"crf=23.0" in encode(tmp_path / "default.mp4")
+    assert b"subme=7" in encode(tmp_path / "default.mp4")
+
+    set_encoder_options(get_profile("preview").encoder_options())
+    data = encode(tmp_path / "preview.mp4")
+    assert b"crf=28.0" in data
+    assert b"subme=0" in data  # ultrafast
+
+    set_encoder_options(get_profile("publish").encoder_options())
+    data = encode(tmp_path / "publish.mp4")
+    assert b"crf=18.0" in data
+    assert b"subme=8" in data  # slow
+
+
+def test_other_encoders_keep_their_settings(tmp_path):
+    av = pytest.importorskip("av")
+    set_encoder_options({"preset": "ultrafast", "crf": "28"})
+    with render_profiles._EncoderOptionsAV(av).open(str(tmp_path / "vp9.webm"), mode="w") as container:
+        stream = container.add_stream("libvpx-vp9", rate=15, options={"an": "1", "crf": "23"})
+        assert dict(stream.options) == {"an": "1", "crf": "23"}
+
+
+def test_png_frames_are_packed_into_a_zip(tmp_path):
+    profile = get_profile("preview:png")
+    frames = tmp_path / render_profiles.FRAMES_DIR
+    frames.mkdir()
+    for i in range(3):
+        (frames / f"frame{i:04}.png").write_bytes(b"png")
+    archive = profile.output(tmp_path)
+    assert archive.suffix == ".zip"
+    with zipfile.ZipFile(archive) as packed:
+        assert packed.namelist() == ["frame0000.png", "frame0001.png", "frame0002.png"]
+
+
+def test_a_png_render_without_frames_has_no_output(tmp_path):
+    with pytest.raises(RenderFailed, match="No output files found"):
+        get_profile("preview:png").output(tmp_path)
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,51 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from render_limits import RenderLimits
+from segment_render import render_segmented, split_ranges
+from worker_pool import RenderResult
+
+CONFIG = {"video_dir": "/tmp/video", "output_file": "output", "format": "mp4"}
+
+
+class FakePool:
+    size = 4
+
+    def __init__(self, plays):
+        self.plays = plays
+        self.calls = []
+
+    def count_animations(self, *args):
+        self.calls.append(("count", args))
+        return self.plays
+
+    def render(self, *args):
+        self.calls.append(("render", args))
+        return RenderResult(Path("/tmp/video/output.mp4"), "A", 1.0, 1.0, {})
+
+
+def test_ranges_cover_every_animation_once():
+    assert split_ranges(10, 2) == [(0, 4), (5, 9)]
+    assert split_ranges(9, 4) == [(0, 4), (5, 8)]  # at least four animations each
+    assert split_ranges(3, 4) == [(0, 2)]
+
+
+@pytest.mark.parametrize("plays", [3, 0])
+def test_the_animation_count_runs_with_the_render_timeout_cancel_and_limits(plays):
+    pool = FakePool(plays)
+    cancel = threading.Event()
+    limits = RenderLimits(10, 20, 512, 50)
+    render_segmented(pool, "code", "A", CONFIG, "scene.py", timeout=10, cancel=cancel, segments=4, limits=limits)
+    (kind, count_args), (_, render_args) = pool.calls
+    assert kind == "count"
+    assert count_args[-3:] == (10, cancel, limits)
+    assert render_args[-4:] == (10, cancel, None, limits)
+
+
+def test_short_or_unsplittable_scenes_skip_the_count():
+    pool = FakePool(100)
+    render_segmented(pool, "code", "A", {**CONFIG, "format": "gif"}, segments=4)
+    render_segmented(pool, "code", "A", CONFIG, segments=1)
+    assert [kind for kind, _ in pool.calls] == ["render", "render"]
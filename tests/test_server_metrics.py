@@ -0,0 +1,67 @@
+import asyncio
+import json
+import urllib.request
+
+import pytest
+
+from server_metrics import Metrics, Tracer, serve_prometheus
+
+
+def test_tools_count_calls_errors_and_latency():
+    metrics = Metrics()
+
+    @metrics.instrument("render")
+    def render(code):
+        return "Error: NameError" if code == "bad" else "ok"
+
+    @metrics.instrument("submit")
+    async def submit():
+        raise RuntimeError("queue full")
+
+    render("good")
+    render("bad")
+    with pytest.raises(RuntimeError):
+        asyncio.run(submit())
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["tool_requests_total"] == {"tool=render": 2, "tool=submit": 1}
+    assert snapshot["counters"]["tool_errors_total"] == {"tool=render": 1, "tool=submit": 1}
+    assert snapshot["histograms"]["tool_duration_seconds"]["tool=render"]["count"] == 2
+
+
+def test_prometheus_text_format():
+    metrics = Metrics()
+    metrics.inc("renders_total", help="Finished renders", status="succeeded")
+    metrics.observe("render_duration_seconds", 0.3, buckets=(1, float("inf")), profile="chat")
+    metrics.gauge("cache_bytes", lambda: {"render": 10, "tex": 2}, label="cache")
+    metrics.gauge("broken", lambda: 1 / 0)
+    text = metrics.prometheus()
+    assert "# HELP manim_renders_total Finished renders" in text
+    assert 'manim_renders_total{status="succeeded"} 1' in text
+    assert 'manim_render_duration_seconds_bucket{profile="chat",le="1"} 1' in text
+    assert 'manim_render_duration_seconds_bucket{profile="chat",le="+Inf"} 1' in text
+    assert 'manim_render_duration_seconds_count{profile="chat"} 1' in text
+    assert 'manim_cache_bytes{cache="tex"} 2' in text
+    assert "broken" not in text
+
+
+def test_metrics_endpoint():
+    metrics = Metrics()
+    metrics.inc("renders_total")
+    server = serve_prometheus(metrics, 0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert b"manim_renders_total 1" in response.read()
+    finally:
+        server.shutdown()
+
+
+def test_render_spans_nest_queue_execution_and_stages(tmp_path):
+    tracer = Tracer(tmp_path / "trace.jsonl")
+    tracer.render_spans("job1", 10.0, 12.0, 20.0, {"tex": 1.0, "render": 5.0}, status="succeeded")
+    spans = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text().splitlines()]
+    assert [(s["name"], s["parent"], s["start"], s["duration"]) for s in spans] == [
+        ("render", None, 10.0, 10.0), ("queue", "render", 10.0, 2.0), ("execute", "render", 12.0, 8.0),
+        ("tex", "execute", 12.0, 1.0), ("render", "execute", 13.0, 5.0),
+    ]
+    Tracer().render_spans("job2", 0, 1, 2, {})  # disabled: writes nothing
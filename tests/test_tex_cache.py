@@ -0,0 +1,60 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tex_cache import TexCache
+
+
+def compiler(calls, body=b"<svg/>", delay=0.0):
+    def compile_svg(tmp_dir):
+        calls.append(1)
+        time.sleep(delay)
+        path = tmp_dir / "out.svg"
+        path.write_bytes(body)
+        return path
+    return compile_svg
+
+
+def test_concurrent_misses_compile_once(tmp_path):
+    cache = TexCache(tmp_path / "tex")
+    calls = []
+    with ThreadPoolExecutor(4) as executor:
+        paths = list(executor.map(lambda _: cache.get_or_compile("key", compiler(calls, delay=0.05)), range(4)))
+    assert len(calls) == 1
+    assert {path.read_bytes() for path in paths} == {b"<svg/>"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["bytes"]) == (3, 1, 1, 6)
+
+
+def test_callers_get_a_link_that_survives_eviction(tmp_path):
+    cache = TexCache(tmp_path / "tex", max_bytes=0)
+    tex_dir = tmp_path / "job" / "Tex"
+    calls = []
+    compiled = cache.get_or_compile("key", compiler(calls), tex_dir)
+    hit = cache.get_or_compile("key", compiler(calls), tex_dir)
+    assert compiled == hit == tex_dir / "key.svg"
+    assert os.stat(hit).st_ino == os.stat(cache.svg_path("key")).st_ino
+    assert cache.evict() == 1
+    assert not cache.svg_path("key").exists()
+    assert hit.read_bytes() == b"<svg/>"
+
+
+def test_eviction_keeps_lock_files_and_recent_entries(tmp_path):
+    cache = TexCache(tmp_path / "tex", max_bytes=10)
+    calls = []
+    for key in ("old", "new"):
+        cache.get_or_compile(key, compiler(calls, body=b"x" * 6))
+    os.utime(cache.svg_path("old"), (1, 1))
+    assert cache.evict() == 1
+    assert not cache.svg_path("old").exists() and cache.svg_path("new").exists()
+    assert (cache.locks_dir / "old.lock").exists()
+    assert cache.stats()["entries"] == 1
+
+
+def test_an_entry_evicted_before_a_hit_is_compiled_again(tmp_path):
+    cache = TexCache(tmp_path / "tex", max_bytes=0)
+    calls = []
+    cache.get_or_compile("key", compiler(calls))
+    cache.evict()
+    path = cache.get_or_compile("key", compiler(calls), tmp_path / "Tex")
+    assert len(calls) == 2 and path.read_bytes() == b"<svg/>"
@@ -0,0 +1,78 @@
+import importlib.util
+
+import pytest
+
+import worker_pool
+from render_limits import RenderLimits
+from worker_pool import ManimWorkerPool, RenderFailed, WorkerUnavailable
+
+
+class FakeWorker:
+    started = 0
+
+    def __init__(self):
+        FakeWorker.started += 1
+        self.jobs = 0
+        self.rss = 0
+        self.startup_seconds = 0.5
+        self.stopped = False
+        self.sent = []
+
+    def render(self, job, timeout, cancel=None):
+        self.jobs += 1
+        self.sent.append(job)
+        if job["code"] == "bad":
+            return {"ok": False, "error": {"type": "NameError", "message": "name 'x' is not defined", "line": 3}}
+        if job.get("count"):
+            return {"ok": True, "plays": 7, "scene": "A"}
+        return {"ok": True, "video": "/tmp/out.mp4", "scene": "A", "duration": 2.0, "seconds": 1.0,
+                "timings": {"render": 0.8}}
+
+    def alive(self):
+        return not self.stopped
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    FakeWorker.started = 0
+    monkeypatch.setattr(worker_pool, "ManimWorker", FakeWorker)
+
+
+def test_workers_are_reused_then_recycled_after_max_jobs(fake_workers):
+    pool = ManimWorkerPool(1, max_jobs=2)
+    first = pool.render("code", "A", {})
+    second = pool.render("code", "A", {})
+    third = pool.render("code", "A", {})
+    assert FakeWorker.started == 2
+    assert first.timings["startup"] == 0.5 and second.timings["startup"] == 0.0
+    assert third.timings == {"startup": 0.5, "render": 0.8}
+
+
+def test_failures_carry_the_worker_error_and_free_the_slot(fake_workers):
+    pool = ManimWorkerPool(1)
+    with pytest.raises(RenderFailed) as error:
+        pool.render("bad", "A", {})
+    assert (error.value.error.type, error.value.error.line) == ("NameError", 3)
+    assert pool.render("code", "A", {}).scene == "A"
+
+
+def test_counting_and_rendering_send_the_limits(fake_workers):
+    pool = ManimWorkerPool(1)
+    limits = RenderLimits(10, 20, 512, 50)
+    assert pool.count_animations("code", "A", {}, limits=limits) == 7
+    pool.render("code", "A", {}, limits=limits, encoder={"crf": "23"})
+    worker = pool._idle.get_nowait()
+    assert [job["limits"] for job in worker.sent] == [limits.to_dict()] * 2
+    assert worker.sent[0]["count"] and worker.sent[1]["encoder"] == {"crf": "23"}
+
+
+@pytest.mark.skipif(importlib.util.find_spec("manim") is not None, reason="manim is installed")
+def test_pool_is_unavailable_without_manim():
+    pool = ManimWorkerPool(1)
+    with pytest.raises(WorkerUnavailable):
+        pool.render("code", "A", {})
+    with pytest.raises(WorkerUnavailable):
+        pool.render("code", "A", {})  # the slot was given back
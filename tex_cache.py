@@ -0,0 +1,291 @@
+"""
+Shared LaTeX/SVG compilation cache for every render process.
+
+`Tex` and `MathTex` compile through LaTeX and dvisvgm, which is often the
+slowest part of a render. Manim only caches SVGs inside the render's own
+``tex_dir``, so per-job workspaces rebuilt them every time. This module keeps
+one deployment-wide cache keyed by the full TeX source (expression plus
+template preamble) and the compiler, guarded by per-key file locks so several
+processes never compile the same expression at once or read a half-written
+SVG. Callers get a hardlink of the SVG in their own ``tex_dir``, so evicting
+the cache entry never removes a file Manim is about to read. Hit statistics
+are counted in memory and merged into a small shared JSON file every few
+seconds and at exit, so cache hits never wait on other processes.
+
+`install()` patches Manim in the current process. Run as a script
+(``python tex_cache.py <manim args>``) it installs the hook and then runs the
+Manim CLI, which is how one-off render processes use the cache.
+"""
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from media_store import publish
+
+DEFAULT_CACHE_DIR = Path(__file__).parent / "media" / "cache" / "tex"
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+EVICT_INTERVAL = 60
+# Seconds between merges of a process's hit counters into stats.json
+STATS_FLUSH_INTERVAL = 10
+
+
+@contextmanager
+def _locked(path: Path):
+    with open(path, "a+") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class TexCache:
+    """Process-safe store of compiled TeX expressions as SVG files"""
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.locks_dir = self.root / ".locks"
+        self.locks_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._last_evict = 0.0
+        self._lock = threading.Lock()
+        self._pending = self._empty_stats()
+        self._last_flush = time.monotonic()
+        atexit.register(self.flush_stats)
+
+    @staticmethod
+    def key(texcode: str, compiler: str = "latex", output_format: str = ".dvi") -> str:
+        digest = hashlib.sha256()
+        for part in (texcode, compiler, output_format):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()[:32]
+
+    @property
+    def unmanaged_dir(self) -> Path:
+        """tex_dir for Manim processes without the hook; they share SVGs but not locks"""
+        path = self.root / "unmanaged"
+        path.mkdir(exist_ok=True)
+        return path
+
+    def svg_path(self, key: str) -> Path:
+        return self.root / f"{key}.svg"
+
+    def get_or_compile(self, key: str, compile_svg, dest_dir: Optional[Path] = None) -> Path:
+        """Return the cached SVG for `key`, calling `compile_svg(tmp_dir)` on a miss
+
+        With `dest_dir`, the SVG is linked into that directory and the link is
+        returned, which stays readable after the cache entry is evicted.
+        """
+        svg = self.svg_path(key)
+        try:
+            os.utime(svg)
+            found = self._deliver(svg, dest_dir)
+        except FileNotFoundError:
+            pass  # not compiled yet, or evicted since
+        else:
+            self._record(hit=True)
+            return found
+
+        with _locked(self.locks_dir / f"{key}.lock"):
+            # Another process may have compiled it while we waited for the lock
+            if svg.exists():
+                self._record(hit=True)
+                return self._deliver(svg, dest_dir)
+            started = time.perf_counter()
+            tmp_dir = Path(tempfile.mkdtemp(dir=self.root, prefix=".build-"))
+            try:
+                compiled = Path(compile_svg(tmp_dir))
+                os.replace(compiled, svg)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._record(hit=False, compile_seconds=time.perf_counter() - started)
+            found = self._deliver(svg, dest_dir)
+
+        self._maybe_evict()
+        return found
+
+    def _deliver(self, svg: Path, dest_dir: Optional[Path]) -> Path:
+        if dest_dir is None or Path(dest_dir).resolve() == self.root.resolve():
+            return svg
+        Path(dest_dir).mkdir(parents=True, exist_ok=True)
+        return publish(svg, Path(dest_dir) / svg.name)
+
+    def _record(self, hit: bool, compile_seconds: float = 0.0):
+        with self._lock:
+            self._pending["hits" if hit else "misses"] += 1
+            self._pending["compile_seconds"] += compile_seconds
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Merge this process's counters into the shared stats.json"""
+        with self._lock:
+            pending, self._pending = self._pending, self._empty_stats()
+            self._last_flush = time.monotonic()
+        if not pending["hits"] and not pending["misses"]:
+            return
+        stats_path = self.root / "stats.json"
+        with _locked(self.locks_dir / "stats.lock"):
+            stats = self._read_stats(stats_path)
+            for name, value in pending.items():
+                stats[name] += value
+            tmp_path = stats_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(stats))
+            os.replace(tmp_path, stats_path)
+
+    @staticmethod
+    def _empty_stats() -> dict:
+        return {"hits": 0, "misses": 0, "compile_seconds": 0.0}
+
+    @classmethod
+    def _read_stats(cls, stats_path: Path) -> dict:
+        try:
+            return json.loads(stats_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls._empty_stats()
+
+    def _maybe_evict(self):
+        if time.monotonic() - self._last_evict >= EVICT_INTERVAL:
+            self._last_evict = time.monotonic()
+            self.evict()
+
+    def evict(self) -> int:
+        """Remove least recently used SVGs until the cache fits its budget"""
+        entries = []
+        total = 0
+        for svg in self.root.glob("*.svg"):
+            try:
+                stat = svg.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, svg))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, svg in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # Lock files stay: removing one would let two processes lock different inodes
+            with _locked(self.locks_dir / f"{svg.stem}.lock"):
+                svg.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        stats = self._read_stats(self.root / "stats.json")
+        with self._lock:
+            # Counts of this process not merged yet
+            for name, value in self._pending.items():
+                stats[name] += value
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["entries"] = stats["bytes"] = 0
+        for svg in self.root.glob("*.svg"):
+            try:
+                size = svg.stat().st_size
+            except FileNotFoundError:
+                continue  # evicted by another process
+            stats["entries"] += 1
+            stats["bytes"] += size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+_cache: Optional[TexCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_tex_cache() -> TexCache:
+    """Return the process-wide TeX cache configured from the environment"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TexCache(
+                Path(os.getenv("MANIM_TEX_CACHE_DIR", DEFAULT_CACHE_DIR)),
+                int(os.getenv("MANIM_TEX_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _cache
+
+
+def install(cache: Optional[TexCache] = None):
+    """Route Manim's TeX compilation in this process through the shared cache"""
+    from manim import config
+    from manim.mobject.text import tex_mobject
+    from manim.utils import tex_file_writing
+
+    cache = cache or get_tex_cache()
+    original = tex_file_writing.tex_to_svg_file
+    if getattr(original, "_shared_cache", False):
+        return
+
+    def tex_to_svg_file(expression, environment=None, tex_template=None):
+        template = tex_template or config.tex_template
+        if environment is not None:
+            texcode = template.get_texcode_for_expression_in_env(expression, environment)
+        else:
+            texcode = template.get_texcode_for_expression(expression)
+        key = cache.key(texcode, template.tex_compiler, template.output_format)
+
+        def compile_svg(tmp_dir: Path) -> Path:
+            previous = config.tex_dir
+            config.tex_dir = tmp_dir
+            try:
+                return original(expression, environment, tex_template)
+            finally:
+                config.tex_dir = previous
+
+        return cache.get_or_compile(key, compile_svg, Path(config.tex_dir))
+
+    tex_to_svg_file._shared_cache = True
+    tex_file_writing.tex_to_svg_file = tex_to_svg_file
+    tex_mobject.tex_to_svg_file = tex_to_svg_file
+
+
+def manim_command(stage_timings: Optional[Path] = None, encoder: Optional[dict] = None) -> list:
+    """Command that runs the Manim CLI with the shared TeX cache installed
+
+    With `stage_timings`, the process writes its per-stage render timings
+    (see stage_timing.py) to that file when it exits. `encoder` holds video
+    encoder options such as a render profile's preset and CRF.
+    """
+    command = [sys.executable, str(Path(__file__).resolve())]
+    if stage_timings is not None:
+        command += ["--stage-timings", str(stage_timings)]
+    if encoder:
+        command += ["--encoder-options", json.dumps(encoder)]
+    return command
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    timings_path = encoder = None
+    if args[:1] == ["--stage-timings"]:
+        timings_path, args = args[1], args[2:]
+    if args[:1] == ["--encoder-options"]:
+        encoder, args = json.loads(args[1]), args[2:]
+    install()
+    if timings_path:
+        import stage_timing
+        stage_timing.collect_process(Path(timings_path))
+    if encoder:
+        import render_profiles
+        render_profiles.set_encoder_options(encoder)
+        render_profiles.install_encoder_hook()
+    from manim.__main__ import main
+
+    sys.argv = ["manim", *args]
+    main()
@@ -0,0 +1,341 @@
+"""
+Pool of long-lived Manim worker processes.
+
+Each worker imports manim once at startup and then renders scenes it receives
+as JSON lines on stdin, so short renders don't pay the interpreter, manim,
+numpy, cairo and pango import cost every time. Workers are recycled after a
+number of jobs or once their resident memory passes a threshold. A job can
+carry render limits (see render_limits); a worker that hits one reports it
+and exits, since a half-finished render may have left it in any state.
+
+Run directly (``python worker_pool.py``) this module is the worker itself.
+"""
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from render_limits import RenderLimits, apply_limits, exceeded_limit, limit_error_type, limit_message
+from render_monitor import RenderError, error_from_exception
+
+DEFAULT_MAX_JOBS = 50
+DEFAULT_MAX_RSS_MB = 1024
+STARTUP_TIMEOUT = 120
+
+
+class WorkerUnavailable(Exception):
+    """Raised when a worker process can't be started (e.g. manim is missing)"""
+
+
+class RenderFailed(Exception):
+    """Raised when a scene fails to render; `error` holds the structured details"""
+
+    def __init__(self, message: str, error: Optional[RenderError] = None):
+        super().__init__(message)
+        self.error = error or RenderError("RenderFailed", message)
+
+
+class RenderCancelled(RenderFailed):
+    """Raised when a render is cancelled while a worker is running it"""
+
+
+@dataclass
+class RenderResult:
+    video: Path
+    scene: str
+    duration: float
+    seconds: float
+    # Seconds per stage (see stage_timing.STAGES), including worker startup on a fresh worker
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class ManimWorker:
+    """Parent-side handle on one worker process"""
+
+    def __init__(self):
+        self.jobs = 0
+        self.rss = 0
+        started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve())],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        ready = self._read(STARTUP_TIMEOUT)
+        if not ready or not ready.get("ready"):
+            self.kill()
+            raise WorkerUnavailable((ready or {}).get("error", "worker did not start"))
+        self.startup_seconds = time.perf_counter() - started
+
+    def _read(self, timeout: Optional[float], cancel: Optional[threading.Event] = None) -> Optional[dict]:
+        result = {}
+
+        def reader():
+            line = self.process.stdout.readline()
+            if line:
+                result["message"] = json.loads(line)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while thread.is_alive():
+            if cancel is not None and cancel.is_set():
+                self.kill()
+                raise RenderCancelled("Render cancelled", RenderError("Cancelled", "Render cancelled"))
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            thread.join(0.2 if remaining is None else min(0.2, remaining))
+        return result.get("message")
+
+    def render(self, job: dict, timeout: Optional[float], cancel: Optional[threading.Event] = None) -> dict:
+        self.jobs += 1
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        response = self._read(timeout, cancel)
+        if response is None:
+            exited = not self.alive()
+            self.kill()
+            if exited:
+                limit = limit_error_type(self.process.returncode) if job.get("limits") else None
+                if limit is not None:
+                    message = limit_message(limit)
+                    raise RenderFailed(message, RenderError(limit, message))
+                message = f"Worker exited with code {self.process.returncode}"
+                raise RenderFailed(message, RenderError("WorkerCrashed", message))
+            message = f"Render took longer than {timeout:g} seconds"
+            raise RenderFailed(message, RenderError("Timeout", message))
+        self.rss = response.get("rss", 0)
+        if response.get("exiting"):
+            self.stop()
+        return response
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self):
+        if self.alive():
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.kill()
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+
+class ManimWorkerPool:
+    """Fixed-size pool of warm workers shared by all threads of a process"""
+
+    def __init__(self, size: int, max_jobs: int = DEFAULT_MAX_JOBS, max_rss_mb: int = DEFAULT_MAX_RSS_MB):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self._idle: "queue.Queue[Optional[ManimWorker]]" = queue.Queue()
+        # Workers are started lazily; None marks a free slot.
+        for _ in range(size):
+            self._idle.put(None)
+
+    def _checkout(self) -> ManimWorker:
+        worker = self._idle.get()
+        if worker is None or not worker.alive():
+            try:
+                worker = ManimWorker()
+            except Exception:
+                self._idle.put(None)
+                raise
+        return worker
+
+    def _checkin(self, worker: ManimWorker):
+        if not worker.alive():
+            self._idle.put(None)
+        elif worker.jobs >= self.max_jobs or worker.rss >= self.max_rss:
+            worker.stop()
+            self._idle.put(None)
+        else:
+            self._idle.put(worker)
+
+    def _run(self, worker: ManimWorker, job: dict, timeout: Optional[float], cancel: Optional[threading.Event],
+             limits: Optional[RenderLimits]) -> dict:
+        """Send `job` to a checked-out worker and return its successful response"""
+        try:
+            response = worker.render({**job, "limits": limits.to_dict() if limits else None}, timeout, cancel)
+        finally:
+            self._checkin(worker)
+        if not response.get("ok"):
+            error = RenderError(**response["error"])
+            raise RenderFailed(str(error), error)
+        return response
+
+    def render(self, code: str, scene_name: Optional[str], config: dict,
+               filename: str = "scene.py", timeout: Optional[float] = None,
+               cancel: Optional[threading.Event] = None, encoder: Optional[Dict[str, str]] = None,
+               limits: Optional[RenderLimits] = None) -> RenderResult:
+        """Render `scene_name` from `code` with manim config overrides `config`
+
+        `encoder` holds video encoder options such as a render profile's preset and CRF,
+        `limits` the CPU, memory and output size limits of the render.
+        """
+        worker = self._checkout()
+        startup = worker.startup_seconds if worker.jobs == 0 else 0.0
+        response = self._run(worker, {"code": code, "scene": scene_name, "config": config, "filename": filename,
+                                      "encoder": encoder}, timeout, cancel, limits)
+        timings = {"startup": startup, **response.get("timings", {})}
+        return RenderResult(Path(response["video"]), response["scene"], response["duration"], response["seconds"], timings)
+
+    def count_animations(self, code: str, scene_name: Optional[str], config: dict,
+                         filename: str = "scene.py", timeout: Optional[float] = None,
+                         cancel: Optional[threading.Event] = None, limits: Optional[RenderLimits] = None) -> int:
+        """Run the scene with every animation skipped and return its number of play/wait calls
+
+        The dry run executes the scene's code, so it gets the same timeout,
+        cancellation and `limits` as a render.
+        """
+        response = self._run(self._checkout(), {"code": code, "scene": scene_name, "config": config,
+                                                "filename": filename, "count": True}, timeout, cancel, limits)
+        return response["plays"]
+
+    def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                worker.stop()
+
+
+_pool: Optional[ManimWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[ManimWorkerPool]:
+    """Return the process-wide worker pool, or None if MANIM_WORKERS=0"""
+    global _pool
+    size = int(os.getenv("MANIM_WORKERS", min(2, os.cpu_count() or 1)))
+    if size <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ManimWorkerPool(
+                size,
+                int(os.getenv("MANIM_WORKER_MAX_JOBS", DEFAULT_MAX_JOBS)),
+                int(os.getenv("MANIM_WORKER_MAX_RSS_MB", DEFAULT_MAX_RSS_MB)),
+            )
+        return _pool
+
+
+def _current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _render_job(job: dict) -> dict:
+    import manim
+    import render_profiles
+    import stage_timing
+
+    namespace = {"__name__": "__manim_scene__", "__file__": job["filename"]}
+    exec(compile(job["code"], job["filename"], "exec"), namespace)
+
+    scenes = [
+        obj for obj in namespace.values()
+        if isinstance(obj, type) and issubclass(obj, manim.Scene)
+        and obj.__module__ == "__manim_scene__"
+    ]
+    if job["scene"]:
+        scenes = [cls for cls in scenes if cls.__name__ == job["scene"]]
+    if not scenes:
+        message = f"Could not find Scene class {job['scene'] or ''}".strip()
+        raise RenderFailed(message, RenderError("SceneNotFound", message))
+
+    overrides = dict(job["config"])
+    overrides.setdefault("input_file", job["filename"])
+    if job.get("count"):
+        # Skipped animations only advance the scene state; nothing is drawn or written
+        overrides.update(write_to_movie=False, save_last_frame=False)
+        with manim.tempconfig(overrides):
+            scene = scenes[0](skip_animations=True)
+            scene.render()
+            return {"plays": scene.renderer.num_plays, "scene": scenes[0].__name__}
+
+    render_profiles.set_encoder_options(job.get("encoder"))
+    with manim.tempconfig(overrides):
+        scene = scenes[0]()
+        with stage_timing.collect() as timings:
+            scene.render()
+        file_writer = scene.renderer.file_writer
+        # With save_last_frame (-s) there is no movie, only the final PNG
+        output = file_writer.movie_file_path if manim.config.write_to_movie else file_writer.image_file_path
+        return {
+            "video": str(output),
+            "scene": scenes[0].__name__,
+            "duration": scene.renderer.time,
+            "timings": timings.to_dict(),
+        }
+
+
+def _worker_main():
+    # Keep the real stdout for the protocol and send everything else
+    # (manim's console output, progress bars) to stderr.
+    protocol = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    def send(message: dict):
+        protocol.write(json.dumps(message) + "\n")
+
+    try:
+        import manim  # noqa: F401
+        import render_profiles
+        import stage_timing
+        import tex_cache
+        tex_cache.install()
+        stage_timing.install_hooks()
+        render_profiles.install_encoder_hook()
+    except Exception as e:
+        send({"ready": False, "error": f"Could not import manim: {e}"})
+        return
+    send({"ready": True, "pid": os.getpid()})
+
+    for line in sys.stdin:
+        job = json.loads(line)
+        started = time.perf_counter()
+        restore_limits = apply_limits(job.get("limits"))
+        try:
+            result = _render_job(job)
+            restore_limits()
+            send({"ok": True, **result, "rss": _current_rss(),
+                  "seconds": time.perf_counter() - started})
+        except BaseException as e:
+            restore_limits()
+            if isinstance(e, KeyboardInterrupt):
+                raise
+            error = e.error if isinstance(e, RenderFailed) else error_from_exception(e, job["filename"])
+            limit = exceeded_limit(e)
+            if limit is not None:
+                error.type = limit
+            send({"ok": False, "error": error.to_dict(), "rss": _current_rss(), "exiting": limit is not None})
+            if limit is not None:
+                return
+
+
+if __name__ == "__main__":
+    _worker_main()